@@ -0,0 +1,50 @@
+"""Throughput of Dispatcher.run_many versus one Dispatcher.run per input.
+
+Run: python benchmarks/bench_batch.py
+"""
+import argparse
+import os
+import sys
+import time
+
+THIS_DIR = os.path.dirname(__file__)
+REPO_ROOT = os.path.normpath(os.path.join(THIS_DIR, os.pardir))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from lambda_poc.dispatcher import Dispatcher
+from fake_docker import FakeDockerService
+
+
+CODE = """
+def entrypoint(data):
+    return data
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--inputs", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[10, 100, 500])
+    args = parser.parse_args()
+
+    inputs = [{"i": i} for i in range(args.inputs)]
+    with Dispatcher(docker_service=FakeDockerService()) as d:
+        d.run(CODE, {})
+
+        start = time.perf_counter()
+        for item in inputs:
+            d.run(CODE, item)
+        elapsed = time.perf_counter() - start
+        print(f"run() per input       {len(inputs) / elapsed:10.1f} inputs/s")
+
+        for batch_size in args.batch_size:
+            start = time.perf_counter()
+            results = d.run_many(CODE, inputs, batch_size=batch_size)
+            elapsed = time.perf_counter() - start
+            assert len(results) == len(inputs)
+            print(f"run_many batch={batch_size:<5} {len(inputs) / elapsed:10.1f} inputs/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Body codec cost (json / orjson / msgpack) at 1KB, 1MB and 50MB payloads.
+
+Measures raw encode+decode time per codec, then end-to-end `Dispatcher.run`
+latency against real runner processes (`SubprocessDockerService`), where the
+runner echoes the payload back so both directions are serialized.
+
+Run: python benchmarks/bench_codecs.py [--sizes 1024 1048576] [--skip-e2e]
+"""
+import argparse
+import os
+import sys
+import time
+
+THIS_DIR = os.path.dirname(__file__)
+REPO_ROOT = os.path.normpath(os.path.join(THIS_DIR, os.pardir))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from lambda_poc.codecs import CODECS
+from lambda_poc.dispatcher import Dispatcher
+from common import summarize
+from subprocess_docker import SubprocessDockerService
+
+
+CODE = """
+def entrypoint(data):
+    return data
+"""
+
+DEFAULT_SIZES = [1024, 1024 * 1024, 50 * 1024 * 1024]
+
+
+def make_payload(size: int):
+    """A JSON-like document of roughly `size` bytes: records of mixed types."""
+    record = {"id": 123456, "name": "item-abcdefgh", "score": 0.123456789, "tags": ["a", "b", "c"], "ok": True}
+    record_size = 100
+    return {"records": [dict(record, id=i) for i in range(max(1, size // record_size))]}
+
+
+def label(size: int) -> str:
+    if size >= 1024 * 1024:
+        return f"{size // (1024 * 1024)}MB"
+    return f"{size // 1024}KB"
+
+
+def time_codec(codec, payload, repeats: int):
+    encode, decode = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        data = codec.encode(payload)
+        encode.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        codec.decode(data)
+        decode.append(time.perf_counter() - start)
+    return len(data), summarize(encode), summarize(decode)
+
+
+def time_e2e(docker, codec_name: str, payload, repeats: int):
+    with Dispatcher(docker_service=docker, codec=codec_name) as d:
+        d.run(CODE, {})
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            d.run(CODE, payload)
+            timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--codecs", nargs="+", default=sorted(CODECS))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--skip-e2e", action="store_true", help="only time encode/decode in-process")
+    args = parser.parse_args()
+
+    docker = None if args.skip_e2e else SubprocessDockerService()
+    try:
+        for size in args.sizes:
+            payload = make_payload(size)
+            # Fewer rounds for big payloads, which take seconds per call
+            repeats = args.repeats if size < 10 * 1024 * 1024 else max(1, args.repeats // 2)
+            print(f"--- payload ~{label(size)} ---")
+            for name in args.codecs:
+                nbytes, enc, dec = time_codec(CODECS[name], payload, repeats)
+                line = (
+                    f"{name:<8} {nbytes / 1024:10.1f} KiB  encode {enc['p50_ms']:8.2f}ms"
+                    f"  decode {dec['p50_ms']:8.2f}ms"
+                )
+                if docker is not None:
+                    e2e = time_e2e(docker, name, payload, repeats)
+                    line += f"  run() p50 {e2e['p50_ms']:9.2f}ms"
+                print(line)
+    finally:
+        if docker is not None:
+            docker.remove_network()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Warm-path latency while other hashes are cold-starting.
+
+A warm function is invoked in a tight loop, first on an idle dispatcher and
+then while background threads keep cold-starting new code hashes. With
+per-hash locking the warm p99 should stay flat.
+
+Run: python benchmarks/bench_cold_start_contention.py
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+THIS_DIR = os.path.dirname(__file__)
+REPO_ROOT = os.path.normpath(os.path.join(THIS_DIR, os.pardir))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from lambda_poc.dispatcher import Dispatcher
+from common import percentile
+from fake_docker import FakeDockerService
+
+
+WARM_CODE = """
+def entrypoint(data):
+    return data
+"""
+
+
+def measure_warm(d, duration):
+    samples = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        d.run(WARM_CODE, {"x": 1})
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(label, samples):
+    print(
+        f"{label:<24} n={len(samples):<6} "
+        f"p50={percentile(samples, 50) * 1000:8.2f}ms "
+        f"p99={percentile(samples, 99) * 1000:8.2f}ms "
+        f"max={max(samples) * 1000:8.2f}ms "
+        f"mean={statistics.mean(samples) * 1000:8.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--boot-delay", type=float, default=2.0, help="simulated container boot time (s)")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per measurement phase")
+    parser.add_argument("--cold-threads", type=int, default=4, help="threads cold-starting new hashes")
+    args = parser.parse_args()
+
+    docker = FakeDockerService(boot_delay=args.boot_delay)
+    with Dispatcher(docker_service=docker) as d:
+        d.run(WARM_CODE, {"x": 0})
+        calls_before = docker.total_calls
+        samples = measure_warm(d, args.duration)
+        report("warm, idle", samples)
+        print(f"docker API calls per warm run: {(docker.total_calls - calls_before) / len(samples):.2f}")
+
+        stop = threading.Event()
+        cold_starts = []
+
+        def churn(worker):
+            i = 0
+            while not stop.is_set():
+                code = f"def entrypoint(data):\n    return {{'worker': {worker}, 'i': {i}}}\n"
+                start = time.perf_counter()
+                d.run(code, {})
+                cold_starts.append(time.perf_counter() - start)
+                i += 1
+
+        threads = [threading.Thread(target=churn, args=(w,), daemon=True) for w in range(args.cold_threads)]
+        for t in threads:
+            t.start()
+        report("warm, during cold starts", measure_warm(d, args.duration))
+        stop.set()
+        for t in threads:
+            t.join()
+        if cold_starts:
+            report("cold starts", cold_starts)
+        ready = d.stats()["timings"].get("container_ready_seconds")
+        if ready:
+            print(f"container readiness        avg={ready['avg'] * 1000:.2f}ms max={ready['max'] * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Invocations per second against a local runner: fresh connections vs pooled.
+
+"before" uses module-level `requests.post` (a new TCP connection per call),
+"after" uses the keep-alive session the Dispatcher creates per container.
+
+Run: python benchmarks/bench_http_pool.py
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+THIS_DIR = os.path.dirname(__file__)
+REPO_ROOT = os.path.normpath(os.path.join(THIS_DIR, os.pardir))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from lambda_poc.constants import DEFAULT_HTTP_POOL_SIZE
+from lambda_poc.transport import make_session
+from local_runner import local_runner
+
+
+CODE = """
+def entrypoint(data):
+    return {"echo": data}
+"""
+
+
+def invocations_per_second(post, url, total, concurrency):
+    def call(_):
+        resp = post(url, json={"x": 1}, timeout=30)
+        resp.raise_for_status()
+        return resp.json()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(call, range(total)))
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_HTTP_POOL_SIZE)
+    args = parser.parse_args()
+
+    with local_runner() as addr:
+        requests.post(f"http://{addr}/load", json={"code": CODE}, timeout=10).raise_for_status()
+        url = f"http://{addr}/run"
+        for concurrency in args.concurrency:
+            before = invocations_per_second(requests.post, url, args.requests, concurrency)
+            with make_session(args.pool_size) as session:
+                after = invocations_per_second(session.post, url, args.requests, concurrency)
+            print(
+                f"concurrency={concurrency:<4} fresh connections: {before:8.1f} inv/s   "
+                f"pooled keep-alive: {after:8.1f} inv/s   ({after / before:.2f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
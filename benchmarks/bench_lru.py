@@ -0,0 +1,101 @@
+"""Container count and hit rate for a burst of distinct code hashes, with and without a cap.
+
+Mimics `examples/fastapi_example.py` at scale: each call runs one of many
+functions picked at random (skewed towards a few hot ones), against the
+in-process fake Docker backend with a simulated boot delay.
+
+Run: python benchmarks/bench_lru.py [--functions 200 --calls 2000 --max-containers 20 --memory-limit-mib 2048]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+THIS_DIR = os.path.dirname(__file__)
+REPO_ROOT = os.path.normpath(os.path.join(THIS_DIR, os.pardir))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from lambda_poc.dispatcher import Dispatcher
+from fake_docker import FakeDockerService
+
+
+def make_code(i: int) -> str:
+    return f"def entrypoint(data):\n    return {{'fn': {i}, 'data': data}}\n"
+
+
+def fake_memory(name: str) -> int:
+    # Deterministic 16-256 MiB per container
+    return (16 + hash(name) % 240) * 1024 * 1024
+
+
+def run(args, **dispatcher_kwargs):
+    rng = random.Random(42)
+    codes = [make_code(i) for i in range(args.functions)]
+    # Zipf-like popularity: a few hot functions, a long tail of cold ones
+    weights = [1 / (rank + 1) for rank in range(args.functions)]
+    picks = rng.choices(codes, weights=weights, k=args.calls)
+
+    docker = FakeDockerService(boot_delay=args.boot_delay, memory_bytes=fake_memory)
+    peak = {"containers": 0, "memory_bytes": 0}
+    with Dispatcher(docker_service=docker, **dispatcher_kwargs) as d:
+        stop = threading.Event()
+
+        def sample():
+            while not stop.is_set():
+                gauges = d.stats()["gauges"]
+                for key in peak:
+                    peak[key] = max(peak[key], gauges[key])
+                time.sleep(0.01)
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(lambda code: d.run(code, {}), picks))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        sampler.join()
+        counters = d.stats()["counters"]
+    return elapsed, peak, counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--functions", type=int, default=200)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--boot-delay", type=float, default=0.05)
+    parser.add_argument("--max-containers", type=int, default=20)
+    parser.add_argument("--memory-limit-mib", type=int, default=2048)
+    args = parser.parse_args()
+
+    configs = [
+        ("unbounded", {}),
+        (f"lru max={args.max_containers}", {"max_containers": args.max_containers}),
+        (
+            f"lru max={args.max_containers} mem-weighted",
+            {"max_containers": args.max_containers, "memory_weighted_eviction": True},
+        ),
+        (
+            f"memory limit {args.memory_limit_mib} MiB",
+            {"memory_limit_bytes": args.memory_limit_mib * 2**20, "memory_weighted_eviction": True},
+        ),
+    ]
+    for label, kwargs in configs:
+        elapsed, peak, counters = run(args, **kwargs)
+        hits, misses = counters.get("cache_hits", 0), counters.get("cache_misses", 0)
+        # Memory is only measured when a limit or memory weighting is configured
+        memory = f"{peak['memory_bytes'] / 2**20:6.0f} MiB" if peak["memory_bytes"] else "       n/a"
+        print(
+            f"{label:<28} {args.calls / elapsed:8.1f} calls/s  peak containers {peak['containers']:4d}"
+            f"  peak mem {memory}  hit rate {hits / max(hits + misses, 1):5.1%}"
+            f"  evictions {counters.get('evictions', 0)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""run() latency for large bytes payloads: HTTP body versus shared payload directory.
+
+Starts real runner processes (`SubprocessDockerService`) and echoes a bytes
+payload, so both the input and the result take the measured path.
+
+Run: python benchmarks/bench_payloads.py [--sizes 1048576 10485760]
+"""
+import argparse
+import os
+import sys
+import time
+
+THIS_DIR = os.path.dirname(__file__)
+REPO_ROOT = os.path.normpath(os.path.join(THIS_DIR, os.pardir))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from lambda_poc.dispatcher import Dispatcher
+from common import summarize
+from subprocess_docker import SubprocessDockerService
+
+
+CODE = """
+def entrypoint(data):
+    return data
+"""
+
+DEFAULT_SIZES = [1024 * 1024, 10 * 1024 * 1024, 50 * 1024 * 1024]
+
+
+def time_runs(docker, payload: bytes, repeats: int, payload_threshold):
+    with Dispatcher(docker_service=docker, payload_threshold=payload_threshold) as d:
+        d.run(CODE, b"")
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = d.run(CODE, payload)
+            timings.append(time.perf_counter() - start)
+            assert len(result) == len(payload)
+    return summarize(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--threshold", type=int, default=64 * 1024, help="payload_threshold for the shared-dir run")
+    args = parser.parse_args()
+
+    docker = SubprocessDockerService()
+    try:
+        for size in args.sizes:
+            payload = os.urandom(size)
+            inline = time_runs(docker, payload, args.repeats, None)
+            shared = time_runs(docker, payload, args.repeats, args.threshold)
+            print(
+                f"{size / (1024 * 1024):6.1f} MiB  http body p50 {inline['p50_ms']:8.2f}ms"
+                f"  shared dir p50 {shared['p50_ms']:8.2f}ms  ({inline['p50_ms'] / shared['p50_ms']:.1f}x)"
+            )
+    finally:
+        docker.remove_network()
+
+
+if __name__ == "__main__":
+    main()
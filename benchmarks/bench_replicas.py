@@ -0,0 +1,70 @@
+"""Throughput of one hot function with a single replica versus autoscaling.
+
+Each fake runner executes one call at a time (like runner.py), so a single
+replica caps throughput at 1 / run_delay calls per second.
+
+Run: python benchmarks/bench_replicas.py
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+THIS_DIR = os.path.dirname(__file__)
+REPO_ROOT = os.path.normpath(os.path.join(THIS_DIR, os.pardir))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from lambda_poc.dispatcher import Dispatcher
+from fake_docker import FakeDockerService
+
+
+CODE = """
+def entrypoint(data):
+    return data
+"""
+
+
+def throughput(d, callers, duration):
+    deadline = time.perf_counter() + duration
+
+    def worker(_):
+        calls = 0
+        while time.perf_counter() < deadline:
+            d.run(CODE, {})
+            calls += 1
+        return calls
+
+    with ThreadPoolExecutor(callers) as pool:
+        return sum(pool.map(worker, range(callers))) / duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--run-delay", type=float, default=0.02, help="simulated entrypoint time (s)")
+    parser.add_argument("--boot-delay", type=float, default=0.5, help="simulated container boot time (s)")
+    parser.add_argument("--callers", type=int, default=16)
+    parser.add_argument("--max-replicas", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    for max_replicas in (1, args.max_replicas):
+        docker = FakeDockerService(boot_delay=args.boot_delay, run_delay=args.run_delay)
+        with Dispatcher(docker_service=docker, max_replicas=max_replicas, scale_down_idle_seconds=1) as d:
+            d.run(CODE, {})
+            # First pass lets the autoscaler add replicas, second measures
+            throughput(d, args.callers, args.duration)
+            rate = throughput(d, args.callers, args.duration)
+            busy = d.stats()["gauges"]["containers"]
+            # Scale-down runs on the cleanup loop's 10s tick
+            time.sleep(12)
+            stats = d.stats()
+        print(
+            f"max_replicas={max_replicas:<3} {rate:8.1f} calls/s  replicas under load={busy}  "
+            f"after idle={stats['gauges']['containers']}  counters={stats['counters']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Warm per-call latency over a TCP port versus a Unix domain socket.
+
+Starts real runner processes (`SubprocessDockerService`) and times
+`Dispatcher.run` and `AsyncDispatcher.run` with a tiny payload. Without
+Docker there is no docker-proxy in the TCP path, so under Docker the gap
+is larger than measured here.
+
+Run: python benchmarks/bench_uds.py [--calls 2000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+THIS_DIR = os.path.dirname(__file__)
+REPO_ROOT = os.path.normpath(os.path.join(THIS_DIR, os.pardir))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from lambda_poc import AsyncDispatcher
+from lambda_poc.dispatcher import Dispatcher
+from common import summarize
+from subprocess_docker import SubprocessDockerService
+
+
+CODE = """
+def entrypoint(data):
+    return data
+"""
+
+
+def time_sync(docker, calls: int, unix_sockets: bool):
+    with Dispatcher(docker_service=docker, unix_sockets=unix_sockets) as d:
+        d.run(CODE, {})
+        timings = []
+        for i in range(calls):
+            start = time.perf_counter()
+            d.run(CODE, {"i": i})
+            timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+async def time_async(docker, calls: int, unix_sockets: bool):
+    async with AsyncDispatcher(docker_service=docker, unix_sockets=unix_sockets) as d:
+        await d.run(CODE, {})
+        timings = []
+        for i in range(calls):
+            start = time.perf_counter()
+            await d.run(CODE, {"i": i})
+            timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+def report(label: str, stats) -> None:
+    print(f"{label:<14} p50 {stats['p50_ms']:7.3f}ms  p99 {stats['p99_ms']:7.3f}ms  mean {stats['mean_ms']:7.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    docker = SubprocessDockerService()
+    try:
+        report("sync  tcp", time_sync(docker, args.calls, False))
+        report("sync  uds", time_sync(docker, args.calls, True))
+        report("async tcp", asyncio.run(time_async(docker, args.calls, False)))
+        report("async uds", asyncio.run(time_async(docker, args.calls, True)))
+    finally:
+        docker.remove_network()
+
+
+if __name__ == "__main__":
+    main()
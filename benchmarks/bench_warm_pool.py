@@ -0,0 +1,57 @@
+"""First-call latency for new code hashes with and without a warm pool.
+
+Run: python benchmarks/bench_warm_pool.py
+"""
+import argparse
+import os
+import sys
+import time
+
+THIS_DIR = os.path.dirname(__file__)
+REPO_ROOT = os.path.normpath(os.path.join(THIS_DIR, os.pardir))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from lambda_poc.dispatcher import Dispatcher
+from fake_docker import FakeDockerService
+
+
+def first_calls(d, count, tag):
+    samples = []
+    for i in range(count):
+        code = f"def entrypoint(data):\n    return {{'tag': '{tag}', 'i': {i}}}\n"
+        start = time.perf_counter()
+        d.run(code, {})
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def wait_for_pool(d, timeout=60):
+    deadline = time.monotonic() + timeout
+    while d.stats()["gauges"]["pool_ready"] < d.pool_size and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--boot-delay", type=float, default=2.0, help="simulated container boot time (s)")
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--hashes", type=int, default=4, help="new code hashes to call")
+    args = parser.parse_args()
+
+    for pool_size in (0, args.pool_size):
+        docker = FakeDockerService(boot_delay=args.boot_delay)
+        with Dispatcher(docker_service=docker, pool_size=pool_size) as d:
+            wait_for_pool(d)
+            samples = first_calls(d, args.hashes, f"pool{pool_size}")
+            stats = d.stats()
+        avg_ms = sum(samples) / len(samples) * 1000
+        print(f"pool_size={pool_size:<3} first call avg={avg_ms:9.2f}ms max={max(samples) * 1000:9.2f}ms")
+        print(f"    counters={stats['counters']}")
+        refill = stats["timings"].get("pool_refill_seconds")
+        if refill:
+            print(f"    pool refill avg={refill['avg'] * 1000:.0f}ms max={refill['max'] * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""Docker-free stand-in for `DockerService` used by the benchmarks.
+
+Each "container" is a small in-process HTTP server that speaks the runner
+protocol (/load, /run). A configurable boot delay simulates the time Docker
+needs to start a real runner container, and an optional run delay simulates
+entrypoint work; like runner.py, each container executes one call at a time.
+Committed snapshot images are kept in memory; containers started from one
+come up with its preload code already loaded.
+"""
+import hashlib
+import json
+import socket
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+
+class _RunnerHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; avoid Nagle stalls on keep-alive
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.connections.add(self.connection)
+
+    def finish(self):
+        self.server.connections.discard(self.connection)
+        super().finish()
+
+    def _send_json(self, status: int, body) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            self._send_json(200, {
+                "status": "ok",
+                "loaded": self.server.loaded,
+                "code_hash": self.server.code_hash,
+                "idle_seconds": time.monotonic() - self.server.last_activity,
+            })
+        else:
+            self._send_json(404, {"detail": "Not Found"})
+
+    def do_POST(self):
+        content_type = self.headers.get("Content-Type") or "application/json"
+        if self.headers.get("X-Payload-Ref") is not None:
+            # No shared payload directory; the dispatcher sends bodies inline
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            self._send_json(415, {"detail": "Payload files are not enabled in this runner"})
+            return
+        if not content_type.startswith("application/json"):
+            # Like a runner without msgpack installed; the dispatcher falls back to JSON
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            self._send_json(415, {"detail": f"Unsupported body type {content_type}"})
+            return
+        payload = self._read_json()
+        self.server.last_activity = time.monotonic()
+        if self.path == "/load":
+            if "code" in payload:
+                code_hash = hashlib.sha256(payload["code"].encode()).hexdigest()[:16]
+            elif payload.get("code_hash") in self.server.code_cache:
+                code_hash = payload["code_hash"]
+            else:
+                self._send_json(404, {"detail": f"Unknown code hash: {payload.get('code_hash')}"})
+                return
+            self.server.code_cache.add(code_hash)
+            self.server.loaded = True
+            self.server.code_hash = code_hash
+            self._send_json(200, {"status": "loaded"})
+        elif self.path == "/run":
+            if not self.server.loaded:
+                self._send_json(400, {"detail": "No code loaded. Call /load first."})
+            elif self.server.service.run_status != 200:
+                self._send_json(self.server.service.run_status, {"detail": "Injected runner failure"})
+            else:
+                with self.server.run_lock:
+                    time.sleep(self.server.run_delay)
+                self._send_json(200, {"echo": payload})
+        elif self.path == "/run_batch":
+            if not self.server.loaded:
+                self._send_json(400, {"detail": "No code loaded. Call /load first."})
+            else:
+                self._send_json(200, {"results": [{"result": {"echo": item}} for item in payload["inputs"]]})
+        else:
+            self._send_json(404, {"detail": "Not Found"})
+
+
+class _RunnerServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connections = set()
+        self.run_delay = 0.0
+        self.run_lock = threading.Lock()
+
+    def close_connections(self) -> None:
+        """Drop keep-alive connections like a killed container would."""
+        for conn in list(self.connections):
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def host_config(resources: Optional[Dict]) -> Dict:
+    """The HostConfig fields Docker would report for `resources`."""
+    resources = resources or {}
+    config = {"CpusetCpus": resources.get("cpuset_cpus", ""), "CpusetMems": resources.get("cpuset_mems", "")}
+    if "mem_limit" in resources:
+        config["Memory"] = resources["mem_limit"]
+    return config
+
+
+class FakeContainer:
+    """Mimics the subset of `docker.models.containers.Container` we use."""
+
+    def __init__(
+        self,
+        service: "FakeDockerService",
+        name: str,
+        boot_delay: float,
+        run_delay: float = 0.0,
+        labels: Optional[Dict[str, str]] = None,
+        preload: Optional[str] = None,
+    ):
+        self._service = service
+        self.name = name
+        self.labels = dict(labels or {})
+        self.preload = preload
+        self.status = "created"
+        self.ports: Dict = {}
+        self.attrs: Dict = {"HostConfig": {}}
+        self._status = "created"
+        self._ports: Dict = {}
+        self._server = None
+        threading.Thread(target=self._boot, args=(boot_delay, run_delay), daemon=True).start()
+
+    def _boot(self, boot_delay: float, run_delay: float) -> None:
+        time.sleep(boot_delay)
+        server = _RunnerServer(("127.0.0.1", 0), _RunnerHandler)
+        server.run_delay = run_delay
+        server.service = self._service
+        server.loaded = self.preload is not None
+        server.code_hash = hashlib.sha256(self.preload.encode()).hexdigest()[:16] if self.preload is not None else None
+        server.code_cache = {server.code_hash} if server.code_hash is not None else set()
+        server.last_activity = time.monotonic()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self._server = server
+        self._ports = {"8080/tcp": [{"HostIp": "127.0.0.1", "HostPort": str(server.server_port)}]}
+        self._status = "running"
+
+    def _sync(self) -> None:
+        self.status = self._status
+        self.ports = self._ports
+
+    def reload(self) -> None:
+        self._service._count("container.reload")
+        self._sync()
+
+    def start(self) -> None:
+        self._service._count("container.start")
+
+    def kill(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server.close_connections()
+            self._server = None
+        self._status = "exited"
+
+    def remove(self) -> None:
+        self.kill()
+
+
+class FakeImage:
+    """Mimics the subset of `docker.models.images.Image` we use."""
+
+    def __init__(self, tag: str, labels: Dict[str, str], environment: Dict[str, str], files: Dict[str, str]):
+        self.tags = [tag]
+        self.labels = labels
+        self.environment = environment
+        self.files = files
+
+
+class FakeDockerService:
+    """Drop-in replacement for `lambda_poc.services.DockerService`.
+
+    Every simulated Docker API round-trip is counted in `calls`, keyed by
+    method name (container methods are prefixed with "container.").
+    """
+
+    def __init__(
+        self,
+        network: str = "fake",
+        boot_delay: float = 0.0,
+        run_delay: float = 0.0,
+        memory_bytes=64 * 1024 * 1024,
+    ):
+        self.network = network
+        # Ports are published on 127.0.0.1, like a local daemon
+        self.host = None
+        # Set by `set_down`: every API call fails, like an unreachable daemon
+        self.down = False
+        # Reported container memory use: bytes, or a function of the container name
+        self.memory_bytes = memory_bytes
+        self.boot_delay = boot_delay
+        self.run_delay = run_delay
+        # Status of every /run answer; set e.g. 500 to make runners fail
+        self.run_status = 200
+        self._containers: Dict[str, FakeContainer] = {}
+        self._images: Dict[str, FakeImage] = {}
+        self._lock = threading.Lock()
+        self.calls: Counter = Counter()
+
+    def _count(self, call: str) -> None:
+        if self.down:
+            raise ConnectionError("Docker daemon is not answering")
+        with self._lock:
+            self.calls[call] += 1
+
+    @property
+    def total_calls(self) -> int:
+        with self._lock:
+            return sum(self.calls.values())
+
+    def set_down(self, down: bool = True) -> None:
+        """Simulate the host going away (its runners die too) or coming back."""
+        self.down = down
+        if down:
+            with self._lock:
+                containers = list(self._containers.values())
+            for cont in containers:
+                cont.kill()
+
+    def ping(self) -> bool:
+        self._count("ping")
+        return True
+
+    def ensure_network(self):
+        self._count("ensure_network")
+
+    def get_container(self, name: str):
+        self._count("get_container")
+        with self._lock:
+            cont = self._containers.get(name)
+        if cont is None or cont._status == "exited":
+            raise LookupError(f"No such container: {name}")
+        # Like the Docker SDK, a fetched container carries fresh attributes
+        cont._sync()
+        return cont
+
+    def run_container(
+        self,
+        image: str,
+        name: str,
+        ports: Dict[str, int],
+        environment: Optional[Dict[str, str]] = None,
+        volumes: Optional[Dict[str, Dict[str, str]]] = None,
+        labels: Optional[Dict[str, str]] = None,
+        resources: Optional[Dict] = None,
+    ):
+        self._count("run_container")
+        with self._lock:
+            snapshot = self._images.get(image)
+        preload = None
+        if snapshot is not None:
+            labels = dict(snapshot.labels, **(labels or {}))
+            env = dict(snapshot.environment, **(environment or {}))
+            preload = snapshot.files.get(env.get("RUNNER_PRELOAD"))
+        cont = FakeContainer(self, name, self.boot_delay, self.run_delay, labels, preload)
+        cont.attrs["HostConfig"] = host_config(resources)
+        with self._lock:
+            self._containers[name] = cont
+        return cont
+
+    def update_container(self, name: str, resources: Dict):
+        self._count("update_container")
+        self.get_container(name).attrs["HostConfig"].update(host_config(resources))
+
+    def container_memory(self, name: str) -> int:
+        self._count("container_memory")
+        self.get_container(name)
+        if callable(self.memory_bytes):
+            return self.memory_bytes(name)
+        return self.memory_bytes
+
+    def list_containers(self, labels: Dict[str, str]):
+        self._count("list_containers")
+        with self._lock:
+            containers = list(self._containers.values())
+        matching = []
+        for cont in containers:
+            if cont._status == "running" and all(cont.labels.get(k) == v for k, v in labels.items()):
+                cont._sync()
+                matching.append(cont)
+        return matching
+
+    def snapshot_container(
+        self,
+        name: str,
+        image: str,
+        files: Dict[str, str],
+        environment: Dict[str, str],
+        labels: Dict[str, str],
+    ):
+        self._count("snapshot_container")
+        cont = self.get_container(name)
+        snapshot = FakeImage(image, dict(cont.labels, **labels), dict(environment), dict(files))
+        with self._lock:
+            self._images[image] = snapshot
+        return snapshot
+
+    def list_images(self, labels: Dict[str, str]):
+        self._count("list_images")
+        with self._lock:
+            images = list(self._images.values())
+        return [image for image in images if all(image.labels.get(k) == v for k, v in labels.items())]
+
+    def remove_image(self, image: str):
+        self._count("remove_image")
+        with self._lock:
+            self._images.pop(image, None)
+
+    def remove_container(self, name: str):
+        self._count("remove_container")
+        with self._lock:
+            cont = self._containers.pop(name, None)
+        if cont is not None:
+            cont.remove()
+
+    def remove_network(self):
+        self._count("remove_network")
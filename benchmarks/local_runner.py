@@ -0,0 +1,61 @@
+"""Start `runner/runner.py` as a local uvicorn process for benchmarking."""
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import time
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+RUNNER_DIR = os.path.normpath(os.path.join(THIS_DIR, os.pardir, "runner"))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"runner did not listen on port {port} within {timeout}s")
+
+
+def spawn_runner(port: int, env=None) -> subprocess.Popen:
+    """Launch a runner process listening on 127.0.0.1:`port`.
+
+    If `env` sets RUNNER_UDS, it listens on that Unix socket instead.
+    """
+    proc_env = dict(os.environ, RUNNER_IDLE_TTL="0")
+    proc_env.update(env or {})
+    if proc_env.get("RUNNER_UDS"):
+        listen = ["--uds", proc_env["RUNNER_UDS"]]
+    else:
+        listen = ["--host", "127.0.0.1", "--port", str(port)]
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "runner:app", *listen, "--log-level", "warning"],
+        cwd=RUNNER_DIR,
+        env=proc_env,
+    )
+
+
+@contextlib.contextmanager
+def local_runner(env=None):
+    """Yield the `host:port` of a freshly started runner process."""
+    port = free_port()
+    proc = spawn_runner(port, env)
+    try:
+        wait_for_port(port)
+        yield f"127.0.0.1:{port}"
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
@@ -0,0 +1,174 @@
+"""Dispatcher + runner benchmark suite with machine-readable JSON output.
+
+Runs against real `runner/runner.py` processes started by
+`SubprocessDockerService` (or the in-process fake with --backend fake) and
+measures:
+
+- cold_start: first call for a new code hash
+- warm_latency: sequential warm calls, p50/p99
+- throughput: calls/s and p99 at 1..256 concurrent callers
+- churn: round-robin calls over many distinct code hashes
+- payload_scaling: warm latency by request payload size
+
+Run: python benchmarks/run_suite.py --output results.json
+Compare two runs by diffing their JSON files.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+THIS_DIR = os.path.dirname(__file__)
+REPO_ROOT = os.path.normpath(os.path.join(THIS_DIR, os.pardir))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from lambda_poc.dispatcher import Dispatcher
+from common import summarize
+from fake_docker import FakeDockerService
+from subprocess_docker import SubprocessDockerService
+
+
+ECHO_CODE = """
+def entrypoint(data):
+    return data
+"""
+
+
+def make_code(tag):
+    return f"def entrypoint(data):\n    return {{'tag': {tag!r}, 'data': data}}\n"
+
+
+def make_docker(backend):
+    if backend == "fake":
+        return FakeDockerService()
+    return SubprocessDockerService()
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def bench_cold_start(args):
+    with Dispatcher(docker_service=make_docker(args.backend)) as d:
+        samples = [timed(d.run, make_code(f"cold-{i}"), {}) for i in range(args.cold_starts)]
+        ready = d.stats()["timings"].get("container_ready_seconds", {})
+    result = summarize(samples)
+    result["readiness_avg_ms"] = ready.get("avg", 0) * 1000
+    return result
+
+
+def bench_warm_latency(args):
+    with Dispatcher(docker_service=make_docker(args.backend)) as d:
+        d.run(ECHO_CODE, {})
+        return summarize([timed(d.run, ECHO_CODE, {"x": 1}) for _ in range(args.warm_calls)])
+
+
+def bench_throughput(args):
+    results = {}
+    with Dispatcher(docker_service=make_docker(args.backend), http_pool_size=max(args.concurrency)) as d:
+        d.run(ECHO_CODE, {})
+        for callers in args.concurrency:
+            deadline = time.perf_counter() + args.duration
+
+            def worker(_):
+                samples = []
+                while time.perf_counter() < deadline:
+                    samples.append(timed(d.run, ECHO_CODE, {"x": 1}))
+                return samples
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(callers) as pool:
+                samples = [s for chunk in pool.map(worker, range(callers)) for s in chunk]
+            elapsed = time.perf_counter() - start
+            results[str(callers)] = dict(summarize(samples), calls_per_second=len(samples) / elapsed)
+    return results
+
+
+def bench_churn(args):
+    codes = [make_code(f"churn-{i}") for i in range(args.churn_hashes)]
+    with Dispatcher(docker_service=make_docker(args.backend)) as d:
+        first_pass = [timed(d.run, code, {}) for code in codes]
+        warm_passes = [timed(d.run, code, {}) for _ in range(args.churn_rounds) for code in codes]
+        containers = d.stats()["gauges"]["containers"]
+    return {
+        "hashes": len(codes),
+        "first_pass": summarize(first_pass),
+        "warm_passes": summarize(warm_passes),
+        "containers": containers,
+    }
+
+
+def bench_payload_scaling(args):
+    results = {}
+    with Dispatcher(docker_service=make_docker(args.backend)) as d:
+        d.run(ECHO_CODE, {})
+        for size in args.payload_sizes:
+            payload = {"blob": "x" * size}
+            samples = [timed(d.run, ECHO_CODE, payload) for _ in range(args.payload_calls)]
+            results[str(size)] = summarize(samples)
+    return results
+
+
+BENCHMARKS = {
+    "cold_start": bench_cold_start,
+    "warm_latency": bench_warm_latency,
+    "throughput": bench_throughput,
+    "churn": bench_churn,
+    "payload_scaling": bench_payload_scaling,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["subprocess", "fake"], default="subprocess")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file to write")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="run a subset")
+    parser.add_argument("--cold-starts", type=int, default=5)
+    parser.add_argument("--warm-calls", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64, 256])
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per throughput level")
+    parser.add_argument("--churn-hashes", type=int, default=20)
+    parser.add_argument("--churn-rounds", type=int, default=5)
+    parser.add_argument("--payload-sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--payload-calls", type=int, default=50)
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": {},
+    }
+    for name in args.only or BENCHMARKS:
+        print(f"running {name}...", flush=True)
+        report["results"][name] = BENCHMARKS[name](args)
+        print(json.dumps(report["results"][name], indent=2), flush=True)
+
+    with open(args.output, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Docker-free `DockerService` stand-in that runs real runner processes.
+
+Each "container" is `runner/runner.py` served by uvicorn in a local
+subprocess on a free port, so benchmarks exercise the real runner code,
+HTTP stack and JSON handling without a Docker daemon.
+"""
+import subprocess
+import threading
+from collections import Counter
+from typing import Dict, Optional
+
+from fake_docker import host_config
+from local_runner import free_port, spawn_runner
+
+
+class SubprocessContainer:
+    """Mimics the subset of `docker.models.containers.Container` we use."""
+
+    def __init__(
+        self,
+        service: "SubprocessDockerService",
+        name: str,
+        ports: Dict[str, int],
+        environment: Optional[Dict[str, str]],
+        volumes: Optional[Dict[str, Dict[str, str]]] = None,
+        labels: Optional[Dict[str, str]] = None,
+    ):
+        self._service = service
+        self.name = name
+        self.labels = dict(labels or {})
+        self.attrs: Dict = {"HostConfig": {}}
+        port = free_port()
+        env = dict(environment or {})
+        # No mount namespace: point env vars naming paths under a mount
+        # target at the host path instead
+        for host_path, spec in (volumes or {}).items():
+            target = spec["bind"]
+            for key, value in env.items():
+                if value == target or value.startswith(target + "/"):
+                    env[key] = host_path + value[len(target):]
+        self._proc = spawn_runner(port, env)
+        # Like Docker, ports are published as soon as the container starts;
+        # the dispatcher's readiness probe waits for the server itself.
+        self.ports = {}
+        if "8080/tcp" in ports:
+            self.ports["8080/tcp"] = [{"HostIp": "127.0.0.1", "HostPort": str(port)}]
+        self.status = "running"
+
+    def _sync(self) -> None:
+        self.status = "running" if self._proc.poll() is None else "exited"
+
+    def reload(self) -> None:
+        self._service._count("container.reload")
+        self._sync()
+
+    def start(self) -> None:
+        self._service._count("container.start")
+
+    def kill(self) -> None:
+        if self._proc.poll() is None:
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+                self._proc.wait()
+        self.status = "exited"
+
+    def remove(self) -> None:
+        self.kill()
+
+
+class SubprocessDockerService:
+    """Drop-in replacement for `lambda_poc.services.DockerService`.
+
+    Simulated Docker API round-trips are counted in `calls` like in
+    `fake_docker.FakeDockerService`.
+    """
+
+    def __init__(self, network: str = "subprocess"):
+        self.network = network
+        # Runners listen on this machine
+        self.host = None
+        self._containers: Dict[str, SubprocessContainer] = {}
+        self._lock = threading.Lock()
+        self.calls: Counter = Counter()
+
+    def _count(self, call: str) -> None:
+        with self._lock:
+            self.calls[call] += 1
+
+    def ensure_network(self):
+        self._count("ensure_network")
+
+    def ping(self) -> bool:
+        self._count("ping")
+        return True
+
+    def get_container(self, name: str):
+        self._count("get_container")
+        with self._lock:
+            cont = self._containers.get(name)
+        if cont is None:
+            raise LookupError(f"No such container: {name}")
+        cont._sync()
+        if cont.status == "exited":
+            # auto_remove: exited containers disappear
+            raise LookupError(f"No such container: {name}")
+        return cont
+
+    def run_container(
+        self,
+        image: str,
+        name: str,
+        ports: Dict[str, int],
+        environment: Optional[Dict[str, str]] = None,
+        volumes: Optional[Dict[str, Dict[str, str]]] = None,
+        labels: Optional[Dict[str, str]] = None,
+        resources: Optional[Dict] = None,
+    ):
+        self._count("run_container")
+        cont = SubprocessContainer(self, name, ports, environment, volumes, labels)
+        cont.attrs["HostConfig"] = host_config(resources)
+        with self._lock:
+            self._containers[name] = cont
+        return cont
+
+    def update_container(self, name: str, resources: Dict):
+        self._count("update_container")
+        self.get_container(name).attrs["HostConfig"].update(host_config(resources))
+
+    def container_memory(self, name: str) -> int:
+        """Resident set size of the runner process."""
+        self._count("container_memory")
+        pid = self.get_container(name)._proc.pid
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def list_containers(self, labels: Dict[str, str]):
+        self._count("list_containers")
+        with self._lock:
+            containers = list(self._containers.values())
+        matching = []
+        for cont in containers:
+            cont._sync()
+            if cont.status == "running" and all(cont.labels.get(k) == v for k, v in labels.items()):
+                matching.append(cont)
+        return matching
+
+    def remove_container(self, name: str):
+        self._count("remove_container")
+        with self._lock:
+            cont = self._containers.pop(name, None)
+        if cont is not None:
+            cont.remove()
+
+    def remove_network(self):
+        self._count("remove_network")
+        # Make sure no runner process outlives the benchmark
+        with self._lock:
+            leftovers = list(self._containers.values())
+            self._containers.clear()
+        for cont in leftovers:
+            cont.remove()
@@ -1,6 +1,7 @@
 from typing import Optional
 import random
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 import os
 import sys
 
@@ -9,9 +10,13 @@ REPO_ROOT = os.path.normpath(os.path.join(THIS_DIR, os.pardir))
 if REPO_ROOT not in sys.path:
     sys.path.insert(0, REPO_ROOT)
 
-from lambda_poc.dispatcher import run_in_docker
+from lambda_poc import AdmissionRejected, AsyncDispatcher, CircuitOpenError, DeadlineExceeded
+from lambda_poc.dispatcher import get_default_dispatcher
 
 app = FastAPI()
+# Non-blocking front-end over the shared default dispatcher, so a slow runner
+# doesn't tie up a threadpool worker per in-flight request
+dispatcher = AsyncDispatcher(dispatcher=get_default_dispatcher())
 
 # Pool of 5 different code implementations
 CODE_POOL = [
@@ -47,7 +52,7 @@ def entrypoint(data):
 ]
 
 @app.get("/greet")
-def greet(name: Optional[str] = None):
+async def greet(name: Optional[str] = None):
     """
     Call the dispatcher to execute a randomly selected code from CODE_POOL with payload {"name": name}
     and return the runner's JSON response.
@@ -58,15 +63,25 @@ def greet(name: Optional[str] = None):
     selected_code = random.choice(CODE_POOL)
     
     try:
-        result = run_in_docker(selected_code, payload)
+        result = await dispatcher.run(selected_code, payload, timeout=5)
         # Add information about which container was used
         result["code_index"] = CODE_POOL.index(selected_code) + 1
+    except DeadlineExceeded as exc:
+        raise HTTPException(status_code=504, detail=str(exc))
+    except (AdmissionRejected, CircuitOpenError) as exc:
+        # Overloaded or failing: ask the client to come back later
+        raise HTTPException(status_code=503, detail=str(exc))
     except Exception as exc:
         # surface runner / dispatcher errors as HTTP 500
         raise HTTPException(status_code=500, detail=str(exc))
     
     return result
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Dispatcher counters, gauges and phase histograms for Prometheus to scrape."""
+    return dispatcher.dispatcher.prometheus_metrics()
+
 if __name__ == "__main__":
     # Run with: python -m examples.fastapi_example
     # Requires uvicorn installed: pip install uvicorn
@@ -26,6 +26,9 @@ def entrypoint(data):
     payload = {"n": 10}
     d = Dispatcher()
     print("Dispatcher.run ->", d.run(code, payload))
+    # Deterministic function: repeats are answered from the result cache
+    print("Dispatcher.run(memoize=True) ->", d.run(code, payload, memoize=True))
+    print("again, cached ->", d.run(code, payload, memoize=True), d.stats()["counters"].get("memo_hits"))
     print("run_in_docker ->", run_in_docker(code, payload))
 
 
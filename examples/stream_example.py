@@ -0,0 +1,32 @@
+"""Streaming example: a generator entrypoint whose items arrive one by one.
+
+Run: python examples/stream_example.py
+"""
+import os
+import sys
+
+THIS_DIR = os.path.dirname(__file__)
+REPO_ROOT = os.path.normpath(os.path.join(THIS_DIR, os.pardir))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from lambda_poc.dispatcher import Dispatcher
+
+
+def main():
+    code = """
+import time
+
+def entrypoint(data):
+    for i in range(data["count"]):
+        time.sleep(0.5)
+        yield {"step": i}
+"""
+
+    with Dispatcher() as d:
+        for item in d.stream(code, {"count": 5}):
+            print("Dispatcher.stream ->", item)
+
+
+if __name__ == "__main__":
+    main()
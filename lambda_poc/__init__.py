@@ -1,8 +1,24 @@
 """Library package for lambda-poc dispatcher functionality.
 
-Expose a Dispatcher class and a module-level convenience function
-`run_in_docker` for backward compatibility.
+Expose a Dispatcher class, its asyncio counterpart AsyncDispatcher, a
+ClusterDispatcher spreading functions over several Docker hosts and a
+module-level convenience function `run_in_docker` for backward
+compatibility.
 """
+from .async_dispatcher import AsyncDispatcher
+from .cluster import ClusterDispatcher
 from .dispatcher import Dispatcher, get_default_dispatcher, run_in_docker
+from .errors import AdmissionRejected, CircuitOpenError, DeadlineExceeded, RunnerUnavailable, UserCodeError
 
-__all__ = ["Dispatcher", "get_default_dispatcher", "run_in_docker"]
+__all__ = [
+    "AdmissionRejected",
+    "AsyncDispatcher",
+    "CircuitOpenError",
+    "ClusterDispatcher",
+    "DeadlineExceeded",
+    "Dispatcher",
+    "RunnerUnavailable",
+    "UserCodeError",
+    "get_default_dispatcher",
+    "run_in_docker",
+]
@@ -0,0 +1,203 @@
+"""Admission control: global and per-function concurrency limits.
+
+Calls beyond the limits wait in a bounded queue, one FIFO per code hash.
+Freed slots are handed to the queues in round-robin order, so one function
+with many queued calls can't starve the others. A call is rejected with
+`AdmissionRejected` right away when the queue is full, or once it has
+waited `queue_timeout` seconds, instead of piling onto a busy runner.
+"""
+import asyncio
+import contextlib
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+from .errors import AdmissionRejected, DeadlineExceeded
+from .metrics import Metrics
+
+
+class _Waiter:
+    __slots__ = ("wake", "admitted")
+
+    def __init__(self, wake: Callable[[], None]):
+        self.wake = wake
+        self.admitted = False
+
+
+def _set_result(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class AdmissionController:
+    """Limits concurrent calls overall and per code hash."""
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int],
+        max_concurrency_per_hash: Optional[int],
+        max_queued: int,
+        queue_timeout: float,
+        metrics: Metrics,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_concurrency_per_hash = max_concurrency_per_hash
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.metrics = metrics
+        # code_hash -> limit overriding max_concurrency_per_hash
+        self._limits: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Admitted calls, overall and per hash
+        self.running = 0
+        self._running_by_hash: Dict[str, int] = {}
+        # code_hash -> waiting calls; the hash served last moves to the end
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self.queued = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrency is not None or self.max_concurrency_per_hash is not None or bool(self._limits)
+
+    def set_limit(self, code_hash: str, limit: Optional[int]) -> None:
+        """Override the concurrency limit of one hash (None restores the default)."""
+        with self._lock:
+            if limit is None:
+                self._limits.pop(code_hash, None)
+            else:
+                self._limits[code_hash] = limit
+            # A raised limit may admit waiting calls
+            self._dispatch()
+
+    def _can_run(self, code_hash: str) -> bool:
+        if self.max_concurrency is not None and self.running >= self.max_concurrency:
+            return False
+        limit = self._limits.get(code_hash, self.max_concurrency_per_hash)
+        return limit is None or self._running_by_hash.get(code_hash, 0) < limit
+
+    def _admit(self, code_hash: str) -> None:
+        self.running += 1
+        self._running_by_hash[code_hash] = self._running_by_hash.get(code_hash, 0) + 1
+
+    def _dispatch(self) -> None:
+        """Admit waiting calls while slots are free, one hash at a time."""
+        progress = True
+        while progress and self._queues:
+            progress = False
+            for code_hash in list(self._queues):
+                if self.max_concurrency is not None and self.running >= self.max_concurrency:
+                    return
+                if not self._can_run(code_hash):
+                    continue
+                queue = self._queues[code_hash]
+                waiter = queue.popleft()
+                if queue:
+                    self._queues.move_to_end(code_hash)
+                else:
+                    del self._queues[code_hash]
+                self.queued -= 1
+                self._admit(code_hash)
+                waiter.admitted = True
+                waiter.wake()
+                progress = True
+
+    def _enqueue(self, code_hash: str, wake: Callable[[], None]) -> Optional[_Waiter]:
+        """Admit a call right away (returns None) or queue it."""
+        with self._lock:
+            if not self._queues.get(code_hash) and self._can_run(code_hash):
+                self._admit(code_hash)
+                return None
+            if self.queued >= self.max_queued:
+                self.metrics.incr("admission_rejected")
+                raise AdmissionRejected(f"Admission queue is full ({self.queued} calls waiting)")
+            waiter = _Waiter(wake)
+            self._queues.setdefault(code_hash, deque()).append(waiter)
+            self.queued += 1
+            return waiter
+
+    def _withdraw(self, code_hash: str, waiter: _Waiter) -> bool:
+        """Remove a waiter that gave up; False if it was admitted meanwhile."""
+        with self._lock:
+            if waiter.admitted:
+                return False
+            queue = self._queues[code_hash]
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[code_hash]
+            self.queued -= 1
+            return True
+
+    def _release(self, code_hash: str) -> None:
+        with self._lock:
+            self.running -= 1
+            remaining = self._running_by_hash[code_hash] - 1
+            if remaining:
+                self._running_by_hash[code_hash] = remaining
+            else:
+                del self._running_by_hash[code_hash]
+            self._dispatch()
+
+    def _wait_time(self, deadline: Optional[float]) -> Tuple[float, bool]:
+        """How long a queued call may wait, and whether its deadline is what limits it."""
+        if deadline is not None and deadline - time.monotonic() < self.queue_timeout:
+            return max(deadline - time.monotonic(), 0), True
+        return self.queue_timeout, False
+
+    def _timed_out(self, by_deadline: bool) -> Exception:
+        if by_deadline:
+            self.metrics.incr("deadline_exceeded")
+            return DeadlineExceeded("Deadline exceeded waiting for admission")
+        self.metrics.incr("admission_timeouts")
+        return AdmissionRejected(f"Not admitted within {self.queue_timeout} seconds")
+
+    @contextlib.contextmanager
+    def slot(self, code_hash: str, deadline: Optional[float] = None):
+        """Hold a concurrency slot for `code_hash`, waiting for one if needed.
+
+        The wait ends at `queue_timeout` or the call's `deadline` (a
+        `time.monotonic()` value), whichever comes first.
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.monotonic()
+        event = threading.Event()
+        waiter = self._enqueue(code_hash, event.set)
+        if waiter is not None:
+            timeout, by_deadline = self._wait_time(deadline)
+            if not event.wait(timeout) and self._withdraw(code_hash, waiter):
+                raise self._timed_out(by_deadline)
+        self.metrics.observe("admission_wait_seconds", time.monotonic() - start)
+        try:
+            yield
+        finally:
+            self._release(code_hash)
+
+    @contextlib.asynccontextmanager
+    async def aslot(self, code_hash: str, deadline: Optional[float] = None):
+        """Async version of `slot`; waits without blocking the event loop."""
+        if not self.enabled:
+            yield
+            return
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = self._enqueue(code_hash, lambda: loop.call_soon_threadsafe(_set_result, future))
+        if waiter is not None:
+            timeout, by_deadline = self._wait_time(deadline)
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout)
+            except asyncio.TimeoutError:
+                if self._withdraw(code_hash, waiter):
+                    raise self._timed_out(by_deadline)
+            except asyncio.CancelledError:
+                if not self._withdraw(code_hash, waiter):
+                    # Admitted just as we were cancelled; free the slot again
+                    self._release(code_hash)
+                raise
+        self.metrics.observe("admission_wait_seconds", time.monotonic() - start)
+        try:
+            yield
+        finally:
+            self._release(code_hash)
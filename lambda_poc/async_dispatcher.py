@@ -0,0 +1,261 @@
+"""asyncio front-end for the Dispatcher.
+
+`AsyncDispatcher` shares the container cache, TTL cleanup and creation logic
+of a regular `Dispatcher` but calls runners with a non-blocking HTTP client.
+Cold starts (Docker SDK calls, readiness polling, /load) run in worker
+threads so they never block the event loop; warm calls stay on the loop.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+
+from .codecs import JSON_CODEC
+from .constants import DEFAULT_ASYNC_MAX_CONNECTIONS
+from .dispatcher import Dispatcher, _decode_stream_line
+from .errors import DeadlineExceeded, RunnerUnavailable, UserCodeError
+from .payloads import decode_response, encode_request
+from .retry import classify_response
+from .transport import AsyncUnixSocketTransport
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDispatcher:
+    def __init__(self, *, dispatcher: Optional[Dispatcher] = None, max_connections: int = DEFAULT_ASYNC_MAX_CONNECTIONS, **dispatcher_kwargs):
+        """Wrap `dispatcher`, or create a new `Dispatcher` from `dispatcher_kwargs`."""
+        self._owns_dispatcher = dispatcher is None
+        self.dispatcher = dispatcher or Dispatcher(**dispatcher_kwargs)
+        self.max_connections = max_connections
+        # Bound to the running event loop, so created on first use
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            limits = httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            )
+            # Wait for a free connection instead of failing when the pool is busy
+            timeout = httpx.Timeout(30, pool=None)
+            transport = None
+            if self.dispatcher.socket_dir is not None:
+                # Runners listen on Unix sockets; route by runner name
+                transport = AsyncUnixSocketTransport(self.dispatcher._socket_path, limits)
+            self._client = httpx.AsyncClient(limits=limits, timeout=timeout, transport=transport)
+        return self._client
+
+    async def _ensure_container(self, code_hash: str, user_code: str, deadline: Optional[float]) -> Dict:
+        replica = self.dispatcher._lookup_container(code_hash, user_code)
+        if replica is not None:
+            self.dispatcher.metrics.incr("cache_hits")
+            return replica
+        # The thread can't be cancelled and returns the replica counted as in
+        # flight; if we are cancelled meanwhile, release it once it's there
+        picked = asyncio.ensure_future(
+            asyncio.to_thread(self.dispatcher._ensure_container, code_hash, user_code, deadline)
+        )
+        try:
+            return await asyncio.shield(picked)
+        except asyncio.CancelledError:
+            picked.add_done_callback(self._release_abandoned)
+            raise
+
+    def _release_abandoned(self, picked: asyncio.Future) -> None:
+        if not picked.cancelled() and picked.exception() is None:
+            self.dispatcher._release_replica(picked.result())
+
+    async def run(
+        self, user_code: str, input_data: dict, memoize: bool = False, timeout: Optional[float] = None
+    ) -> dict:
+        """Run `entrypoint(input_data)` of `user_code`; see `Dispatcher.run`."""
+        code_hash = self.dispatcher._hash_code(user_code)
+        deadline = self.dispatcher._deadline(timeout)
+        if memoize:
+            return await self.dispatcher.memo.acall(
+                code_hash, input_data, lambda: self._run(code_hash, user_code, input_data, deadline), deadline
+            )
+        return await self._run(code_hash, user_code, input_data, deadline)
+
+    async def _run(self, code_hash: str, user_code: str, input_data: Any, deadline: Optional[float]) -> Any:
+        with self.dispatcher.metrics.phase("invoke", code_hash=code_hash, path="/run"):
+            async with self.dispatcher.admission.aslot(code_hash, deadline):
+                try:
+                    replica, resp, elapsed = await self._send(code_hash, user_code, "/run", input_data, deadline)
+                except DeadlineExceeded:
+                    self.dispatcher.metrics.incr("deadline_exceeded")
+                    raise
+                self.dispatcher._release_replica(replica, elapsed)
+                with self.dispatcher.metrics.phase("response_decode"):
+                    return decode_response(resp.headers, resp.content, self.dispatcher.payloads)
+
+    async def stream(self, user_code: str, input_data: Any, timeout: Optional[float] = None) -> AsyncIterator[Any]:
+        """Async version of `Dispatcher.stream`."""
+        code_hash = self.dispatcher._hash_code(user_code)
+        deadline = self.dispatcher._deadline(timeout)
+        async with self.dispatcher.admission.aslot(code_hash, deadline):
+            replica, resp, _ = await self._send(code_hash, user_code, "/run_stream", input_data, deadline, stream=True)
+            try:
+                async for line in resp.aiter_lines():
+                    if line:
+                        yield _decode_stream_line(line)
+            except httpx.ReadTimeout as e:
+                raise DeadlineExceeded("Deadline exceeded") from e
+            finally:
+                await resp.aclose()
+                self.dispatcher._release_replica(replica)
+
+    async def _send(
+        self, code_hash: str, user_code: str, path: str, body: Any, deadline: Optional[float], stream: bool = False
+    ) -> Tuple[Dict, httpx.Response, float]:
+        """Async version of `Dispatcher._send`."""
+        dispatcher = self.dispatcher
+        client = self._get_client()
+        max_attempts = dispatcher.retry_policy.max_attempts
+        idempotency_key = uuid.uuid4().hex
+        last_exception = None
+        # Whether the last attempt got an answer from a runner
+        answered = False
+
+        for attempt in range(max_attempts):
+            if attempt:
+                dispatcher.metrics.incr("retries")
+                await asyncio.sleep(dispatcher.retry_policy.delay(attempt, deadline))
+            dispatcher.breaker.check(code_hash)
+            try:
+                # Pick a replica (creating the first one if needed)
+                replica = await self._ensure_container(code_hash, user_code, deadline)
+            except (UserCodeError, DeadlineExceeded):
+                dispatcher.breaker.record(code_hash, None)
+                raise
+            except Exception as e:
+                dispatcher.breaker.record(code_hash, False)
+                last_exception = e
+                answered = False
+                logger.warning(f"Attempt {attempt+1}/{max_attempts} to start a runner failed: {e}")
+                continue
+            except BaseException:
+                # Cancelled: a trial call must not keep the circuit half-open
+                dispatcher.breaker.record(code_hash, None)
+                raise
+
+            start = time.monotonic()
+            try:
+                resp = await self._post(client, replica, path, body, stream, deadline, idempotency_key)
+            except (httpx.NetworkError, httpx.ConnectTimeout) as e:
+                # The runner may be gone; re-resolve the container before the next attempt.
+                dispatcher._release_replica(replica)
+                dispatcher.breaker.record(code_hash, False)
+                last_exception = e
+                answered = False
+                logger.warning(f"Attempt {attempt+1}/{max_attempts} to run code failed: {e}")
+                await asyncio.to_thread(dispatcher._revalidate_container, code_hash, replica)
+                continue
+            except httpx.TimeoutException as e:
+                dispatcher._release_replica(replica, time.monotonic() - start)
+                dispatcher.breaker.record(code_hash, None)
+                raise DeadlineExceeded(f"No answer from runner {replica['name']} by the deadline") from e
+            except BaseException:
+                dispatcher._release_replica(replica)
+                dispatcher.breaker.record(code_hash, None)
+                raise
+            elapsed = time.monotonic() - start
+            dispatcher._observe_exec_time(resp.headers)
+
+            try:
+                if resp.status_code >= 400 and stream:
+                    await resp.aread()
+            except BaseException:
+                dispatcher._release_replica(replica)
+                dispatcher.breaker.record(code_hash, None)
+                raise
+            error, retryable = classify_response(resp.status_code, resp.headers, resp.text if resp.status_code >= 400 else "")
+            if error is None:
+                dispatcher.breaker.record(code_hash, True)
+                return replica, resp, elapsed
+            dispatcher._release_replica(replica, elapsed)
+            dispatcher.breaker.record(code_hash, None if isinstance(error, DeadlineExceeded) else not retryable)
+            await resp.aclose()
+            if not retryable:
+                raise error
+            last_exception = error
+            answered = True
+            logger.warning(f"Attempt {attempt+1}/{max_attempts} to run code failed: {error}")
+
+        # If we got here, all attempts failed. `RunnerUnavailable` if the
+        # runner never answered: the host or its Docker daemon is the suspect
+        error_type = RuntimeError if answered else RunnerUnavailable
+        raise error_type(f"Failed to run code after {max_attempts} attempts: {last_exception}") from last_exception
+
+    async def _post(
+        self,
+        client: httpx.AsyncClient,
+        replica: Dict,
+        path: str,
+        body: Any,
+        stream: bool = False,
+        deadline: Optional[float] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> httpx.Response:
+        """POST `body` to a replica, encoded with the replica's codec.
+
+        With `stream`, the response body is left unread.
+        """
+        codec = replica["codec"]
+        payloads = self.dispatcher.payloads
+        metrics = self.dispatcher.metrics
+        call_headers, timeout = self.dispatcher._call_options(deadline, idempotency_key)
+        ref = None
+        with metrics.phase("request_encode"):
+            if replica["payload_ref"]:
+                content, headers, ref = payloads.encode_request(body, codec)
+            else:
+                content, headers = encode_request(body, codec)
+        try:
+            request = client.build_request(
+                "POST",
+                f"http://{replica['addr']}{path}",
+                content=content,
+                headers=dict(headers, **call_headers),
+                timeout=httpx.Timeout(timeout, pool=None),
+            )
+            with metrics.phase("http_roundtrip", runner=replica["name"], path=path):
+                resp = await client.send(request, stream=stream)
+        finally:
+            if ref is not None:
+                payloads.discard(ref)
+        if resp.status_code == 415 and (codec is not JSON_CODEC or ref is not None):
+            await resp.aclose()
+            if codec is not JSON_CODEC:
+                # The runner can't decode this format; use JSON with it from now on
+                logger.warning(f"Runner {replica['name']} does not accept {codec.content_type}, falling back to JSON")
+                replica["codec"] = JSON_CODEC
+            else:
+                # The runner has no shared payload directory; send bodies inline
+                logger.warning(f"Runner {replica['name']} does not accept payload files, sending bodies inline")
+                replica["payload_ref"] = False
+            return await self._post(client, replica, path, body, stream, deadline, idempotency_key)
+        return resp
+
+    async def aclose(self) -> None:
+        """Close the HTTP client and shut down the dispatcher if we created it."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._owns_dispatcher:
+            await asyncio.to_thread(self.dispatcher.shutdown)
+
+    async def __aenter__(self) -> "AsyncDispatcher":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        try:
+            await self.aclose()
+        except Exception:
+            pass
+        return False
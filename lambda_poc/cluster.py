@@ -0,0 +1,349 @@
+"""Dispatching across several Docker hosts.
+
+`ClusterDispatcher` runs one `Dispatcher` per Docker daemon and sends each
+function (code hash) to a host picked on a consistent-hash ring, so a
+function's calls keep landing on the host that has its runners warm. When
+a host stops answering, calls go to the next host on the ring until a
+health check sees it back. Adding or removing a host only moves the
+functions whose ring segment changes owner, roughly 1/N of them; runners
+left behind on their old host are reclaimed by its TTL cleanup.
+"""
+import bisect
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, TypeVar
+
+import requests
+from docker.errors import DockerException
+
+from .constants import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CALL_TIMEOUT_SECONDS,
+    DEFAULT_HEALTH_CHECK_SECONDS,
+    DEFAULT_RING_VNODES,
+)
+from .dispatcher import Dispatcher
+from .errors import DeadlineExceeded, RunnerUnavailable
+from .metrics import Metrics
+from .retry import remaining
+from .services import DockerService
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Failures that show the host or its Docker daemon can't be reached, or
+# can't start a runner. A runner's own errors (5xx answers, an open circuit)
+# would follow the function to any other host.
+_HOST_ERRORS = (RunnerUnavailable, OSError, requests.RequestException, DockerException)
+
+
+def _ring_position(key: str) -> int:
+    return int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hashing of keys onto hosts, with `vnodes` points per host."""
+
+    def __init__(self, vnodes: int = DEFAULT_RING_VNODES):
+        if vnodes < 1:
+            raise ValueError("A host needs at least one point on the ring")
+        self.vnodes = vnodes
+        # Sorted ring positions and the host owning each
+        self._positions: List[int] = []
+        self._owners: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._positions) // self.vnodes
+
+    def add(self, host: str) -> None:
+        for i in range(self.vnodes):
+            position = _ring_position(f"{host}#{i}")
+            index = bisect.bisect(self._positions, position)
+            self._positions.insert(index, position)
+            self._owners.insert(index, host)
+
+    def remove(self, host: str) -> None:
+        kept = [(p, h) for p, h in zip(self._positions, self._owners) if h != host]
+        self._positions = [p for p, _ in kept]
+        self._owners = [h for _, h in kept]
+
+    def hosts(self, key: str) -> List[str]:
+        """All hosts in ring order from `key`: its owner first, then the fallbacks."""
+        if not self._positions:
+            return []
+        start = bisect.bisect(self._positions, _ring_position(key))
+        found: List[str] = []
+        for i in range(len(self._positions)):
+            host = self._owners[(start + i) % len(self._positions)]
+            if host not in found:
+                found.append(host)
+                if len(found) * self.vnodes == len(self._positions):
+                    break
+        return found
+
+
+class ClusterDispatcher:
+    """Routes functions to Docker hosts by consistent hashing, with failover.
+
+    `hosts` maps a host name to the `DockerService` of its daemon, e.g.
+    `DockerService(network, base_url="tcp://10.0.0.5:2376")`. The other
+    keyword arguments configure every host's `Dispatcher`; options naming
+    local paths (`registry_path`, `socket_dir`, `payload_dir`) only make
+    sense when all daemons run on this machine.
+    """
+
+    def __init__(
+        self,
+        hosts: Dict[str, DockerService],
+        *,
+        vnodes: int = DEFAULT_RING_VNODES,
+        health_check_seconds: float = DEFAULT_HEALTH_CHECK_SECONDS,
+        **dispatcher_kwargs: Any,
+    ):
+        if "docker_service" in dispatcher_kwargs:
+            raise ValueError("Pass each host's DockerService in `hosts`")
+        self.dispatcher_kwargs = dispatcher_kwargs
+        self.call_timeout_seconds = dispatcher_kwargs.get("call_timeout_seconds", DEFAULT_CALL_TIMEOUT_SECONDS)
+        self.health_check_seconds = health_check_seconds
+        self.metrics = Metrics()
+        self.ring = HashRing(vnodes)
+        self.lock = threading.Lock()
+        self._services: Dict[str, DockerService] = {}
+        # Started on a host's first call, so a host that is down at start
+        # doesn't stop the others
+        self._dispatchers: Dict[str, Dispatcher] = {}
+        self._start_locks: Dict[str, threading.Lock] = {}
+        # Hosts whose daemon didn't answer the last ping
+        self._down: Set[str] = set()
+        # Per-function settings, replayed on every host's dispatcher
+        self._settings: List[Tuple[str, tuple, dict]] = []
+        self._stop_event = threading.Event()
+        for name, service in hosts.items():
+            self.add_host(name, service)
+        threading.Thread(target=self._health_check, daemon=True).start()
+
+    def _hash_code(self, user_code: str) -> str:
+        return hashlib.sha256(user_code.encode()).hexdigest()[:16]
+
+    def add_host(self, name: str, service: DockerService) -> None:
+        """Add a Docker host; it takes over about 1/N of the functions."""
+        with self.lock:
+            if name in self._services:
+                raise ValueError(f"Host {name} is already in the cluster")
+            self._services[name] = service
+            self._start_locks[name] = threading.Lock()
+            self.ring.add(name)
+        logger.info(f"Host {name} joined the cluster")
+
+    def remove_host(self, name: str) -> None:
+        """Take a host out of rotation and shut down its dispatcher."""
+        with self.lock:
+            if name not in self._services:
+                raise KeyError(name)
+            self.ring.remove(name)
+            del self._services[name]
+            del self._start_locks[name]
+            self._down.discard(name)
+            dispatcher = self._dispatchers.pop(name, None)
+        logger.info(f"Host {name} left the cluster")
+        if dispatcher is not None:
+            try:
+                dispatcher.shutdown()
+            except Exception as e:
+                logger.warning(f"Failed to shut down the dispatcher of host {name}: {e}")
+
+    def host_for(self, user_code: str) -> Optional[str]:
+        """The host `user_code` is currently sent to (skipping hosts that are down)."""
+        candidates = self._candidates(self._hash_code(user_code))
+        return candidates[0] if candidates else None
+
+    def _candidates(self, code_hash: str) -> List[str]:
+        # Hosts known to be down are still tried, but only after all others
+        with self.lock:
+            hosts = self.ring.hosts(code_hash)
+            down = set(self._down)
+        return [h for h in hosts if h not in down] + [h for h in hosts if h in down]
+
+    def _dispatcher(self, name: str) -> Dispatcher:
+        with self.lock:
+            dispatcher = self._dispatchers.get(name)
+            if dispatcher is not None:
+                return dispatcher
+            service = self._services[name]
+            start_lock = self._start_locks[name]
+        with start_lock:
+            with self.lock:
+                dispatcher = self._dispatchers.get(name)
+                settings = list(self._settings)
+            if dispatcher is not None:
+                return dispatcher
+            dispatcher = Dispatcher(docker_service=service, **self.dispatcher_kwargs)
+            for method, args, kwargs in settings:
+                getattr(dispatcher, method)(*args, **kwargs)
+            with self.lock:
+                if name in self._services and not self._stop_event.is_set():
+                    self._dispatchers[name] = dispatcher
+                    return dispatcher
+        # Removed (or shut down) while it was starting
+        dispatcher.shutdown()
+        raise RuntimeError(f"Host {name} left the cluster")
+
+    def _ping(self, name: str) -> bool:
+        with self.lock:
+            service = self._services.get(name)
+        if service is None:
+            return False
+        try:
+            up = bool(service.ping())
+        except Exception:
+            up = False
+        with self.lock:
+            if name not in self._services:
+                return False
+            was_down = name in self._down
+            if up:
+                self._down.discard(name)
+            else:
+                self._down.add(name)
+        if up and was_down:
+            self.metrics.incr("hosts_recovered")
+            logger.info(f"Host {name} is back")
+        elif not up and not was_down:
+            self.metrics.incr("hosts_marked_down")
+            logger.warning(f"Host {name} is not answering; failing over its functions")
+        return up
+
+    def _health_check(self) -> None:
+        while not self._stop_event.wait(self.health_check_seconds):
+            with self.lock:
+                names = list(self._services)
+            for name in names:
+                self._ping(name)
+
+    def _deadline(self, timeout: Optional[float]) -> Optional[float]:
+        if timeout is None:
+            timeout = self.call_timeout_seconds
+        return None if timeout is None else time.monotonic() + timeout
+
+    def _route(self, code_hash: str, deadline: Optional[float], call: Callable[[Dispatcher, Optional[float]], T]) -> T:
+        """Run `call(dispatcher, timeout)` on the first host that can take it.
+
+        Host failures (see `_HOST_ERRORS`) move on to the next host on the
+        ring; any other error, including a passed deadline, is raised.
+        """
+        candidates = self._candidates(code_hash)
+        if not candidates:
+            raise RuntimeError("No hosts in the cluster")
+        last_exception: Optional[BaseException] = None
+        for name in candidates:
+            left = remaining(deadline)
+            try:
+                return call(self._dispatcher(name), left)
+            except DeadlineExceeded:
+                # A TimeoutError, hence an OSError, but not the host's fault
+                raise
+            except (KeyError, *_HOST_ERRORS) as e:
+                last_exception = e
+                self.metrics.incr("host_failures")
+                logger.warning(f"Host {name} failed to run {code_hash}: {e}")
+                # Later calls skip it only if it also misses a ping
+                self._ping(name)
+            if name != candidates[-1]:
+                self.metrics.incr("failovers")
+        raise RuntimeError(f"No host could run {code_hash}: {last_exception}")
+
+    def run(self, user_code: str, input_data: dict, memoize: bool = False, timeout: Optional[float] = None) -> dict:
+        """`Dispatcher.run` on the function's host; `timeout` covers failovers too."""
+        return self._route(
+            self._hash_code(user_code),
+            self._deadline(timeout),
+            lambda dispatcher, left: dispatcher.run(user_code, input_data, memoize=memoize, timeout=left),
+        )
+
+    def run_many(
+        self, user_code: str, inputs: List[Any], batch_size: int = DEFAULT_BATCH_SIZE, timeout: Optional[float] = None
+    ) -> List[Any]:
+        """`Dispatcher.run_many` on the function's host."""
+        return self._route(
+            self._hash_code(user_code),
+            self._deadline(timeout),
+            lambda dispatcher, left: dispatcher.run_many(user_code, inputs, batch_size=batch_size, timeout=left),
+        )
+
+    def stream(self, user_code: str, input_data: Any, timeout: Optional[float] = None) -> Iterator[Any]:
+        """`Dispatcher.stream` on the function's host.
+
+        Fails over only until the first item arrives; a host failing
+        mid-stream is raised, as its items can't be taken back.
+        """
+        def start(dispatcher: Dispatcher, left: Optional[float]) -> Tuple[Iterator[Any], List[Any]]:
+            items = dispatcher.stream(user_code, input_data, timeout=left)
+            try:
+                return items, [next(items)]
+            except StopIteration:
+                return items, []
+
+        items, head = self._route(self._hash_code(user_code), self._deadline(timeout), start)
+        try:
+            yield from head
+            yield from items
+        finally:
+            items.close()
+
+    def _apply(self, method: str, *args: Any, **kwargs: Any) -> None:
+        # Kept for hosts that start later
+        with self.lock:
+            self._settings.append((method, args, kwargs))
+            dispatchers = list(self._dispatchers.values())
+        for dispatcher in dispatchers:
+            getattr(dispatcher, method)(*args, **kwargs)
+
+    def set_scaling(self, user_code: str, *, min_replicas: int, max_replicas: int) -> None:
+        """`Dispatcher.set_scaling` on every host."""
+        if not 1 <= min_replicas <= max_replicas:
+            raise ValueError("Expected 1 <= min_replicas <= max_replicas")
+        self._apply("set_scaling", user_code, min_replicas=min_replicas, max_replicas=max_replicas)
+
+    def set_concurrency_limit(self, user_code: str, limit: Optional[int]) -> None:
+        """`Dispatcher.set_concurrency_limit` on every host (the limit is per host)."""
+        self._apply("set_concurrency_limit", user_code, limit)
+
+    def set_resources(self, user_code: str, *, cpus: int, memory_bytes: Optional[int] = None) -> None:
+        """`Dispatcher.set_resources` on every host."""
+        self._apply("set_resources", user_code, cpus=cpus, memory_bytes=memory_bytes)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Cluster counters and gauges, and each started host's `Dispatcher.stats()`."""
+        snapshot = self.metrics.snapshot()
+        with self.lock:
+            snapshot["gauges"] = {
+                "hosts": len(self._services),
+                "hosts_up": len(self._services) - len(self._down),
+                "hosts_started": len(self._dispatchers),
+            }
+            dispatchers = dict(self._dispatchers)
+        snapshot["hosts"] = {name: dispatcher.stats() for name, dispatcher in dispatchers.items()}
+        return snapshot
+
+    def shutdown(self) -> None:
+        if self._stop_event.is_set():
+            return
+        self._stop_event.set()
+        with self.lock:
+            dispatchers = list(self._dispatchers.items())
+            self._dispatchers.clear()
+        for name, dispatcher in dispatchers:
+            try:
+                dispatcher.shutdown()
+            except Exception as e:
+                logger.warning(f"Failed to shut down the dispatcher of host {name}: {e}")
+
+    def __enter__(self) -> "ClusterDispatcher":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.shutdown()
+        return False
@@ -0,0 +1,100 @@
+"""Pluggable body codecs for Dispatcher <-> runner calls.
+
+`/run` and `/run_batch` bodies are encoded with a codec chosen per
+Dispatcher and announced with the Content-Type header; the runner answers
+in the same format (via Accept) when it supports it. orjson and msgpack are
+used when installed, stdlib json is always available.
+"""
+import json
+import re
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+JSON_CONTENT_TYPE = "application/json"
+MSGPACK_CONTENT_TYPE = "application/x-msgpack"
+# bytes bodies and results are sent as-is
+RAW_CONTENT_TYPE = "application/octet-stream"
+
+
+class Codec:
+    """A named body format: encoder, decoder and its content type."""
+
+    def __init__(self, name: str, content_type: str, encode: Callable[[Any], bytes], decode: Callable[[bytes], Any]):
+        self.name = name
+        self.content_type = content_type
+        self.encode = encode
+        self.decode = decode
+        # Ask the runner to answer in the same format (or raw bytes)
+        self.headers = {"Content-Type": content_type, "Accept": f"{content_type}, {RAW_CONTENT_TYPE}"}
+
+    def __repr__(self) -> str:
+        return f"Codec({self.name!r})"
+
+
+JSON_CODEC = Codec(
+    "json",
+    JSON_CONTENT_TYPE,
+    lambda obj: json.dumps(obj, separators=(",", ":")).encode(),
+    json.loads,
+)
+
+CODECS: Dict[str, Codec] = {"json": JSON_CODEC}
+
+# orjson only handles 64-bit integers: it refuses to write bigger ones and
+# reads them as floats. Such bodies go through stdlib json, like before
+# orjson was used. 20+ digits in a row may be such an integer.
+_LONG_NUMBER = re.compile(rb"\d{20}")
+
+
+def _orjson_dumps(obj: Any) -> bytes:
+    try:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    except TypeError:
+        return JSON_CODEC.encode(obj)
+
+
+def _orjson_loads(data: bytes) -> Any:
+    if _LONG_NUMBER.search(data):
+        return json.loads(data)
+    return orjson.loads(data)
+
+
+if orjson is not None:
+    CODECS["orjson"] = Codec("orjson", JSON_CONTENT_TYPE, _orjson_dumps, _orjson_loads)
+
+if msgpack is not None:
+    CODECS["msgpack"] = Codec(
+        "msgpack",
+        MSGPACK_CONTENT_TYPE,
+        lambda obj: msgpack.packb(obj, use_bin_type=True),
+        lambda data: msgpack.unpackb(data, raw=False, strict_map_key=False),
+    )
+
+
+def get_codec(name: Optional[str] = None) -> Codec:
+    """Return the codec called `name`, or the fastest JSON codec if None."""
+    if name is None:
+        return CODECS.get("orjson", JSON_CODEC)
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Codec {name!r} is not available (installed: {', '.join(sorted(CODECS))})")
+
+
+def decode_body(content_type: Optional[str], data: bytes) -> Any:
+    """Decode a runner response according to its Content-Type."""
+    mime = (content_type or JSON_CONTENT_TYPE).split(";")[0].strip()
+    if mime == RAW_CONTENT_TYPE:
+        return data
+    if mime == MSGPACK_CONTENT_TYPE:
+        return get_codec("msgpack").decode(data)
+    return get_codec().decode(data)
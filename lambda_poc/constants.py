@@ -3,3 +3,84 @@
 DEFAULT_TTL_SECONDS = 300
 DEFAULT_NETWORK = "runners"
 RUNNER_IMAGE = "runner-service"
+# Max keep-alive connections held per runner container
+DEFAULT_HTTP_POOL_SIZE = 16
+# Max concurrent connections held by an AsyncDispatcher across all runners
+DEFAULT_ASYNC_MAX_CONNECTIONS = 1000
+# Readiness probing backoff: first delay and cap between GET /healthz probes
+READY_POLL_INITIAL_SECONDS = 0.01
+READY_POLL_MAX_SECONDS = 0.1
+# Max inputs sent to a runner in one /run_batch request by Dispatcher.run_many
+DEFAULT_BATCH_SIZE = 100
+# Autoscaling: in-flight calls per replica before another replica is added,
+# and how long an extra replica may go without traffic before it is removed
+DEFAULT_TARGET_CONCURRENCY = 1
+DEFAULT_SCALE_DOWN_IDLE_SECONDS = 60
+# Shared payload directory: host tmpfs the per-dispatcher directory is
+# created in, and where it is mounted inside runner containers
+DEFAULT_PAYLOAD_DIR = "/dev/shm"
+RUNNER_PAYLOAD_MOUNT = "/payloads"
+# Unix socket transport: where a runner's socket directory is mounted
+# inside its container, and the socket's file name
+RUNNER_SOCKET_MOUNT = "/sockets"
+RUNNER_SOCKET_NAME = "runner.sock"
+# Name prefix of warm-pool runners (see Dispatcher._add_pooled_runner)
+POOL_RUNNER_PREFIX = "runner_pool_"
+# Labels set on runner containers so a restarted (or another) dispatcher
+# can recognize and adopt them
+LABEL_NETWORK = "lambda_poc.network"
+LABEL_IMAGE = "lambda_poc.image"
+LABEL_CODE_HASH = "lambda_poc.code_hash"
+LABEL_SOCKET = "lambda_poc.socket"
+LABEL_PAYLOAD_DIR = "lambda_poc.payload_dir"
+# Idle cleanup: how often the cleanup thread syncs the registry, refreshes
+# memory use and enforces the cache limits; how soon an expired but busy
+# function is looked at again; and how many runners are torn down at once
+HOUSEKEEPING_INTERVAL_SECONDS = 10
+EXPIRY_RECHECK_SECONDS = 1
+DEFAULT_TEARDOWN_WORKERS = 8
+# Container cap: how long a cold start waits for a busy container to become
+# evictable when the cache is full
+CAPACITY_WAIT_SECONDS = 30
+# Per-code-hash snapshot images: label naming the image they were committed
+# from, where the code file is written inside the runner, and how many
+# snapshot images are kept before the least recently used is removed
+LABEL_SNAPSHOT_OF = "lambda_poc.snapshot_of"
+RUNNER_PRELOAD_PATH = "/runner/preload.py"
+DEFAULT_MAX_SNAPSHOT_IMAGES = 10
+# Memoized results (run(..., memoize=True)): total encoded size kept and
+# how long a result stays valid
+DEFAULT_MEMO_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MEMO_TTL_SECONDS = 300
+# Dispatcher.stream: read size for a runner's NDJSON stream
+STREAM_READ_CHUNK_SIZE = 64 * 1024
+# Admission control: max calls waiting for a concurrency slot, and how long
+# a call may wait before it is rejected
+DEFAULT_MAX_QUEUED_CALLS = 1000
+DEFAULT_QUEUE_TIMEOUT_SECONDS = 30
+# Runner response header with the seconds spent in `entrypoint`
+EXEC_TIME_HEADER = "X-Exec-Seconds"
+# Runner calls: default per-call deadline (sent to the runner as the
+# remaining seconds so it can give up too), attempts per call and the
+# jittered exponential backoff between them
+DEFAULT_CALL_TIMEOUT_SECONDS = 30
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY_SECONDS = 0.05
+RETRY_MAX_DELAY_SECONDS = 1.0
+DEADLINE_HEADER = "X-Deadline-Seconds"
+# How long past a deadline the dispatcher waits for the runner's own answer
+DEADLINE_GRACE_SECONDS = 1
+# Sent unchanged on every attempt of one call, so a runner that already
+# ran it answers a retry without running it again
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+# Set by the runner on error responses: "user" (entrypoint raised) or
+# "deadline" (the call's deadline passed); neither is worth retrying
+ERROR_KIND_HEADER = "X-Error-Kind"
+# Circuit breaker: consecutive runner failures of one function before its
+# calls fail fast, and how long until a trial call is let through
+DEFAULT_CIRCUIT_FAILURE_THRESHOLD = 5
+DEFAULT_CIRCUIT_RESET_SECONDS = 30
+# ClusterDispatcher: points per Docker host on the consistent-hash ring
+# (more spread functions more evenly) and how often every host is pinged
+DEFAULT_RING_VNODES = 64
+DEFAULT_HEALTH_CHECK_SECONDS = 5
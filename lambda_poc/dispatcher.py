@@ -7,221 +7,1723 @@ cleanup, and provides a `run` method.
 from __future__ import annotations
 
 import hashlib
+import heapq
 import logging
+import os
 import requests
+import shutil
+import tempfile
 import time
 import threading
 import atexit
-from typing import Dict, Optional
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Deque, Dict, Iterator, List, Optional, Set, Tuple
 
 from .services import DockerService
-from .constants import DEFAULT_NETWORK, DEFAULT_TTL_SECONDS, RUNNER_IMAGE
+from .constants import (
+    CAPACITY_WAIT_SECONDS,
+    DEADLINE_GRACE_SECONDS,
+    DEADLINE_HEADER,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CALL_TIMEOUT_SECONDS,
+    DEFAULT_CIRCUIT_FAILURE_THRESHOLD,
+    DEFAULT_CIRCUIT_RESET_SECONDS,
+    DEFAULT_HTTP_POOL_SIZE,
+    DEFAULT_MAX_ATTEMPTS,
+    DEFAULT_MAX_QUEUED_CALLS,
+    DEFAULT_MAX_SNAPSHOT_IMAGES,
+    DEFAULT_MEMO_MAX_BYTES,
+    DEFAULT_MEMO_TTL_SECONDS,
+    DEFAULT_NETWORK,
+    DEFAULT_PAYLOAD_DIR,
+    DEFAULT_QUEUE_TIMEOUT_SECONDS,
+    DEFAULT_SCALE_DOWN_IDLE_SECONDS,
+    DEFAULT_TARGET_CONCURRENCY,
+    DEFAULT_TEARDOWN_WORKERS,
+    DEFAULT_TTL_SECONDS,
+    EXEC_TIME_HEADER,
+    EXPIRY_RECHECK_SECONDS,
+    HOUSEKEEPING_INTERVAL_SECONDS,
+    IDEMPOTENCY_KEY_HEADER,
+    LABEL_CODE_HASH,
+    LABEL_IMAGE,
+    LABEL_NETWORK,
+    LABEL_PAYLOAD_DIR,
+    LABEL_SNAPSHOT_OF,
+    LABEL_SOCKET,
+    POOL_RUNNER_PREFIX,
+    READY_POLL_INITIAL_SECONDS,
+    READY_POLL_MAX_SECONDS,
+    RETRY_BASE_DELAY_SECONDS,
+    RETRY_MAX_DELAY_SECONDS,
+    RUNNER_IMAGE,
+    RUNNER_PRELOAD_PATH,
+    RUNNER_SOCKET_MOUNT,
+    RUNNER_SOCKET_NAME,
+    STREAM_READ_CHUNK_SIZE,
+)
+from .admission import AdmissionController
+from .codecs import JSON_CODEC, get_codec
+from .errors import DeadlineExceeded, RunnerUnavailable, UserCodeError
+from .memo import Memoizer
+from .metrics import Metrics, SpanHook
+from .payloads import PayloadStore, decode_response, encode_request
+from .placement import (
+    Placer,
+    ResourceProfile,
+    docker_resources,
+    placement_from_host_config,
+    read_node_memory,
+    read_topology,
+)
+from .registry import ContainerRegistry
+from .retry import CircuitBreaker, RetryPolicy, classify_response, remaining
+from .transport import make_session
 
 logger = logging.getLogger(__name__)
 
 
+def _decode_stream_line(line) -> Any:
+    """Decode one line of a runner's /run_stream response."""
+    item = get_codec().decode(line)
+    if "error" in item:
+        if item.get("kind") == "deadline":
+            raise DeadlineExceeded(item["error"])
+        raise UserCodeError(item["error"])
+    return item["result"]
+
+
 class Dispatcher:
-    def __init__(self, *, ttl_seconds: int = DEFAULT_TTL_SECONDS, network: str = DEFAULT_NETWORK, image: str = RUNNER_IMAGE, docker_service: Optional[DockerService] = None):
+    def __init__(
+        self,
+        *,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+        network: str = DEFAULT_NETWORK,
+        image: str = RUNNER_IMAGE,
+        docker_service: Optional[DockerService] = None,
+        http_pool_size: int = DEFAULT_HTTP_POOL_SIZE,
+        pool_size: int = 0,
+        min_replicas: int = 1,
+        max_replicas: int = 1,
+        target_concurrency: int = DEFAULT_TARGET_CONCURRENCY,
+        scale_up_latency: Optional[float] = None,
+        scale_down_idle_seconds: float = DEFAULT_SCALE_DOWN_IDLE_SECONDS,
+        runner_environment: Optional[Dict[str, str]] = None,
+        codec: Optional[str] = None,
+        payload_threshold: Optional[int] = None,
+        payload_dir: str = DEFAULT_PAYLOAD_DIR,
+        unix_sockets: bool = False,
+        socket_dir: Optional[str] = None,
+        registry_path: Optional[str] = None,
+        keep_containers: bool = False,
+        max_containers: Optional[int] = None,
+        memory_limit_bytes: Optional[int] = None,
+        memory_weighted_eviction: bool = False,
+        snapshot_load_seconds: Optional[float] = None,
+        max_snapshot_images: int = DEFAULT_MAX_SNAPSHOT_IMAGES,
+        recycle_runners: bool = False,
+        memo_max_bytes: int = DEFAULT_MEMO_MAX_BYTES,
+        memo_ttl_seconds: float = DEFAULT_MEMO_TTL_SECONDS,
+        max_concurrency: Optional[int] = None,
+        max_concurrency_per_function: Optional[int] = None,
+        max_queued_calls: int = DEFAULT_MAX_QUEUED_CALLS,
+        queue_timeout_seconds: float = DEFAULT_QUEUE_TIMEOUT_SECONDS,
+        span_hook: Optional[SpanHook] = None,
+        call_timeout_seconds: Optional[float] = DEFAULT_CALL_TIMEOUT_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        circuit_failure_threshold: Optional[int] = DEFAULT_CIRCUIT_FAILURE_THRESHOLD,
+        circuit_reset_seconds: float = DEFAULT_CIRCUIT_RESET_SECONDS,
+        placement: bool = False,
+        runner_cpus: int = 1,
+        runner_memory_bytes: Optional[int] = None,
+        cpu_topology: Optional[Dict[int, List[int]]] = None,
+        runners_per_cpu: int = 1,
+        teardown_workers: int = DEFAULT_TEARDOWN_WORKERS,
+    ):
         self.ttl_seconds = ttl_seconds
         self.network = network
         self.image = image
         self.docker = docker_service or DockerService(network)
+        self.http_pool_size = http_pool_size
+        # Extra env vars for every runner, e.g. RUNNER_EXEC_MODE / RUNNER_WORKERS
+        self.runner_environment = dict(runner_environment or {})
+        # Body format for /run and /run_batch ("json", "orjson", "msgpack");
+        # defaults to the fastest installed JSON codec
+        self.codec = get_codec(codec)
+        # Bodies and results of at least `payload_threshold` bytes go through
+        # a directory under `payload_dir` mounted into every runner instead
+        # of the HTTP body; None disables this
+        self.payloads = PayloadStore(payload_threshold, payload_dir) if payload_threshold is not None else None
+        # With `unix_sockets`, runners listen on a Unix socket in a per-runner
+        # directory under `socket_dir` (bind-mounted into the container)
+        # instead of a published TCP port; their address is their name. Pass
+        # a fixed `socket_dir` to adopt such runners after a restart.
+        self.socket_dir: Optional[str] = None
+        self._own_socket_dir = False
+        if unix_sockets:
+            if socket_dir is not None:
+                os.makedirs(socket_dir, exist_ok=True)
+                self.socket_dir = socket_dir
+            else:
+                self.socket_dir = tempfile.mkdtemp(prefix="lambda_poc-sockets-")
+                self._own_socket_dir = True
+        # Warm containers survive the dispatcher: `keep_containers` leaves
+        # them running at shutdown, and running runner containers of this
+        # network/image are adopted at startup and before cold starts. With
+        # `registry_path` they are tracked in a file shared with other
+        # dispatcher processes instead of being looked up in Docker.
+        self.keep_containers = keep_containers
+        self.registry = ContainerRegistry(registry_path) if registry_path is not None else None
+        # Number of pre-started, code-less runners kept ready for new hashes
+        self.pool_size = pool_size
+        # With `recycle_runners`, runners of removed replicas go back to the
+        # pool (up to `pool_size` of them, next to the code-less ones)
+        # instead of being torn down. Runners keep
+        # the compiled code of every hash they loaded, so one switching back
+        # to a function it ran before is sent just the hash. Functions then
+        # share runner processes, so only enable it for code that may.
+        self.recycle_runners = recycle_runners
+        # Counters and per-phase timings; `span_hook(name, attributes)` may
+        # return a context manager (e.g. an OpenTelemetry span) to run each
+        # phase in
+        self.metrics = Metrics(span_hook)
+        # Results of calls made with `memoize=True`, and their calls in flight
+        self.memo = Memoizer(memo_max_bytes, memo_ttl_seconds, self.codec, self.metrics)
+        # Admission control: at most `max_concurrency` calls in flight overall
+        # and `max_concurrency_per_function` per hash (see
+        # `set_concurrency_limit`); others wait, fairly across hashes, in a
+        # queue of `max_queued_calls` for up to `queue_timeout_seconds`, and
+        # are rejected with AdmissionRejected beyond that. No limits, no queue.
+        self.admission = AdmissionController(
+            max_concurrency, max_concurrency_per_function, max_queued_calls, queue_timeout_seconds, self.metrics
+        )
+        # Runner calls: each gets `call_timeout_seconds` (or its own
+        # `timeout`) and the runner is told how much is left, so it gives up
+        # too. Connection errors and runner failures are retried, up to
+        # `max_attempts` in total with jittered backoff; errors raised by the
+        # user's code are not. After `circuit_failure_threshold` runner
+        # failures in a row (None disables this), calls to that function
+        # fail fast with CircuitOpenError for `circuit_reset_seconds`.
+        self.call_timeout_seconds = call_timeout_seconds
+        self.retry_policy = RetryPolicy(max_attempts, RETRY_BASE_DELAY_SECONDS, RETRY_MAX_DELAY_SECONDS)
+        self.breaker = CircuitBreaker(circuit_failure_threshold, circuit_reset_seconds, self.metrics)
+
+        # Autoscaling: default replica limits per hash (see `set_scaling`),
+        # in-flight calls per replica before another one is added, optional
+        # latency (seconds) above which a busy hash also scales up, and how
+        # long an extra replica may sit idle before it is removed.
+        self.min_replicas = min_replicas
+        self.max_replicas = max_replicas
+        self.target_concurrency = target_concurrency
+        self.scale_up_latency = scale_up_latency
+        self.scale_down_idle_seconds = scale_down_idle_seconds
+        # code_hash -> (min_replicas, max_replicas) overrides
+        self._scaling: Dict[str, Tuple[int, int]] = {}
+        # code_hash -> replicas currently being added in the background
+        self._scaling_pending: Dict[str, int] = {}
 
-        # code_hash -> {name, last_used}
+        # Bounded container cache: at most `max_containers` loaded runners
+        # and/or `memory_limit_bytes` of their memory use (from Docker stats).
+        # A new container evicts the least recently used idle ones; with
+        # `memory_weighted_eviction` the victim is the one with the largest
+        # idle time x memory, so big cold containers go first.
+        self.max_containers = max_containers
+        self.memory_limit_bytes = memory_limit_bytes
+        self.memory_weighted_eviction = memory_weighted_eviction
+        # Containers being created that already count against the cap
+        self._reserved = 0
+        # Names of evicted runners still being torn down in the background
+        self._removing: Set[str] = set()
+
+        # CPU / memory placement: with `placement`, every runner is pinned to
+        # CPUs of one NUMA node and gets `runner_cpus` of them and a
+        # `runner_memory_bytes` limit, unless `set_resources` says otherwise
+        # for its function. `cpu_topology` ({node: [cpu, ...]}) defaults to
+        # this host's; pass it when Docker runs elsewhere. At most
+        # `runners_per_cpu` runners share a CPU; a runner that doesn't fit
+        # evicts idle ones or waits, like a full container cache.
+        self.placer: Optional[Placer] = None
+        if placement:
+            node_memory = read_node_memory() if cpu_topology is None else None
+            self.placer = Placer(cpu_topology or read_topology(), node_memory, runners_per_cpu)
+        self.resource_profile = ResourceProfile(runner_cpus, runner_memory_bytes)
+        # code_hash -> ResourceProfile overrides
+        self._profiles: Dict[str, ResourceProfile] = {}
+
+        # Snapshot images: a runner whose /load took at least
+        # `snapshot_load_seconds` is committed, code file included, as image
+        # `<image>:<code_hash>`. Runners started from it load the code at
+        # boot, so later cold starts of that hash skip /load, and files its
+        # import wrote (e.g. downloaded models) are already there. At most
+        # `max_snapshot_images` are kept; None disables snapshots.
+        self.snapshot_load_seconds = snapshot_load_seconds
+        self.max_snapshot_images = max_snapshot_images
+        # code_hash -> last time its snapshot image was created or started
+        self._snapshots: Dict[str, float] = {}
+        # Hashes being committed in the background
+        self._snapshotting: Set[str] = set()
+
+        # code_hash -> {replicas, code, last_used}; each replica is
+        # {name, addr, session, codec, payload_ref, in_flight, last_used,
+        # latency, memory, fresh, code_hashes}
         self.containers: Dict[str, Dict] = {}
-        # Lock to protect access to containers dict
+        # Lock to protect access to containers dict. It is only held for
+        # bookkeeping, never across Docker or HTTP calls.
         self.lock = threading.RLock()
+        # Signalled when a replica becomes idle or is removed, for cold starts
+        # waiting on a full cache
+        self._capacity = threading.Condition(self.lock)
+        # Idle expiry timers: a heap of (due, kind, code_hash), "ttl" for a
+        # hash's `ttl_seconds` and "scale" for its extra replicas'
+        # `scale_down_idle_seconds`. Calls only bump `last_used`; a timer
+        # that fires early is pushed back to the real due time, so cleanup
+        # looks at due hashes only instead of scanning them all.
+        self._timers: List[Tuple[float, str, str]] = []
+        # (kind, code_hash) -> due time of its live timer
+        self._timer_due: Dict[Tuple[str, str], float] = {}
+        self._timer_wakeup = threading.Event()
+        # Runners are torn down (expiry, eviction, shutdown) by up to
+        # `teardown_workers` at once
+        self._teardown = ThreadPoolExecutor(max_workers=teardown_workers, thread_name_prefix="runner-teardown")
+        # code_hash -> Future of a container creation in flight
+        self._inflight: Dict[str, Future] = {}
+        # Warm pool of ready runners: {name, addr, session, code_hashes}, where
+        # code_hashes are the hashes the runner has compiled before
+        self._pool: Deque[Dict] = deque()
+        # Pool runners currently being started
+        self._pool_pending = 0
+        self._pool_wakeup = threading.Event()
 
         self._stop_event = threading.Event()
         self.docker.ensure_network()
+        if self.snapshot_load_seconds is not None:
+            self._load_snapshots()
+        self._adopt_containers()
         threading.Thread(target=self._cleanup_idle, daemon=True).start()
+        if self.pool_size > 0:
+            threading.Thread(target=self._refill_pool, daemon=True).start()
 
     def _hash_code(self, user_code: str) -> str:
         return hashlib.sha256(user_code.encode()).hexdigest()[:16]
 
-    def _ensure_container(self, code_hash: str, user_code: str) -> str:
-        name = f"runner_{code_hash}"
-        
+    def set_scaling(self, user_code: str, *, min_replicas: int, max_replicas: int) -> None:
+        """Override the replica limits for one function."""
+        if not 1 <= min_replicas <= max_replicas:
+            raise ValueError("Expected 1 <= min_replicas <= max_replicas")
+        code_hash = self._hash_code(user_code)
         with self.lock:
-            # Check if we already have a container for this code hash
+            self._scaling[code_hash] = (min_replicas, max_replicas)
             if code_hash in self.containers:
-                try:
-                    cont = self.docker.get_container(name)
-                    if cont.status != "running":
-                        cont.start()
-                        self._wait_for_container_ready(cont)
-                    
-                    # Update last used time
-                    self.containers[code_hash]["last_used"] = time.time()
-                    cont.reload()
-                    host_ip = cont.ports["8080/tcp"][0]["HostIp"]
-                    host_port = cont.ports["8080/tcp"][0]["HostPort"]
-                    return f"{host_ip}:{host_port}"
-                except Exception as e:
-                    logger.warning(f"Error checking existing container: {e}")
-                    # Container might be in a bad state, remove it from our cache
+                # Extra replicas under the new minimum may be due already
+                self._schedule("scale", code_hash, time.time())
+
+    def set_concurrency_limit(self, user_code: str, limit: Optional[int]) -> None:
+        """Limit concurrent calls of one function (None restores the default)."""
+        self.admission.set_limit(self._hash_code(user_code), limit)
+
+    def set_resources(self, user_code: str, *, cpus: int, memory_bytes: Optional[int] = None) -> None:
+        """Override the CPUs and memory limit of one function's runners (with `placement`)."""
+        profile = ResourceProfile(cpus, memory_bytes)
+        with self.lock:
+            self._profiles[self._hash_code(user_code)] = profile
+
+    def _resource_profile(self, code_hash: Optional[str]) -> ResourceProfile:
+        if code_hash is None:
+            return self.resource_profile
+        return self._profiles.get(code_hash, self.resource_profile)
+
+    def _replica_limits(self, code_hash: str) -> Tuple[int, int]:
+        return self._scaling.get(code_hash, (self.min_replicas, self.max_replicas))
+
+    def _ensure_container(self, code_hash: str, user_code: str, deadline: Optional[float] = None) -> Dict:
+        """Pick a loaded replica for `code_hash`, creating the first one if needed.
+
+        The returned replica has its in-flight count incremented; callers
+        must hand it back with `_release_replica`. Warm calls are served from
+        `self.containers` without talking to Docker; a replica is only
+        re-checked against Docker by `_revalidate_container` when a call to
+        its runner fails to connect.
+
+        A cold start runs in its own thread, with its own time limits
+        (readiness, cache capacity, placement); callers wait for it until
+        their `deadline` and raise `DeadlineExceeded` after that, leaving it
+        to finish for the next call.
+        """
+        name = f"runner_{code_hash}"
+
+        first_lookup = True
+        while True:
+            with self.lock:
+                replica = self._lookup_container(code_hash, user_code)
+                if replica is not None:
+                    if first_lookup:
+                        self.metrics.incr("cache_hits")
+                    return replica
+                if first_lookup:
+                    self.metrics.incr("cache_misses")
+                    first_lookup = False
+
+                # Single-flight: the first caller for a hash starts the
+                # container, everybody waits on its future.
+                future = self._inflight.get(code_hash)
+                if future is None:
+                    future = Future()
+                    self._inflight[code_hash] = future
+                    threading.Thread(
+                        target=self._create_inflight, args=(code_hash, name, user_code, future), daemon=True
+                    ).start()
+
+            try:
+                future.result(timeout=remaining(deadline))
+            except FutureTimeout:
+                raise DeadlineExceeded(f"No runner for {code_hash} was ready by the deadline")
+
+    def _create_inflight(self, code_hash: str, name: str, user_code: str, future: Future) -> None:
+        """Create the first replica of `code_hash` for the callers waiting on `future`."""
+        try:
+            self._create_container(code_hash, name, user_code)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(None)
+        finally:
+            with self.lock:
+                self._inflight.pop(code_hash, None)
+
+    def _lookup_container(self, code_hash: str, user_code: Optional[str] = None) -> Optional[Dict]:
+        """Return the least busy replica for `code_hash`, if it is warm.
+
+        Replicas are picked by fewest outstanding requests, ties going to
+        the oldest replica so extra replicas drain when load drops. Adds a
+        replica in the background when the pick is already saturated.
+        """
+        with self.lock:
+            entry = self.containers.get(code_hash)
+            if entry is None or not entry["replicas"]:
+                return None
+            if entry["code"] is None:
+                # Adopted hashes learn their source on first use
+                entry["code"] = user_code
+            replica = min(entry["replicas"], key=lambda r: r["in_flight"])
+            self._maybe_scale_up(code_hash, entry, replica)
+            replica["in_flight"] += 1
+            replica["fresh"] = False
+            entry["last_used"] = replica["last_used"] = time.time()
+            return replica
+
+    def _release_replica(self, replica: Dict, elapsed: Optional[float] = None) -> None:
+        """Return a replica picked by `_ensure_container` after a call."""
+        with self.lock:
+            replica["in_flight"] -= 1
+            if replica["in_flight"] == 0 and self._bounded():
+                self._capacity.notify_all()
+            replica["last_used"] = time.time()
+            if elapsed is not None:
+                # Exponentially weighted moving average of call latency
+                replica["latency"] = elapsed if replica["latency"] is None else 0.8 * replica["latency"] + 0.2 * elapsed
+
+    def _maybe_scale_up(self, code_hash: str, entry: Dict, replica: Dict) -> None:
+        """Start another replica if the hash is below its minimum or saturated.
+
+        Must be called with `self.lock` held.
+        """
+        min_replicas, max_replicas = self._replica_limits(code_hash)
+        pending = self._scaling_pending.get(code_hash, 0)
+        total = len(entry["replicas"]) + pending
+        if total >= max_replicas or self._stop_event.is_set() or entry["code"] is None:
+            return
+        saturated = replica["in_flight"] >= self.target_concurrency
+        slow = (
+            self.scale_up_latency is not None
+            and replica["in_flight"] > 0
+            and replica["latency"] is not None
+            and replica["latency"] > self.scale_up_latency
+        )
+        if total < min_replicas or saturated or slow:
+            self._scaling_pending[code_hash] = pending + 1
+            threading.Thread(target=self._add_replica, args=(code_hash, entry["code"]), daemon=True).start()
+
+    def _add_replica(self, code_hash: str, user_code: str) -> None:
+        name = f"runner_{code_hash}_{uuid.uuid4().hex[:8]}"
+        try:
+            # Scale-ups don't wait for room in a full cache
+            self._create_container(code_hash, name, user_code, wait_for_capacity=False)
+            self.metrics.incr("replicas_scaled_up")
+        except Exception as e:
+            logger.warning(f"Failed to add replica for code_hash {code_hash}: {e}")
+        finally:
+            with self.lock:
+                remaining = self._scaling_pending.get(code_hash, 1) - 1
+                if remaining > 0:
+                    self._scaling_pending[code_hash] = remaining
+                else:
+                    self._scaling_pending.pop(code_hash, None)
+
+    def _revalidate_container(self, code_hash: str, replica: Dict) -> None:
+        """Re-resolve a replica after its runner failed to answer.
+
+        A container that is still running keeps its replica (with a
+        refreshed address); one that is gone is dropped so the next call
+        picks another replica or recreates it.
+        """
+        with self.lock:
+            entry = self.containers.get(code_hash)
+            # Another caller may already have dropped the replica
+            if entry is None or replica not in entry["replicas"]:
+                return
+        try:
+            with self.metrics.phase("docker_lookup", name=replica["name"]):
+                cont = self.docker.get_container(replica["name"])
+            if cont.status == "running":
+                with self.lock:
+                    replica["addr"] = self._container_addr(cont)[0]
+                return
+        except Exception as e:
+            logger.warning(f"Error checking existing container: {e}")
+        with self.lock:
+            entry = self.containers.get(code_hash)
+            if entry is not None and replica in entry["replicas"]:
+                entry["replicas"].remove(replica)
+                if not entry["replicas"]:
                     self.containers.pop(code_hash, None)
-            
+        replica["session"].close()
+        if self.placer is not None:
+            self.placer.release(replica["name"])
+
+    def _create_container(self, code_hash: str, name: str, user_code: str, wait_for_capacity: bool = True) -> Dict:
+        """Start a replica for `code_hash`, load the code and register it.
+
+        A ready runner from the warm pool is used when available, so only
+        `/load` is needed. Runs without holding `self.lock` so cold starts for
+        one hash don't block callers of other hashes. When the container
+        cache is full, the coldest idle replicas are evicted first.
+        """
+        self._reserve_capacity(code_hash, wait_for_capacity)
+        try:
+            with self.lock:
+                if name in self._removing or any(r["name"] == name for r in self._pool) or any(
+                    r["name"] == name for r in self._replicas()
+                ):
+                    # An evicted runner with this name is still being torn
+                    # down, or was recycled and now serves another hash
+                    name = f"runner_{code_hash}_{uuid.uuid4().hex[:8]}"
+            replica = self._create_replica(code_hash, name, user_code, wait_for_capacity)
+            if self.memory_limit_bytes is not None or self.memory_weighted_eviction:
+                # Measure once now; the cleanup loop keeps it up to date
+                self._refresh_memory([replica])
+            return replica
+        finally:
+            if self._bounded():
+                with self._capacity:
+                    self._reserved -= 1
+                    self._capacity.notify_all()
+
+    def _create_replica(self, code_hash: str, name: str, user_code: str, wait_for_capacity: bool = True) -> Dict:
+        if name == f"runner_{code_hash}":
+            # Another dispatcher (or our previous run) may have left it warm
+            replica = self._adopt_named_runner(code_hash, name)
+            if replica is not None:
+                return replica
+
+        # Every other way out starts a runner for the hash: a cold start
+        replica = self._start_from_snapshot(code_hash, name, user_code, wait_for_capacity)
+        if replica is not None:
+            self.metrics.incr("cold_starts")
+            return replica
+
+        replica = self._claim_pooled_runner(code_hash, user_code)
+        if replica is not None:
+            self.metrics.incr("cold_starts")
+            return replica
+
+        logger.info(f"Creating new container for code_hash: {code_hash}")
+        try:
+            host_addr, session = self._start_runner(name, code_hash=code_hash, wait_for_capacity=wait_for_capacity)
+        except Exception as e:
+            logger.error(f"Failed to create container: {e}")
+            raise
+
+        try:
+            # Load the user code with retry logic
+            load_start = time.monotonic()
+            self._load_code_with_retry(host_addr, user_code, session=session)
+            load_seconds = time.monotonic() - load_start
+        except Exception as e:
+            logger.error(f"Failed to create container: {e}")
+            # Clean up in case of failure
+            self._remove_runner(name, session)
+            raise
+
+        replica = self._register_container(code_hash, user_code, name, host_addr, session)
+        self.metrics.incr("cold_starts")
+        self._maybe_snapshot(code_hash, user_code, name, load_seconds)
+        return replica
+
+    def _start_runner(
+        self,
+        name: str,
+        environment: Optional[Dict[str, str]] = None,
+        code_hash: Optional[str] = None,
+        image: Optional[str] = None,
+        wait_for_capacity: bool = False,
+    ) -> Tuple[str, requests.Session]:
+        """Start a runner container and wait until it answers.
+
+        Runners are started code-less from `self.image` unless another
+        `image` (a snapshot) is given. With placement, the runner is pinned
+        according to `code_hash`'s resource profile first; see `_place`.
+        """
+        socket_path = self._socket_path(name) if self.socket_dir is not None else None
+        session = make_session(self.http_pool_size, socket_path)
+        try:
+            # Remove any existing container with this name
+            self.docker.remove_container(name)
+
             # Create a new container
-            logger.info(f"Creating new container for code_hash: {code_hash}")
+            env = dict(self.runner_environment, **(environment or {}))
+            ports = {"8080/tcp": None}
+            volumes = {}
+            if self.payloads is not None:
+                env.update(self.payloads.environment())
+                volumes.update(self.payloads.volumes())
+            if socket_path is not None:
+                # Only this runner's own socket is visible inside its container
+                sock_dir = os.path.dirname(socket_path)
+                os.makedirs(sock_dir, exist_ok=True)
+                # Runners may run as a different user (see runner/Dockerfile)
+                os.chmod(sock_dir, 0o777)
+                volumes[sock_dir] = {"bind": RUNNER_SOCKET_MOUNT, "mode": "rw"}
+                env["RUNNER_UDS"] = f"{RUNNER_SOCKET_MOUNT}/{RUNNER_SOCKET_NAME}"
+                ports = {}
+            labels = {LABEL_NETWORK: self.network, LABEL_IMAGE: self.image, LABEL_CODE_HASH: code_hash or ""}
+            if self.payloads is not None:
+                labels[LABEL_PAYLOAD_DIR] = self.payloads.host_dir
+            if socket_path is not None:
+                labels[LABEL_SOCKET] = socket_path
+            resources = None
+            if self.placer is not None:
+                resources = docker_resources(self._place(name, code_hash, wait_for_capacity))
+            with self.metrics.phase("container_create", name=name, image=image or self.image):
+                cont = self.docker.run_container(
+                    image or self.image, name, ports, environment=env, volumes=volumes or None, labels=labels,
+                    resources=resources,
+                )
+
+            if socket_path is not None:
+                self._wait_for_container_ready(cont, session=session, host_addr=name)
+                return name, session
+
+            # Wait for container to be ready
+            self._wait_for_container_ready(cont, session=session)
+
+            # Resolve the host address once; warm calls reuse it
+            cont.reload()
+            return self._container_addr(cont)[0], session
+        except Exception:
+            # Clean up in case of failure
+            self._remove_runner(name, session)
+            raise
+
+    def _register_container(
+        self,
+        code_hash: str,
+        user_code: Optional[str],
+        name: str,
+        host_addr: str,
+        session: requests.Session,
+        last_used: Optional[float] = None,
+        payload_ref: Optional[bool] = None,
+        code_hashes: Optional[Set[str]] = None,
+    ) -> Dict:
+        """Add a loaded runner as a replica of `code_hash`.
+
+        `code_hashes` are other hashes the runner has compiled before.
+        """
+        now = time.time()
+        last_used = now if last_used is None else last_used
+        replica = {
+            "name": name,
+            "addr": host_addr,
+            "session": session,
+            "codec": self.codec,
+            "payload_ref": self.payloads is not None if payload_ref is None else payload_ref,
+            "in_flight": 0,
+            "last_used": last_used,
+            "latency": None,
+            "memory": None,
+            # Not evictable until its first call, so the caller that created
+            # it gets to use it
+            "fresh": True,
+            "code_hashes": set(code_hashes or ()) | {code_hash},
+        }
+        with self.lock:
+            if not self._stop_event.is_set():
+                entry = self.containers.setdefault(code_hash, {"replicas": [], "code": user_code, "last_used": last_used})
+                entry["last_used"] = max(entry["last_used"], last_used)
+                entry["replicas"].append(replica)
+                self._schedule("ttl", code_hash, entry["last_used"] + self.ttl_seconds)
+                if len(entry["replicas"]) > self._replica_limits(code_hash)[0]:
+                    self._schedule("scale", code_hash, last_used + self.scale_down_idle_seconds)
+                registered = True
+            else:
+                registered = False
+        if not registered:
+            # Dispatcher shut down while this runner was starting
+            self._remove_runner(name, session)
+            raise RuntimeError("Dispatcher is shut down")
+        if self.registry is not None:
+            self.registry.put(name, {
+                "code_hash": code_hash,
+                "addr": host_addr,
+                "socket": self._socket_path(name) if self.socket_dir is not None else None,
+                "payload_dir": self.payloads.host_dir if replica["payload_ref"] else None,
+                "last_used": last_used,
+                "placement": self.placer.get(name) if self.placer is not None else None,
+            })
+        return replica
+
+    def _container_addr(self, cont) -> Tuple[Optional[str], Optional[str]]:
+        """Return (address, socket path) of a runner container, if reachable."""
+        socket_path = cont.labels.get(LABEL_SOCKET)
+        if socket_path:
+            # Only sockets under our socket_dir are reachable through our transports
+            if self.socket_dir is None or socket_path != self._socket_path(cont.name):
+                return None, None
+            return cont.name, socket_path
+        if self.socket_dir is not None or not cont.ports.get("8080/tcp"):
+            return None, None
+        host_ip = self.docker.host or cont.ports["8080/tcp"][0]["HostIp"]
+        host_port = cont.ports["8080/tcp"][0]["HostPort"]
+        return f"{host_ip}:{host_port}", None
+
+    def _adopt_containers(self) -> None:
+        """Adopt loaded runners left running by a previous or another dispatcher.
+
+        Code-less warm-pool runners left behind are removed: they don't
+        time out on their own (see `_add_pooled_runner`).
+        """
+        try:
+            with self.metrics.phase("docker_lookup"):
+                containers = self.docker.list_containers({LABEL_NETWORK: self.network, LABEL_IMAGE: self.image})
+        except Exception as e:
+            logger.warning(f"Could not list runner containers to adopt: {e}")
+            containers = []
+        if self.registry is not None:
+            for name, record in self.registry.load().items():
+                self._adopt_runner(name, record["addr"], record.get("socket"), record.get("payload_dir"),
+                                   record["code_hash"], record.get("last_used"), record.get("placement"))
+        else:
+            for cont in containers:
+                addr, socket_path = self._container_addr(cont)
+                if addr is not None:
+                    self._adopt_runner(cont.name, addr, socket_path, cont.labels.get(LABEL_PAYLOAD_DIR),
+                                       placement=placement_from_host_config(cont.attrs.get("HostConfig") or {}))
+        with self.lock:
+            # Nobody is waiting for these; they may be evicted right away
+            for replica in self._replicas():
+                replica["fresh"] = False
+            adopted = {replica["name"] for replica in self._replicas()}
+        leftovers = [c.name for c in containers if c.name.startswith(POOL_RUNNER_PREFIX) and c.name not in adopted]
+        if leftovers:
+            logger.info(f"Removing {len(leftovers)} leftover pooled runners")
+            list(self._teardown.map(self.docker.remove_container, leftovers))
+            self.metrics.incr("pool_leftovers_removed", len(leftovers))
+
+    def _adopt_named_runner(self, code_hash: str, name: str) -> Optional[Dict]:
+        """Adopt the running container `name` for `code_hash`, if there is one."""
+        if self.registry is not None:
+            record = self.registry.get(name)
+            if record is None:
+                return None
+            return self._adopt_runner(name, record["addr"], record.get("socket"), record.get("payload_dir"),
+                                      code_hash, record.get("last_used"), record.get("placement"))
+        try:
+            with self.metrics.phase("docker_lookup", name=name):
+                cont = self.docker.get_container(name)
+        except Exception:
+            return None
+        if cont.status != "running" or cont.labels.get(LABEL_IMAGE) != self.image:
+            return None
+        addr, socket_path = self._container_addr(cont)
+        if addr is None:
+            return None
+        placement = placement_from_host_config(cont.attrs.get("HostConfig") or {})
+        return self._adopt_runner(name, addr, socket_path, cont.labels.get(LABEL_PAYLOAD_DIR), code_hash, None, placement)
+
+    def _adopt_runner(
+        self,
+        name: str,
+        addr: str,
+        socket_path: Optional[str],
+        payload_dir: Optional[str],
+        code_hash: Optional[str] = None,
+        last_used: Optional[float] = None,
+        placement: Optional[Dict] = None,
+    ) -> Optional[Dict]:
+        """Register an existing runner as a replica if it has code loaded.
+
+        The runner's /healthz tells which code it holds and how long it has
+        been idle. Code-less runners are not adopted; leftover pool runners
+        are removed by `_adopt_containers`. The CPUs of its `placement` count as taken.
+        """
+        # Unix-socket runners are only reachable through our own socket_dir
+        if socket_path != self._socket_path(name) or self._stop_event.is_set():
+            return None
+        session = make_session(self.http_pool_size, socket_path)
+        try:
+            health = session.get(f"http://{addr}/healthz", timeout=1).json()
+        except (requests.RequestException, ValueError):
+            session.close()
+            return None
+        loaded_hash = health.get("code_hash")
+        if not health.get("loaded") or not loaded_hash or (code_hash is not None and loaded_hash != code_hash):
+            session.close()
+            return None
+        last_used = max(last_used or 0, time.time() - health.get("idle_seconds", 0))
+        payload_ref = self.payloads is not None and payload_dir == self.payloads.host_dir
+        if self.placer is not None and placement is not None:
+            # Before registering, so the registry record carries it
+            self.placer.assign(name, loaded_hash, placement)
+        try:
+            replica = self._register_container(loaded_hash, None, name, addr, session, last_used, payload_ref)
+        except RuntimeError:
+            return None
+        self.metrics.incr("containers_adopted")
+        logger.info(f"Adopted runner {name} for code_hash: {loaded_hash}")
+        return replica
+
+    def _bounded(self) -> bool:
+        return self.max_containers is not None or self.memory_limit_bytes is not None or self.placer is not None
+
+    def _replicas(self) -> List[Dict]:
+        return [r for entry in self.containers.values() for r in entry["replicas"]]
+
+    def _over_capacity(self, extra: int) -> bool:
+        """Whether `extra` more containers would exceed the cache limits.
+
+        Must be called with `self.lock` held.
+        """
+        replicas = self._replicas()
+        if self.max_containers is not None and len(replicas) + self._reserved + extra > self.max_containers:
+            return True
+        if self.memory_limit_bytes is not None:
+            known = [r["memory"] for r in replicas if r["memory"] is not None]
+            if known:
+                # Containers not measured yet are assumed to be average
+                average = sum(known) / len(known)
+                projected = sum(known) + average * (len(replicas) - len(known) + self._reserved + extra)
+                if projected > self.memory_limit_bytes:
+                    return True
+        return False
+
+    def _pick_victim(self, exclude_hash: Optional[str] = None) -> Optional[Tuple[str, Dict]]:
+        """Return the coldest idle replica as (code_hash, replica).
+
+        Must be called with `self.lock` held.
+        """
+        now = time.time()
+        known = [r["memory"] for r in self._replicas() if r["memory"] is not None]
+        average = sum(known) / len(known) if known else 1
+        best, best_score = None, None
+        for code_hash, entry in self.containers.items():
+            if code_hash == exclude_hash:
+                continue
+            for replica in entry["replicas"]:
+                if replica["in_flight"] or replica["fresh"]:
+                    continue
+                score = now - replica["last_used"]
+                if self.memory_weighted_eviction:
+                    score *= replica["memory"] if replica["memory"] is not None else average
+                if best_score is None or score > best_score:
+                    best, best_score = (code_hash, replica), score
+        return best
+
+    def _evict(self, code_hash: str, replica: Dict) -> None:
+        """Drop a replica from the cache; must be called with `self.lock` held."""
+        entry = self.containers[code_hash]
+        entry["replicas"].remove(replica)
+        if not entry["replicas"]:
+            self.containers.pop(code_hash)
+        # A cold start must not reuse (or adopt) the name until it is torn down
+        self._removing.add(replica["name"])
+        self.metrics.incr("evictions")
+        if replica["memory"] is not None:
+            self.metrics.incr("evicted_memory_bytes", replica["memory"])
+        logger.info(f"Evicting runner {replica['name']} for code_hash: {code_hash}")
+
+    def _reserve_capacity(self, code_hash: str, wait: bool) -> None:
+        """Make room in the container cache for one more runner of `code_hash`.
+
+        Evicts the coldest idle replicas of other hashes until the new one
+        fits. If every container is busy, waits up to CAPACITY_WAIT_SECONDS
+        for one to become idle (or fails at once if `wait` is false).
+        """
+        if not self._bounded():
+            return
+        evicted = []
+        deadline = time.monotonic() + CAPACITY_WAIT_SECONDS
+        try:
+            with self._capacity:
+                while self._over_capacity(1):
+                    victim = self._pick_victim(exclude_hash=code_hash)
+                    if victim is not None:
+                        self._evict(*victim)
+                        evicted.append(victim[1])
+                        continue
+                    remaining = deadline - time.monotonic()
+                    if not wait or remaining <= 0 or self._stop_event.is_set():
+                        self.metrics.incr("capacity_rejections")
+                        raise RuntimeError("Container cache is full and all containers are busy")
+                    self._capacity.wait(remaining)
+                self._reserved += 1
+        finally:
+            # Tearing containers down is slow; don't make the cold start wait
+            for replica in evicted:
+                self._tear_down(replica)
+
+    def _place(self, name: str, code_hash: Optional[str], wait: bool) -> Dict:
+        """Reserve CPUs and memory for runner `name` of `code_hash` (None for the pool).
+
+        Like `_reserve_capacity`, evicts the coldest idle replicas of other
+        hashes until the runner fits, and waits up to CAPACITY_WAIT_SECONDS
+        if they are all busy (or fails at once if `wait` is false).
+        """
+        profile = self._resource_profile(code_hash)
+        evicted = []
+        deadline = time.monotonic() + CAPACITY_WAIT_SECONDS
+        try:
+            with self._capacity:
+                while True:
+                    placement = self.placer.place(name, code_hash, profile)
+                    if placement is not None:
+                        return placement
+                    victim = self._pick_victim(exclude_hash=code_hash) if wait else None
+                    if victim is not None:
+                        self._evict(*victim)
+                        # Idle and out of the cache: its CPUs are free now,
+                        # even though tearing it down takes a moment
+                        self.placer.release(victim[1]["name"])
+                        evicted.append(victim[1])
+                        continue
+                    remaining = deadline - time.monotonic()
+                    if not wait or remaining <= 0 or self._stop_event.is_set():
+                        self.metrics.incr("placement_rejections")
+                        raise RuntimeError(f"No room to place a runner with {profile.cpus} CPUs")
+                    self._capacity.wait(remaining)
+        finally:
+            for replica in evicted:
+                self._tear_down(replica)
+
+    def _repin(self, name: str, code_hash: str) -> None:
+        """Move a pooled runner claimed for `code_hash` to CPUs placed for that hash."""
+        old = self.placer.get(name)
+        placement = self.placer.move(name, code_hash, self._resource_profile(code_hash))
+        if placement is None or placement == old:
+            return
+        try:
+            self.docker.update_container(name, docker_resources(placement))
+        except Exception as e:
+            logger.warning(f"Could not move runner {name} to CPUs {placement['cpus']}: {e}")
+            if old is not None:
+                self.placer.assign(name, None, old)
+            return
+        self.metrics.incr("runners_repinned")
+
+    def _remove_evicted(self, replica: Dict) -> None:
+        """Tear down a replica already dropped from the cache and listed in `_removing`.
+
+        With `recycle_runners`, its runner goes back to the warm pool instead
+        if the pool has room.
+        """
+        try:
+            if not self._recycle_runner(replica):
+                self._remove_runner(replica["name"], replica["session"])
+        finally:
+            with self.lock:
+                self._removing.discard(replica["name"])
+                if self._bounded():
+                    self._capacity.notify_all()
+
+    def _tear_down(self, replica: Dict) -> None:
+        """Hand a replica dropped from the cache (and listed in `_removing`) to the teardown workers."""
+        try:
+            self._teardown.submit(self._remove_evicted, replica)
+        except RuntimeError:
+            # The dispatcher shut down meanwhile
+            self._remove_evicted(replica)
+
+    def _recycle_runner(self, replica: Dict) -> bool:
+        if not self.recycle_runners or self.pool_size <= 0:
+            return False
+        if self.placer is not None and self.placer.get(replica["name"]) is None:
+            # Its CPUs were given to another runner
+            return False
+        if self.registry is not None:
+            # Other dispatchers must not adopt it for its old hash
+            self.registry.remove([replica["name"]])
+        with self.lock:
+            recycled = sum(1 for r in self._pool if r["code_hashes"])
+            if self._stop_event.is_set() or recycled >= self.pool_size:
+                return False
+            self._pool.append({
+                "name": replica["name"],
+                "addr": replica["addr"],
+                "session": replica["session"],
+                "code_hashes": replica["code_hashes"],
+            })
+        self.metrics.incr("runners_recycled")
+        return True
+
+    def _refresh_memory(self, replicas: Optional[List[Dict]] = None) -> None:
+        """Record each replica's memory use from Docker stats."""
+        if replicas is None:
+            with self.lock:
+                replicas = self._replicas()
+        for replica in replicas:
             try:
-                # Remove any existing container with this name
-                self.docker.remove_container(name)
-                
-                # Create a new container
-                cont = self.docker.run_container(self.image, name, {"8080/tcp": None})
-                
-                # Wait for container to be ready
-                self._wait_for_container_ready(cont)
-                
-                # Load the user code with retry logic
-                self._load_code_with_retry(cont, user_code)
-                
-                # Store in our cache
-                self.containers[code_hash] = {"name": name, "last_used": time.time()}
-                
-                # Get the host information
-                cont.reload()
-                host_ip = cont.ports["8080/tcp"][0]["HostIp"]
-                host_port = cont.ports["8080/tcp"][0]["HostPort"]
-                return f"{host_ip}:{host_port}"
+                replica["memory"] = self.docker.container_memory(replica["name"])
             except Exception as e:
-                logger.error(f"Failed to create container: {e}")
-                # Clean up in case of failure
-                try:
-                    self.docker.remove_container(name)
-                except Exception:
-                    pass
+                logger.debug(f"Could not read memory of {replica['name']}: {e}")
+
+    def _socket_path(self, name: str) -> Optional[str]:
+        """Host path of the Unix socket runner `name` listens on."""
+        if self.socket_dir is None:
+            return None
+        return os.path.join(self.socket_dir, name, RUNNER_SOCKET_NAME)
+
+    def _remove_runner(self, name: str, session: requests.Session) -> None:
+        session.close()
+        if self.placer is not None:
+            self.placer.release(name)
+        if self.registry is not None:
+            self.registry.remove([name])
+        try:
+            self.docker.remove_container(name)
+        except Exception:
+            pass
+        if self.socket_dir is not None:
+            shutil.rmtree(os.path.join(self.socket_dir, name), ignore_errors=True)
+
+    def _claim_pooled_runner(self, code_hash: str, user_code: str) -> Optional[Dict]:
+        """Load `user_code` into a runner from the warm pool, if one is ready."""
+        if self.pool_size <= 0:
+            return None
+
+        while True:
+            with self.lock:
+                # Prefer a recycled runner that has compiled this code before,
+                # then any recycled one, so code-less runners are kept last
+                runner = next((r for r in self._pool if code_hash in r["code_hashes"]), None) or next(
+                    (r for r in self._pool if r["code_hashes"]), None
+                )
+                if runner is not None:
+                    self._pool.remove(runner)
+                elif self._pool:
+                    runner = self._pool.popleft()
+            if runner is None:
+                self.metrics.incr("pool_misses")
+                return None
+            self._pool_wakeup.set()
+
+            try:
+                load_start = time.monotonic()
+                resp = self._post_load(runner["session"], runner["addr"], code_hash, user_code, runner["code_hashes"])
+                load_seconds = time.monotonic() - load_start
+            except requests.RequestException as e:
+                # The pooled runner died while idle; try the next one
+                logger.warning(f"Discarding pooled runner {runner['name']}: {e}")
+                self._remove_runner(runner["name"], runner["session"])
+                continue
+
+            error, _ = classify_response(resp.status_code, resp.headers, resp.text)
+            if error is not None:
+                # The code was rejected, not the runner: keep it for the next hash
+                with self.lock:
+                    self._pool.appendleft(runner)
+                raise error
+
+            self.metrics.incr("pool_hits")
+            logger.info(f"Claimed pooled runner {runner['name']} for code_hash: {code_hash}")
+            if self.placer is not None:
+                self._repin(runner["name"], code_hash)
+            replica = self._register_container(
+                code_hash, user_code, runner["name"], runner["addr"], runner["session"],
+                code_hashes=runner["code_hashes"],
+            )
+            self._maybe_snapshot(code_hash, user_code, runner["name"], load_seconds)
+            return replica
+
+    def _snapshot_image(self, code_hash: str) -> str:
+        """Name of the snapshot image of `code_hash`: the base image tagged with the hash."""
+        repository, sep, tag = self.image.rpartition(":")
+        if not sep or "/" in tag:
+            # No tag (the colon, if any, belongs to a registry port)
+            return f"{self.image}:{code_hash}"
+        return f"{repository}:{tag}-{code_hash}"
+
+    def _load_snapshots(self) -> None:
+        """Pick up snapshot images committed by previous or other dispatchers."""
+        try:
+            images = self.docker.list_images({LABEL_SNAPSHOT_OF: self.image})
+        except Exception as e:
+            logger.warning(f"Could not list snapshot images: {e}")
+            return
+        with self.lock:
+            for image in images:
+                code_hash = image.labels.get(LABEL_CODE_HASH)
+                if code_hash and self._snapshot_image(code_hash) in image.tags:
+                    # Not used by us yet: first in line for removal
+                    self._snapshots.setdefault(code_hash, 0.0)
+
+    def _start_from_snapshot(
+        self, code_hash: str, name: str, user_code: str, wait_for_capacity: bool = True
+    ) -> Optional[Dict]:
+        """Start a runner from the snapshot image of `code_hash`, if there is one.
+
+        The runner loads the code at boot, so no /load is sent.
+        """
+        with self.lock:
+            if code_hash not in self._snapshots:
+                return None
+            self._snapshots[code_hash] = time.time()
+        image = self._snapshot_image(code_hash)
+        logger.info(f"Creating new container for code_hash: {code_hash} from {image}")
+        try:
+            host_addr, session = self._start_runner(
+                name, code_hash=code_hash, image=image, wait_for_capacity=wait_for_capacity
+            )
+        except Exception as e:
+            # E.g. the image was removed by someone else; start from scratch
+            logger.warning(f"Failed to start snapshot image {image}: {e}")
+            with self.lock:
+                self._snapshots.pop(code_hash, None)
+            return None
+
+        try:
+            health = session.get(f"http://{host_addr}/healthz", timeout=1).json()
+        except (requests.RequestException, ValueError):
+            health = {}
+        if health.get("code_hash") != code_hash:
+            logger.warning(f"Runner {name} did not preload code_hash: {code_hash}, loading it")
+            try:
+                self._load_code_with_retry(host_addr, user_code, session=session)
+            except Exception:
+                self._remove_runner(name, session)
                 raise
+        self.metrics.incr("snapshot_starts")
+        return self._register_container(code_hash, user_code, name, host_addr, session)
 
-    def _wait_for_container_ready(self, container, timeout=30):
-        """Wait until container is fully started and network is available."""
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            container.reload()
-            if container.status == "running":
-                # Check if network ports are assigned
-                if "8080/tcp" in container.ports and container.ports["8080/tcp"]:
-                    # Give it a moment for the service to start listening
-                    time.sleep(1)
-                    try:
-                        host_ip = container.ports["8080/tcp"][0]["HostIp"]
+    def _maybe_snapshot(self, code_hash: str, user_code: str, name: str, load_seconds: float) -> None:
+        """Commit runner `name` as the snapshot image of `code_hash` if its /load was slow."""
+        if self.snapshot_load_seconds is None or load_seconds < self.snapshot_load_seconds:
+            return
+        with self.lock:
+            if code_hash in self._snapshots or code_hash in self._snapshotting or self._stop_event.is_set():
+                return
+            self._snapshotting.add(code_hash)
+        threading.Thread(target=self._snapshot, args=(code_hash, user_code, name), daemon=True).start()
+
+    def _snapshot(self, code_hash: str, user_code: str, name: str) -> None:
+        image = self._snapshot_image(code_hash)
+        start = time.monotonic()
+        try:
+            self.docker.snapshot_container(
+                name,
+                image,
+                files={RUNNER_PRELOAD_PATH: user_code},
+                # Settings specific to this runner must not stick to the image
+                environment={
+                    "RUNNER_PRELOAD": RUNNER_PRELOAD_PATH,
+                    "RUNNER_UDS": "",
+                    "RUNNER_PAYLOAD_DIR": "",
+                    "RUNNER_IDLE_TTL": "",
+                    "RUNNER_WAIT_FOR_LOAD": "",
+                },
+                labels={LABEL_SNAPSHOT_OF: self.image, LABEL_CODE_HASH: code_hash, LABEL_SOCKET: "", LABEL_PAYLOAD_DIR: ""},
+            )
+        except Exception as e:
+            # E.g. the runner was evicted meanwhile; the next slow load retries
+            logger.warning(f"Failed to snapshot runner {name} as {image}: {e}")
+            with self.lock:
+                self._snapshotting.discard(code_hash)
+            return
+
+        self.metrics.observe("snapshot_seconds", time.monotonic() - start)
+        self.metrics.incr("snapshots_created")
+        logger.info(f"Snapshotted runner {name} as {image}")
+        with self.lock:
+            self._snapshotting.discard(code_hash)
+            self._snapshots[code_hash] = time.time()
+            excess = len(self._snapshots) - self.max_snapshot_images
+            victims = sorted(self._snapshots, key=self._snapshots.get)[:max(excess, 0)]
+            for victim in victims:
+                del self._snapshots[victim]
+        for victim in victims:
+            try:
+                self.docker.remove_image(self._snapshot_image(victim))
+            except Exception as e:
+                logger.warning(f"Failed to remove snapshot image of code_hash {victim}: {e}")
+            else:
+                self.metrics.incr("snapshots_removed")
+
+    def _refill_pool(self) -> None:
+        """Keep `pool_size` code-less runners started and ready."""
+        while not self._stop_event.is_set():
+            self._pool_wakeup.clear()
+            with self.lock:
+                # Recycled runners don't count: they may be gone when needed
+                fresh = sum(1 for r in self._pool if not r["code_hashes"])
+                missing = self.pool_size - fresh - self._pool_pending
+                if self.placer is not None and self.placer.free_slots < self.resource_profile.cpus:
+                    # The host is full; pooled runners must not take CPUs from loaded ones
+                    missing = 0
+                if missing > 0:
+                    self._pool_pending += missing
+            for _ in range(missing):
+                threading.Thread(target=self._add_pooled_runner, daemon=True).start()
+            self._pool_wakeup.wait(timeout=1)
+
+    def _add_pooled_runner(self) -> None:
+        name = f"{POOL_RUNNER_PREFIX}{uuid.uuid4().hex[:12]}"
+        start = time.monotonic()
+        try:
+            # Pooled runners must not exit on their own while waiting to be
+            # claimed; once claimed, their idle timeout applies as usual.
+            host_addr, session = self._start_runner(name, environment={"RUNNER_WAIT_FOR_LOAD": "1"})
+        except Exception as e:
+            logger.warning(f"Failed to start pooled runner: {e}")
+            # Back off before the refill loop tries again
+            self._stop_event.wait(1)
+            with self.lock:
+                self._pool_pending -= 1
+            return
+
+        self.metrics.observe("pool_refill_seconds", time.monotonic() - start)
+        with self.lock:
+            self._pool_pending -= 1
+            if not self._stop_event.is_set():
+                self._pool.append({"name": name, "addr": host_addr, "session": session, "code_hashes": set()})
+                return
+        # Dispatcher shut down while this runner was starting
+        self._remove_runner(name, session)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Return dispatcher counters, timings and current gauges."""
+        snapshot = self.metrics.snapshot()
+        with self.lock:
+            snapshot["gauges"] = {
+                "hashes": len(self.containers),
+                "containers": sum(len(entry["replicas"]) for entry in self.containers.values()),
+                "in_flight": sum(r["in_flight"] for entry in self.containers.values() for r in entry["replicas"]),
+                "pool_ready": len(self._pool),
+                "memory_bytes": sum(r["memory"] or 0 for r in self._replicas()),
+                "snapshot_images": len(self._snapshots),
+                "memo_entries": len(self.memo),
+                "memo_bytes": self.memo.bytes,
+                "admitted_calls": self.admission.running,
+                "queued_calls": self.admission.queued,
+                "open_circuits": self.breaker.open_circuits,
+                "placed_runners": len(self.placer) if self.placer is not None else 0,
+                "free_cpu_slots": self.placer.free_slots if self.placer is not None else 0,
+            }
+        return snapshot
+
+    def prometheus_metrics(self) -> str:
+        """Return `stats()` in the Prometheus text format, e.g. for a /metrics endpoint."""
+        return self.metrics.prometheus(self.stats()["gauges"])
+
+    def _observe_exec_time(self, headers) -> None:
+        # Time the runner spent in `entrypoint`, reported in a response header
+        exec_seconds = headers.get(EXEC_TIME_HEADER)
+        if exec_seconds is not None:
+            self.metrics.observe("entrypoint_seconds", float(exec_seconds))
+
+    def _wait_for_container_ready(
+        self, container, timeout=30, session: Optional[requests.Session] = None, host_addr: Optional[str] = None
+    ):
+        """Wait until the runner in `container` answers `GET /healthz`.
+
+        Polls with exponential backoff starting at READY_POLL_INITIAL_SECONDS,
+        so a runner that comes up quickly is picked up within milliseconds.
+        The time to readiness is recorded as the `container_ready_seconds`
+        timing. `host_addr` skips looking up the published port (e.g. for
+        runners on a Unix socket).
+        """
+        with self.metrics.phase("container_ready", name=container.name):
+            start_time = time.monotonic()
+            delay = READY_POLL_INITIAL_SECONDS
+            health_url = f"http://{host_addr}/healthz" if host_addr is not None else None
+            while time.monotonic() - start_time < timeout:
+                if health_url is None:
+                    # Ports are assigned once; stop asking Docker after that
+                    container.reload()
+                    if container.status == "running" and container.ports.get("8080/tcp"):
+                        # A remote daemon's ports are reached at its own address
+                        host_ip = self.docker.host or container.ports["8080/tcp"][0]["HostIp"]
                         host_port = container.ports["8080/tcp"][0]["HostPort"]
-                        # Check if service is responding
-                        health_url = f"http://{host_ip}:{host_port}/"
-                        requests.get(health_url, timeout=1)
-                        return True
+                        health_url = f"http://{host_ip}:{host_port}/healthz"
+                if health_url is not None:
+                    try:
+                        resp = (session or requests).get(health_url, timeout=1)
+                        if resp.status_code == 200:
+                            return True
                     except requests.RequestException:
-                        # Service not ready yet, keep waiting
-                        time.sleep(0.5)
-            else:
-                time.sleep(0.5)
-        
-        raise TimeoutError(f"Container {container.name} not ready after {timeout} seconds")
-
-    def _load_code_with_retry(self, container, user_code, max_retries=5, retry_delay=1):
-        """Load user code into container with retry logic."""
-        container.reload()
-        host_ip = container.ports["8080/tcp"][0]["HostIp"]
-        host_port = container.ports["8080/tcp"][0]["HostPort"]
-        url = f"http://{host_ip}:{host_port}/load"
-        
+                        # Service not listening yet, keep waiting
+                        pass
+                time.sleep(delay)
+                delay = min(delay * 2, READY_POLL_MAX_SECONDS)
+
+            raise TimeoutError(f"Container {container.name} not ready after {timeout} seconds")
+
+    def _post_load(
+        self, session: requests.Session, host_addr: str, code_hash: str, user_code: str, code_hashes: Set[str]
+    ) -> requests.Response:
+        """POST /load, sending only the hash to a runner that compiled the code before."""
+        url = f"http://{host_addr}/load"
+        with self.metrics.phase("code_load", code_hash=code_hash):
+            if code_hash in code_hashes:
+                resp = session.post(url, json={"code_hash": code_hash}, timeout=10)
+                if resp.status_code != 404:
+                    self.metrics.incr("code_cache_hits")
+                    return resp
+                # Dropped from the runner's cache meanwhile
+                code_hashes.discard(code_hash)
+            return session.post(url, json={"code": user_code}, timeout=10)
+
+    def _load_code_with_retry(self, host_addr, user_code, session: Optional[requests.Session] = None):
+        """Load user code into the runner at `host_addr`.
+
+        Connection errors and runner failures are retried with backoff;
+        code the runner rejects raises `UserCodeError` right away.
+        """
+        url = f"http://{host_addr}/load"
+        max_attempts = self.retry_policy.max_attempts
+
         last_exception = None
-        for attempt in range(max_retries):
+        for attempt in range(max_attempts):
+            if attempt:
+                time.sleep(self.retry_policy.delay(attempt, None))
             try:
-                resp = requests.post(url, json={"code": user_code}, timeout=10)
-                resp.raise_for_status()
-                return
-            except Exception as e:
+                with self.metrics.phase("code_load"):
+                    resp = (session or requests).post(url, json={"code": user_code}, timeout=10)
+            except requests.RequestException as e:
                 last_exception = e
-                logger.warning(f"Attempt {attempt+1}/{max_retries} to load code failed: {e}")
-                time.sleep(retry_delay)
-        
+                logger.warning(f"Attempt {attempt+1}/{max_attempts} to load code failed: {e}")
+                continue
+            error, retryable = classify_response(resp.status_code, resp.headers, resp.text)
+            if error is None:
+                return
+            if not retryable:
+                raise error
+            last_exception = error
+            logger.warning(f"Attempt {attempt+1}/{max_attempts} to load code failed: {error}")
+
         # If we got here, all attempts failed
-        raise RuntimeError(f"Failed to load code after {max_retries} attempts: {last_exception}")
+        raise RuntimeError(f"Failed to load code after {max_attempts} attempts: {last_exception}")
+
+    def _deadline(self, timeout: Optional[float]) -> Optional[float]:
+        """Deadline (a `time.monotonic()` value) of a call given `timeout` seconds."""
+        if timeout is None:
+            timeout = self.call_timeout_seconds
+        return None if timeout is None else time.monotonic() + timeout
+
+    def run(self, user_code: str, input_data: dict, memoize: bool = False, timeout: Optional[float] = None) -> dict:
+        """Run `entrypoint(input_data)` of `user_code` in its runner.
 
-    def run(self, user_code: str, input_data: dict) -> dict:
+        The call fails with `DeadlineExceeded` after `timeout` seconds
+        (`call_timeout_seconds` by default), retries included.
+
+        With `memoize`, for deterministic functions: identical concurrent
+        calls share one runner call, and results are cached (see `memo_max_bytes`
+        and `memo_ttl_seconds`) so repeated inputs don't reach a runner.
+        """
         code_hash = self._hash_code(user_code)
-        
-        # Ensure container and get host address
-        host_addr = self._ensure_container(code_hash, user_code)
-        
-        # Now call the run endpoint with retry
-        url = f"http://{host_addr}/run"
-        max_retries = 3
-        retry_delay = 1
+        deadline = self._deadline(timeout)
+        if memoize:
+            return self.memo.call(
+                code_hash,
+                input_data,
+                lambda: self._call_runner(code_hash, user_code, "/run", input_data, deadline),
+                deadline,
+            )
+        return self._call_runner(code_hash, user_code, "/run", input_data, deadline)
+
+    def run_many(
+        self, user_code: str, inputs: List[Any], batch_size: int = DEFAULT_BATCH_SIZE, timeout: Optional[float] = None
+    ) -> List[Any]:
+        """Run `entrypoint` on every item of `inputs`, in order.
+
+        Inputs are sent to the runner's `/run_batch` endpoint in chunks of at
+        most `batch_size` items. The returned list has one entry per input:
+        the entrypoint's result, or a `UserCodeError` instance if the
+        entrypoint raised for that item. `timeout` covers all chunks.
+        """
+        code_hash = self._hash_code(user_code)
+        deadline = self._deadline(timeout)
+        results: List[Any] = []
+        for start in range(0, len(inputs), batch_size):
+            chunk = inputs[start:start + batch_size]
+            body = self._call_runner(code_hash, user_code, "/run_batch", {"inputs": chunk}, deadline)
+            for item in body["results"]:
+                if "error" in item:
+                    results.append(UserCodeError(item["error"]))
+                else:
+                    results.append(item["result"])
+        return results
+
+    def stream(self, user_code: str, input_data: Any, timeout: Optional[float] = None) -> Iterator[Any]:
+        """Run a generator `entrypoint` and yield its items as they arrive.
+
+        The runner's `/run_stream` sends one NDJSON line per item and only
+        produces the next one as this iterator is consumed, so neither side
+        buffers the whole output. A non-generator entrypoint yields its
+        result once. An exception raised by the entrypoint mid-stream is
+        raised here as `UserCodeError`; closing the iterator early cancels
+        the call. `timeout` covers the whole stream.
+        """
+        code_hash = self._hash_code(user_code)
+        deadline = self._deadline(timeout)
+        with self.admission.slot(code_hash, deadline):
+            replica, resp, _ = self._send(code_hash, user_code, "/run_stream", input_data, deadline, stream=True)
+            try:
+                for line in resp.iter_lines(chunk_size=STREAM_READ_CHUNK_SIZE):
+                    if line:
+                        yield _decode_stream_line(line)
+            except requests.ConnectionError as e:
+                # requests reports a read timeout mid-stream as a connection error
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise DeadlineExceeded("Deadline exceeded") from e
+                raise
+            finally:
+                resp.close()
+                # A stream's duration says nothing about the replica's latency
+                self._release_replica(replica)
+
+    def _call_runner(self, code_hash: str, user_code: str, path: str, body: Any, deadline: Optional[float]) -> Any:
+        """POST `body` to `path` on the runner for `code_hash`, within admission limits."""
+        with self.metrics.phase("invoke", code_hash=code_hash, path=path), self.admission.slot(code_hash, deadline):
+            try:
+                replica, resp, elapsed = self._send(code_hash, user_code, path, body, deadline)
+            except DeadlineExceeded:
+                self.metrics.incr("deadline_exceeded")
+                raise
+            self._release_replica(replica, elapsed)
+            with self.metrics.phase("response_decode"):
+                return decode_response(resp.headers, resp.content, self.payloads)
+
+    def _send(
+        self, code_hash: str, user_code: str, path: str, body: Any, deadline: Optional[float], stream: bool = False
+    ) -> Tuple[Dict, requests.Response, float]:
+        """POST `body` to `path` on a replica of `code_hash`, retrying what may succeed.
+
+        Returns the replica, still counted as in flight (see
+        `_release_replica`), its successful response and the request's
+        duration. Errors of the user's code and passed deadlines are raised
+        at once; see lambda_poc/retry.py.
+        """
+        max_attempts = self.retry_policy.max_attempts
+        # The same on every attempt, so a runner that already ran the call
+        # doesn't run it again
+        idempotency_key = uuid.uuid4().hex
         last_exception = None
-        
-        for attempt in range(max_retries):
+        # Whether the last attempt got an answer from a runner
+        answered = False
+
+        for attempt in range(max_attempts):
+            if attempt:
+                self.metrics.incr("retries")
+                time.sleep(self.retry_policy.delay(attempt, deadline))
+            self.breaker.check(code_hash)
             try:
-                resp = requests.post(url, json=input_data, timeout=30)
-                resp.raise_for_status()
-                
-                with self.lock:
-                    if code_hash in self.containers:
-                        self.containers[code_hash]["last_used"] = time.time()
-                
-                return resp.json()
+                # Pick a replica (creating the first one if needed)
+                replica = self._ensure_container(code_hash, user_code, deadline)
+            except (UserCodeError, DeadlineExceeded):
+                # The code failed to load, or the deadline passed; neither
+                # says the runner is broken, and another attempt won't help
+                self.breaker.record(code_hash, None)
+                raise
             except Exception as e:
+                self.breaker.record(code_hash, False)
                 last_exception = e
-                logger.warning(f"Attempt {attempt+1}/{max_retries} to run code failed: {e}")
-                if attempt < max_retries - 1:  # Don't sleep after the last attempt
-                    time.sleep(retry_delay)
-        
-        # If we got here, all attempts failed
-        raise RuntimeError(f"Failed to run code after {max_retries} attempts: {last_exception}")
+                answered = False
+                logger.warning(f"Attempt {attempt+1}/{max_attempts} to start a runner failed: {e}")
+                continue
+            except BaseException:
+                self.breaker.record(code_hash, None)
+                raise
+
+            start = time.monotonic()
+            try:
+                resp = self._post(replica, path, body, stream, deadline, idempotency_key)
+            except requests.ConnectionError as e:
+                # Also covers connect timeouts. The runner may be gone (e.g. it
+                # exited after its idle TTL); re-resolve the container before
+                # the next attempt.
+                self._release_replica(replica)
+                self.breaker.record(code_hash, False)
+                last_exception = e
+                answered = False
+                logger.warning(f"Attempt {attempt+1}/{max_attempts} to run code failed: {e}")
+                self._revalidate_container(code_hash, replica)
+                continue
+            except requests.Timeout as e:
+                # No answer, not even the runner's own 504, by the deadline
+                self._release_replica(replica, time.monotonic() - start)
+                self.breaker.record(code_hash, None)
+                raise DeadlineExceeded(f"No answer from runner {replica['name']} by the deadline") from e
+            except BaseException:
+                # E.g. the deadline passed before the request was sent
+                self._release_replica(replica)
+                self.breaker.record(code_hash, None)
+                raise
+            elapsed = time.monotonic() - start
+            self._observe_exec_time(resp.headers)
+
+            error, retryable = classify_response(resp.status_code, resp.headers, resp.text if resp.status_code >= 400 else "")
+            if error is None:
+                self.breaker.record(code_hash, True)
+                return replica, resp, elapsed
+            resp.close()
+            self._release_replica(replica, elapsed)
+            # Only failures of the runner itself count against its circuit
+            self.breaker.record(code_hash, None if isinstance(error, DeadlineExceeded) else not retryable)
+            if not retryable:
+                raise error
+            last_exception = error
+            answered = True
+            logger.warning(f"Attempt {attempt+1}/{max_attempts} to run code failed: {error}")
+
+        # If we got here, all attempts failed. `RunnerUnavailable` if the
+        # runner never answered: the host or its Docker daemon is the suspect
+        error_type = RuntimeError if answered else RunnerUnavailable
+        raise error_type(f"Failed to run code after {max_attempts} attempts: {last_exception}") from last_exception
+
+    def _call_options(
+        self, deadline: Optional[float], idempotency_key: Optional[str]
+    ) -> Tuple[Dict[str, str], Optional[float]]:
+        """Deadline and idempotency headers of a runner call, and its HTTP timeout.
+
+        Raises `DeadlineExceeded` if `deadline` has passed.
+        """
+        headers = {}
+        left = remaining(deadline)
+        if left is not None:
+            headers[DEADLINE_HEADER] = f"{left:.3f}"
+        if idempotency_key is not None:
+            headers[IDEMPOTENCY_KEY_HEADER] = idempotency_key
+        # Wait a little longer than the runner, to get its own answer
+        return headers, None if left is None else left + DEADLINE_GRACE_SECONDS
+
+    def _post(
+        self,
+        replica: Dict,
+        path: str,
+        body: Any,
+        stream: bool = False,
+        deadline: Optional[float] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> requests.Response:
+        """POST `body` to a replica, encoded with the replica's codec.
+
+        Large bodies are passed through the shared payload directory when
+        the replica supports it. With `stream`, the response body is left
+        unread. Raises `DeadlineExceeded` if `deadline` has passed.
+        """
+        codec = replica["codec"]
+        call_headers, timeout = self._call_options(deadline, idempotency_key)
+        ref = None
+        with self.metrics.phase("request_encode"):
+            if replica["payload_ref"]:
+                content, headers, ref = self.payloads.encode_request(body, codec)
+            else:
+                content, headers = encode_request(body, codec)
+        try:
+            with self.metrics.phase("http_roundtrip", runner=replica["name"], path=path):
+                resp = replica["session"].post(
+                    f"http://{replica['addr']}{path}",
+                    data=content,
+                    headers=dict(headers, **call_headers),
+                    timeout=timeout,
+                    stream=stream,
+                )
+        finally:
+            if ref is not None:
+                self.payloads.discard(ref)
+        if resp.status_code == 415 and (codec is not JSON_CODEC or ref is not None):
+            resp.close()
+            if codec is not JSON_CODEC:
+                # The runner can't decode this format; use JSON with it from now on
+                logger.warning(f"Runner {replica['name']} does not accept {codec.content_type}, falling back to JSON")
+                replica["codec"] = JSON_CODEC
+            else:
+                # The runner has no shared payload directory; send bodies inline
+                logger.warning(f"Runner {replica['name']} does not accept payload files, sending bodies inline")
+                replica["payload_ref"] = False
+            return self._post(replica, path, body, stream, deadline, idempotency_key)
+        return resp
+
+    def _sync_registry(self) -> None:
+        """Share last-used times with other dispatchers through the registry."""
+        with self.lock:
+            last_used = {r["name"]: r["last_used"] for entry in self.containers.values() for r in entry["replicas"]}
+        try:
+            records = self.registry.touch(last_used)
+        except Exception as e:
+            logger.warning(f"Failed to update container registry: {e}")
+            return
+        with self.lock:
+            for entry in self.containers.values():
+                for replica in entry["replicas"]:
+                    record = records.get(replica["name"])
+                    if record is not None and record.get("last_used", 0) > replica["last_used"]:
+                        # Used by another dispatcher more recently
+                        replica["last_used"] = record["last_used"]
+                        entry["last_used"] = max(entry["last_used"], record["last_used"])
+
+    def _schedule(self, kind: str, code_hash: str, due: float) -> None:
+        """Arm the `kind` expiry timer of `code_hash`; must be called with `self.lock` held."""
+        key = (kind, code_hash)
+        current = self._timer_due.get(key)
+        if current is not None and current <= due:
+            # That one fires first and re-arms itself if needed
+            return
+        self._timer_due[key] = due
+        heapq.heappush(self._timers, (due, kind, code_hash))
+        if self._timers[0][0] == due:
+            self._timer_wakeup.set()
+
+    def _expire_due(self, now: float) -> List[Dict]:
+        """Fire the expiry timers due by `now`; returns the replicas dropped.
+
+        Must be called with `self.lock` held.
+        """
+        expired: List[Dict] = []
+        while self._timers and self._timers[0][0] <= now:
+            due, kind, code_hash = heapq.heappop(self._timers)
+            if self._timer_due.get((kind, code_hash)) != due:
+                # Superseded by an earlier timer
+                continue
+            del self._timer_due[(kind, code_hash)]
+            entry = self.containers.get(code_hash)
+            if entry is None:
+                continue
+            if kind == "ttl":
+                expired.extend(self._expire_hash(code_hash, entry, now))
+            else:
+                expired.extend(self._scale_down(code_hash, entry, now))
+        return expired
+
+    def _expire_hash(self, code_hash: str, entry: Dict, now: float) -> List[Dict]:
+        busy = any(r["in_flight"] for r in entry["replicas"])
+        due = entry["last_used"] + self.ttl_seconds
+        if busy or due > now:
+            # Used since the timer was armed (or still running)
+            self._schedule("ttl", code_hash, max(due, now + EXPIRY_RECHECK_SECONDS) if busy else due)
+            return []
+        self.containers.pop(code_hash)
+        self.metrics.incr("ttl_expirations", len(entry["replicas"]))
+        return entry["replicas"]
+
+    def _scale_down(self, code_hash: str, entry: Dict, now: float) -> List[Dict]:
+        # Drop extra replicas that stopped receiving traffic first, newest
+        # first, down to the hash's minimum
+        min_replicas = max(self._replica_limits(code_hash)[0], 1)
+        dropped = []
+        next_due = None
+        for replica in list(reversed(entry["replicas"])):
+            if len(entry["replicas"]) <= min_replicas:
+                break
+            due = replica["last_used"] + self.scale_down_idle_seconds
+            if replica["in_flight"] == 0 and due <= now:
+                entry["replicas"].remove(replica)
+                dropped.append(replica)
+                self.metrics.incr("replicas_scaled_down")
+                continue
+            if replica["in_flight"]:
+                due = max(due, now + EXPIRY_RECHECK_SECONDS)
+            next_due = due if next_due is None else min(next_due, due)
+        if len(entry["replicas"]) > min_replicas and next_due is not None:
+            self._schedule("scale", code_hash, next_due)
+        return dropped
 
     def _cleanup_idle(self) -> None:
+        next_housekeeping = 0.0
         while not self._stop_event.is_set():
-            now = time.time()
-            containers_to_remove = []
-            
+            replicas_to_remove = []
+            if time.time() >= next_housekeeping:
+                next_housekeeping = time.time() + HOUSEKEEPING_INTERVAL_SECONDS
+                if self.registry is not None:
+                    self._sync_registry()
+                if self.memory_limit_bytes is not None or self.memory_weighted_eviction:
+                    self._refresh_memory()
+                if self._bounded():
+                    with self.lock:
+                        # Containers grew (or were adopted) past the cache limits
+                        while self._over_capacity(0):
+                            victim = self._pick_victim()
+                            if victim is None:
+                                break
+                            self._evict(*victim)
+                            replicas_to_remove.append(victim[1])
+
             with self.lock:
-                for code_hash, meta in list(self.containers.items()):
-                    if now - meta["last_used"] > self.ttl_seconds:
-                        containers_to_remove.append((code_hash, meta["name"]))
-            
+                replicas_to_remove.extend(self._expire_due(time.time()))
+                # A cold start meanwhile must not reuse these names
+                self._removing.update(r["name"] for r in replicas_to_remove)
+                wake_at = min(self._timers[0][0], next_housekeeping) if self._timers else next_housekeeping
+
             # Remove containers outside the lock to minimize lock contention
-            for code_hash, name in containers_to_remove:
-                try:
-                    self.docker.remove_container(name)
-                except Exception:
-                    pass
-                
-                with self.lock:
-                    self.containers.pop(code_hash, None)
-                    
-            for _ in range(10):
-                if self._stop_event.is_set():
-                    break
-                time.sleep(1)
+            for replica in replicas_to_remove:
+                self._tear_down(replica)
+
+            # Until the next timer is due, or an earlier one is armed
+            self._timer_wakeup.wait(max(wake_at - time.time(), 0))
+            self._timer_wakeup.clear()
 
     def shutdown(self):
         if self._stop_event.is_set():
             return
         self._stop_event.set()
+        self._timer_wakeup.set()
+        if self.keep_containers and self.registry is not None:
+            self._sync_registry()
         
         # Get a copy of containers to clean up
-        containers_to_remove = []
+        replicas_to_remove = []
         with self.lock:
-            for code_hash, meta in list(self.containers.items()):
-                containers_to_remove.append((code_hash, meta["name"]))
-            
-        # Clean up containers
-        for code_hash, name in containers_to_remove:
-            try:
-                self.docker.remove_container(name)
-            except Exception:
-                pass
-            
-            with self.lock:
-                self.containers.pop(code_hash, None)
+            for entry in self.containers.values():
+                replicas_to_remove.extend(entry["replicas"])
+            self.containers.clear()
+            pooled = list(self._pool)
+            self._pool.clear()
+        self._pool_wakeup.set()
+
+        # Pooled runners are never adopted, so they go even with keep_containers.
+        # Runners are removed in parallel; then wait for evictions in progress.
+        runners = pooled if self.keep_containers else pooled + replicas_to_remove
+        list(self._teardown.map(lambda runner: self._remove_runner(runner["name"], runner["session"]), runners))
+        self._teardown.shutdown(wait=True)
+
+        if self.keep_containers:
+            # Leave loaded runners warm for the next dispatcher to adopt
+            for replica in replicas_to_remove:
+                replica["session"].close()
+            if self.payloads is not None:
+                self.payloads.close()
+            return
         
         try:
             self.docker.remove_network()
         except Exception:
             pass
 
+        if self.payloads is not None:
+            self.payloads.close()
+        if self._own_socket_dir:
+            shutil.rmtree(self.socket_dir, ignore_errors=True)
 
 _default_dispatcher: Optional[Dispatcher] = None
 _dispatcher_lock = threading.Lock()
@@ -0,0 +1,21 @@
+"""Exceptions raised by the dispatcher."""
+
+
+class UserCodeError(RuntimeError):
+    """The user's code raised an exception inside the runner, at load or in `entrypoint`."""
+
+
+class AdmissionRejected(RuntimeError):
+    """A call was turned away by admission control: queue full or waited too long."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """A call did not finish before its deadline (`run(..., timeout=...)`)."""
+
+
+class RunnerUnavailable(RuntimeError):
+    """No runner could be started or reached for a call, on any attempt."""
+
+
+class CircuitOpenError(RuntimeError):
+    """Calls to a function fail fast while its runners keep failing."""
@@ -0,0 +1,205 @@
+"""Result memoization and request coalescing for pure functions.
+
+Calls made with `memoize=True` are keyed by the code hash plus a hash of a
+canonical encoding of the input. Identical calls in flight at the same time
+share one runner call (sync and async callers alike), and results are kept
+in a bounded LRU cache, limited by total encoded size and a TTL, so repeats
+are answered without reaching a runner.
+"""
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .codecs import Codec
+from .errors import DeadlineExceeded
+from .metrics import Metrics
+from .payloads import BYTES_TYPES
+from .retry import remaining
+
+
+def input_key(code_hash: str, input_data: Any) -> Optional[str]:
+    """Return the cache key of a call, or None if its input can't be keyed.
+
+    Dicts are keyed independently of their order; inputs with the same JSON
+    encoding (e.g. a tuple and a list) share a key, as they do on the wire.
+    """
+    if isinstance(input_data, BYTES_TYPES):
+        data = b"b" + bytes(input_data)
+    else:
+        try:
+            data = b"j" + json.dumps(input_data, sort_keys=True, separators=(",", ":")).encode()
+        except (TypeError, ValueError):
+            return None
+    return hashlib.sha256(code_hash.encode() + b"\0" + data).hexdigest()
+
+
+# Cached result: (encoded result, whether it is raw bytes)
+_Encoded = Tuple[bytes, bool]
+
+
+class Memoizer:
+    """Coalesces identical calls and caches their results."""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, codec: Codec, metrics: Metrics):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.codec = codec
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        # key -> (expires at, encoded result), least recently used first
+        self._entries: "OrderedDict[str, Tuple[float, _Encoded]]" = OrderedDict()
+        # key -> Future of (encoded result or None, result) of the call in
+        # flight; None if it was abandoned and a waiting caller should retry
+        self._inflight: Dict[str, Future] = {}
+        # Total size of the cached encoded results
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _encode(self, value: Any) -> Optional[_Encoded]:
+        if isinstance(value, BYTES_TYPES):
+            return bytes(value), True
+        try:
+            return self.codec.encode(value), False
+        except (TypeError, ValueError):
+            return None
+
+    def _decode(self, encoded: _Encoded) -> Any:
+        # Every caller gets its own copy of a mutable result
+        data, raw = encoded
+        return data if raw else self.codec.decode(data)
+
+    def _join(self, key: str) -> Tuple[str, Any]:
+        """Return ("hit", encoded result), ("wait", future) or ("lead", future)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    return "hit", entry[1]
+                del self._entries[key]
+                self.bytes -= len(entry[1][0])
+            future = self._inflight.get(key)
+            if future is not None:
+                return "wait", future
+            future = Future()
+            self._inflight[key] = future
+            return "lead", future
+
+    def _store(self, key: str, encoded: _Encoded) -> None:
+        size = len(encoded[0])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, encoded)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, (data, _)) = self._entries.popitem(last=False)
+                self.bytes -= len(data)
+                self.metrics.incr("memo_evictions")
+
+    def _finish(self, key: str, future: Future, value: Any = None, error: Optional[Exception] = None) -> None:
+        encoded = None
+        if error is None:
+            encoded = self._encode(value)
+            if encoded is not None:
+                self._store(key, encoded)
+        with self._lock:
+            self._inflight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result((encoded, value))
+
+    def _abandon(self, key: str, future: Future) -> None:
+        # The leading call was cancelled (or interrupted): that is not an
+        # outcome to share, so its waiters start over and one of them leads
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_result(None)
+
+    def _follow(self, outcome: Tuple[Optional[_Encoded], Any]) -> Any:
+        encoded, value = outcome
+        # Unencodable results are shared as is
+        return value if encoded is None else self._decode(encoded)
+
+    def call(
+        self, code_hash: str, input_data: Any, fn: Callable[[], Any], deadline: Optional[float] = None
+    ) -> Any:
+        """Return `fn()`, from the cache or a concurrent identical call if possible.
+
+        Waiting for an identical call in flight raises `DeadlineExceeded`
+        once `deadline` (a `time.monotonic()` value) has passed.
+        """
+        key = input_key(code_hash, input_data)
+        if key is None:
+            return fn()
+        while True:
+            state, found = self._join(key)
+            if state == "hit":
+                self.metrics.incr("memo_hits")
+                return self._decode(found)
+            if state == "lead":
+                break
+            self.metrics.incr("memo_coalesced")
+            try:
+                outcome = found.result(timeout=remaining(deadline))
+            except FutureTimeout:
+                raise DeadlineExceeded("Deadline exceeded waiting for an identical call") from None
+            if outcome is not None:
+                return self._follow(outcome)
+
+        self.metrics.incr("memo_misses")
+        try:
+            value = fn()
+        except Exception as e:
+            self._finish(key, found, error=e)
+            raise
+        except BaseException:
+            self._abandon(key, found)
+            raise
+        self._finish(key, found, value)
+        return value
+
+    async def acall(
+        self, code_hash: str, input_data: Any, fn: Callable[[], Awaitable[Any]], deadline: Optional[float] = None
+    ) -> Any:
+        """Async version of `call`; coalesces with sync callers too."""
+        key = input_key(code_hash, input_data)
+        if key is None:
+            return await fn()
+        while True:
+            state, found = self._join(key)
+            if state == "hit":
+                self.metrics.incr("memo_hits")
+                return self._decode(found)
+            if state == "lead":
+                break
+            self.metrics.incr("memo_coalesced")
+            try:
+                # Shielded: a waiter timing out or being cancelled must not
+                # cancel the shared future
+                outcome = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(found)), remaining(deadline))
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded("Deadline exceeded waiting for an identical call") from None
+            if outcome is not None:
+                return self._follow(outcome)
+
+        self.metrics.incr("memo_misses")
+        try:
+            value = await fn()
+        except Exception as e:
+            self._finish(key, found, error=e)
+            raise
+        except BaseException:
+            self._abandon(key, found)
+            raise
+        self._finish(key, found, value)
+        return value
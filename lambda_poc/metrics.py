@@ -0,0 +1,109 @@
+"""Lightweight in-process metrics for the Dispatcher.
+
+Counters and timing histograms are kept in memory behind a lock and can be
+read with `Metrics.snapshot()` (exposed as `Dispatcher.stats()`) or in the
+Prometheus text format with `Metrics.prometheus()`. `Metrics.phase()` times
+one phase of an invocation and, with a `span_hook`, also wraps it in a
+tracing span (e.g. OpenTelemetry).
+"""
+import contextlib
+import math
+import threading
+import time
+from typing import Any, Callable, ContextManager, Dict, Optional
+
+# Upper bounds (seconds) of the timing histogram buckets, as Prometheus'
+# client defaults
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+
+SpanHook = Callable[[str, Dict[str, Any]], ContextManager]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """Thread-safe counters and timing histograms."""
+
+    def __init__(self, span_hook: Optional[SpanHook] = None):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        # name -> {count, sum, max, buckets}
+        self._timings: Dict[str, Dict[str, Any]] = {}
+        # Called as span_hook(name, attributes) around each phase; returns a
+        # context manager, e.g. an OpenTelemetry tracer's
+        # start_as_current_span
+        self.span_hook = span_hook
+
+    def incr(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(HISTOGRAM_BUCKETS)}
+                self._timings[name] = timing
+            timing["count"] += 1
+            timing["sum"] += seconds
+            timing["max"] = max(timing["max"], seconds)
+            for i, bound in enumerate(HISTOGRAM_BUCKETS):
+                if seconds <= bound:
+                    timing["buckets"][i] += 1
+                    break
+
+    @contextlib.contextmanager
+    def phase(self, phase: str, /, **attributes: Any):
+        """Record the block's duration as the `<phase>_seconds` timing.
+
+        With a `span_hook`, the block also runs inside the span it returns.
+        """
+        span = self.span_hook(phase, attributes) if self.span_hook is not None else contextlib.nullcontext()
+        with span:
+            start = time.monotonic()
+            try:
+                yield
+            finally:
+                self.observe(f"{phase}_seconds", time.monotonic() - start)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Return a copy of all counters and timings."""
+        with self._lock:
+            timings = {}
+            for name, timing in self._timings.items():
+                timings[name] = {
+                    "count": timing["count"],
+                    "sum": timing["sum"],
+                    "max": timing["max"],
+                    "avg": timing["sum"] / timing["count"],
+                }
+            return {"counters": dict(self._counters), "timings": timings}
+
+    def prometheus(self, gauges: Optional[Dict[str, float]] = None, prefix: str = "lambda_poc") -> str:
+        """Render counters, timings and `gauges` in the Prometheus text format."""
+        with self._lock:
+            counters = dict(self._counters)
+            timings = {name: dict(t, buckets=list(t["buckets"])) for name, t in self._timings.items()}
+        lines = []
+        for name, value in sorted(counters.items()):
+            metric = f"{prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {_format_value(value)}")
+        for name, value in sorted((gauges or {}).items()):
+            metric = f"{prefix}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {_format_value(value)}")
+        for name, timing in sorted(timings.items()):
+            metric = f"{prefix}_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(HISTOGRAM_BUCKETS, timing["buckets"]):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{_format_value(bound)}"}} {cumulative}')
+            lines.append(f"{metric}_sum {_format_value(timing['sum'])}")
+            lines.append(f"{metric}_count {timing['count']}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,104 @@
+"""Large payload transfer through a directory shared with the runners.
+
+Bodies of at least `threshold` bytes are written once to a file in a
+host directory (tmpfs by default) that is bind-mounted into every runner
+container; only the file name goes over HTTP, in the X-Payload-Ref header.
+The runner maps the file and answers large results the same way.
+"""
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from .codecs import RAW_CONTENT_TYPE, Codec, decode_body
+from .constants import DEFAULT_PAYLOAD_DIR, RUNNER_PAYLOAD_MOUNT
+
+# File name of the payload inside the shared directory
+PAYLOAD_REF_HEADER = "X-Payload-Ref"
+# Content type of the payload file (RAW_CONTENT_TYPE for bytes)
+PAYLOAD_FORMAT_HEADER = "X-Payload-Format"
+# Sent by the dispatcher: results of at least this size come back as a file
+PAYLOAD_THRESHOLD_HEADER = "X-Payload-Threshold"
+
+BYTES_TYPES = (bytes, bytearray, memoryview)
+
+
+def encode_request(body: Any, codec: Codec) -> Tuple[bytes, Dict[str, str]]:
+    """Encode a request body inline; bytes-like bodies are sent raw."""
+    if isinstance(body, BYTES_TYPES):
+        # HTTP clients want plain bytes
+        if not isinstance(body, bytes):
+            body = bytes(body)
+        return body, dict(codec.headers, **{"Content-Type": RAW_CONTENT_TYPE})
+    return codec.encode(body), codec.headers
+
+
+class PayloadStore:
+    """Host side of the directory shared with runner containers."""
+
+    def __init__(self, threshold: int, base_dir: str = DEFAULT_PAYLOAD_DIR):
+        self.threshold = threshold
+        if not os.path.isdir(base_dir):
+            # No tmpfs here (e.g. macOS); a regular temp dir still avoids the HTTP copy
+            base_dir = None
+        self.host_dir = tempfile.mkdtemp(prefix="lambda_poc-", dir=base_dir)
+        # Runners may run as a different user (see runner/Dockerfile)
+        os.chmod(self.host_dir, 0o777)
+
+    def volumes(self) -> Dict[str, Dict[str, str]]:
+        """Bind mount for `DockerService.run_container`."""
+        return {self.host_dir: {"bind": RUNNER_PAYLOAD_MOUNT, "mode": "rw"}}
+
+    def environment(self) -> Dict[str, str]:
+        return {"RUNNER_PAYLOAD_DIR": RUNNER_PAYLOAD_MOUNT}
+
+    def encode_request(self, body: Any, codec: Codec) -> Tuple[bytes, Dict[str, str], Optional[str]]:
+        """Encode a request body, moving it to a file when it is large.
+
+        Returns (content, headers, ref); `ref` names the file to `discard`
+        once the call is done, or is None if the body is sent inline.
+        """
+        content, headers = encode_request(body, codec)
+        headers = dict(headers, **{PAYLOAD_THRESHOLD_HEADER: str(self.threshold)})
+        if len(content) < self.threshold:
+            return content, headers, None
+
+        fd, path = tempfile.mkstemp(prefix="in-", dir=self.host_dir)
+        try:
+            os.fchmod(fd, 0o644)
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+        except BaseException:
+            os.unlink(path)
+            raise
+        ref = os.path.basename(path)
+        headers[PAYLOAD_REF_HEADER] = ref
+        headers[PAYLOAD_FORMAT_HEADER] = headers["Content-Type"]
+        return b"", headers, ref
+
+    def discard(self, ref: str) -> None:
+        try:
+            os.unlink(os.path.join(self.host_dir, ref))
+        except FileNotFoundError:
+            pass
+
+    def read_result(self, ref: str, content_type: str) -> Any:
+        """Read and delete a result file written by a runner."""
+        path = os.path.join(self.host_dir, os.path.basename(ref))
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        finally:
+            self.discard(os.path.basename(ref))
+        return decode_body(content_type, data)
+
+    def close(self) -> None:
+        shutil.rmtree(self.host_dir, ignore_errors=True)
+
+
+def decode_response(headers: Mapping[str, str], content: bytes, store: Optional[PayloadStore] = None) -> Any:
+    """Decode a runner response, reading it from the shared directory if needed."""
+    ref = headers.get(PAYLOAD_REF_HEADER)
+    if ref is not None and store is not None:
+        return store.read_result(ref, headers.get(PAYLOAD_FORMAT_HEADER))
+    return decode_body(headers.get("Content-Type"), content)
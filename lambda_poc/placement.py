@@ -0,0 +1,253 @@
+"""CPU and memory placement of runner containers.
+
+With placement enabled, every runner is pinned to CPUs of one NUMA node
+(Docker's `cpuset_cpus` / `cpuset_mems`) and optionally gets a memory
+limit, as set by its function's `ResourceProfile`. `Placer` tracks which
+CPUs and how much of each node's memory are handed out. A new runner goes
+to the node with the fewest runners of the same function, so a hot
+function's replicas spread across nodes, then to the node with the most
+free CPUs. Within a node it gets the least loaded cores. When nothing fits,
+the dispatcher evicts idle runners or waits, as for a full container
+cache, so the number of concurrent runners follows the hardware.
+
+The placer only knows about runners of its own dispatcher (and those it
+adopts), so run one placing dispatcher per Docker host.
+"""
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+NUMA_SYSFS = "/sys/devices/system/node"
+
+
+class ResourceProfile:
+    """CPUs and memory given to each runner of a function."""
+
+    def __init__(self, cpus: int = 1, memory_bytes: Optional[int] = None):
+        if cpus < 1:
+            raise ValueError("A runner needs at least one CPU")
+        self.cpus = cpus
+        self.memory_bytes = memory_bytes
+
+
+def parse_cpulist(text: str) -> List[int]:
+    """Parse a Linux CPU list such as "0-3,8,10-11"."""
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def format_cpulist(cpus: Iterable[int]) -> str:
+    """Format CPU ids as a Linux CPU list, e.g. [0, 1, 2, 5] -> "0-2,5"."""
+    ranges: List[List[int]] = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+
+def read_topology(sysfs: str = NUMA_SYSFS) -> Dict[int, List[int]]:
+    """NUMA node -> CPUs of this host that this process may use.
+
+    Falls back to a single node when the host has no NUMA information.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        usable = set(os.sched_getaffinity(0))
+    else:
+        usable = set(range(os.cpu_count() or 1))
+    nodes: Dict[int, List[int]] = {}
+    try:
+        entries = os.listdir(sysfs)
+    except OSError:
+        entries = []
+    for entry in entries:
+        match = re.fullmatch(r"node(\d+)", entry)
+        if match is None:
+            continue
+        try:
+            with open(os.path.join(sysfs, entry, "cpulist")) as f:
+                cpus = [cpu for cpu in parse_cpulist(f.read()) if cpu in usable]
+        except (OSError, ValueError):
+            continue
+        if cpus:
+            nodes[int(match.group(1))] = cpus
+    return nodes or {0: sorted(usable)}
+
+
+def read_node_memory(sysfs: str = NUMA_SYSFS) -> Dict[int, int]:
+    """NUMA node -> total memory in bytes; empty if unknown."""
+    memory = {}
+    try:
+        entries = os.listdir(sysfs)
+    except OSError:
+        return memory
+    for entry in entries:
+        match = re.fullmatch(r"node(\d+)", entry)
+        if match is None:
+            continue
+        try:
+            with open(os.path.join(sysfs, entry, "meminfo")) as f:
+                for line in f:
+                    # "Node 0 MemTotal:       32768000 kB"
+                    if "MemTotal:" in line:
+                        memory[int(match.group(1))] = int(line.split()[-2]) * 1024
+                        break
+        except (OSError, ValueError):
+            continue
+    return memory
+
+
+def docker_resources(placement: Dict[str, Any]) -> Dict[str, Any]:
+    """`containers.run` / `update` options that apply a placement."""
+    resources: Dict[str, Any] = {
+        "cpuset_cpus": format_cpulist(placement["cpus"]),
+        "cpuset_mems": str(placement["node"]),
+    }
+    if placement.get("memory_bytes") is not None:
+        # No swap on top, so the limit is what the runner really gets
+        resources["mem_limit"] = placement["memory_bytes"]
+        resources["memswap_limit"] = placement["memory_bytes"]
+    return resources
+
+
+def placement_from_host_config(host_config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Recover the placement of an existing container from its HostConfig."""
+    cpus, mems = host_config.get("CpusetCpus"), host_config.get("CpusetMems")
+    if not cpus or not mems:
+        return None
+    try:
+        nodes = parse_cpulist(mems)
+        return {"node": nodes[0], "cpus": parse_cpulist(cpus), "memory_bytes": host_config.get("Memory") or None}
+    except (ValueError, IndexError):
+        return None
+
+
+class Placer:
+    """Hands out CPUs and memory of the host's NUMA nodes to runners."""
+
+    def __init__(
+        self,
+        topology: Dict[int, List[int]],
+        node_memory: Optional[Dict[int, int]] = None,
+        runners_per_cpu: int = 1,
+    ):
+        self.topology = {node: sorted(cpus) for node, cpus in topology.items()}
+        # Nodes missing here don't have their memory checked
+        self.node_memory = dict(node_memory or {})
+        # How many runners may share one CPU; 1 gives each runner its own cores
+        self.runners_per_cpu = runners_per_cpu
+        self._lock = threading.Lock()
+        # cpu -> runners pinned to it
+        self._cpu_load: Dict[int, int] = {cpu: 0 for cpus in self.topology.values() for cpu in cpus}
+        # node -> memory handed out
+        self._memory_used: Dict[int, int] = {node: 0 for node in self.topology}
+        # runner name -> (code_hash, placement); pooled runners have no hash
+        self._placements: Dict[str, Tuple[Optional[str], Dict[str, Any]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._placements)
+
+    @property
+    def free_slots(self) -> int:
+        """Runners that could still be pinned to a CPU."""
+        with self._lock:
+            return sum(max(self.runners_per_cpu - load, 0) for load in self._cpu_load.values())
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            found = self._placements.get(name)
+        return found[1] if found is not None else None
+
+    def _account(self, placement: Dict[str, Any], sign: int) -> None:
+        for cpu in placement["cpus"]:
+            if cpu in self._cpu_load:
+                self._cpu_load[cpu] += sign
+        node = placement["node"]
+        if placement.get("memory_bytes") is not None and node in self._memory_used:
+            self._memory_used[node] += sign * placement["memory_bytes"]
+
+    def _choose(self, code_hash: Optional[str], profile: ResourceProfile) -> Optional[Dict[str, Any]]:
+        # CPUs and nodes already used by runners of this function
+        same_cpus: Dict[int, int] = {}
+        same_nodes: Dict[int, int] = {}
+        if code_hash is not None:
+            for placed_hash, placement in self._placements.values():
+                if placed_hash == code_hash:
+                    same_nodes[placement["node"]] = same_nodes.get(placement["node"], 0) + 1
+                    for cpu in placement["cpus"]:
+                        same_cpus[cpu] = same_cpus.get(cpu, 0) + 1
+
+        best, best_key = None, None
+        for node, cpus in self.topology.items():
+            free = [cpu for cpu in cpus if self._cpu_load[cpu] < self.runners_per_cpu]
+            if len(free) < profile.cpus:
+                continue
+            limit = self.node_memory.get(node)
+            if (
+                profile.memory_bytes is not None
+                and limit is not None
+                and self._memory_used[node] + profile.memory_bytes > limit
+            ):
+                continue
+            idle = sum(self.runners_per_cpu - self._cpu_load[cpu] for cpu in cpus)
+            key = (same_nodes.get(node, 0), -idle, node)
+            if best_key is None or key < best_key:
+                best_key = key
+                # Least loaded cores, away from this function's other runners
+                chosen = sorted(free, key=lambda cpu: (same_cpus.get(cpu, 0), self._cpu_load[cpu], cpu))
+                best = {"node": node, "cpus": sorted(chosen[:profile.cpus]), "memory_bytes": profile.memory_bytes}
+        return best
+
+    def place(self, name: str, code_hash: Optional[str], profile: ResourceProfile) -> Optional[Dict[str, Any]]:
+        """Reserve CPUs and memory for runner `name`; None if no node has room."""
+        with self._lock:
+            placement = self._choose(code_hash, profile)
+            if placement is not None:
+                self._account(placement, 1)
+                self._placements[name] = (code_hash, placement)
+            return placement
+
+    def move(self, name: str, code_hash: Optional[str], profile: ResourceProfile) -> Optional[Dict[str, Any]]:
+        """Place runner `name` again, e.g. a pooled runner claimed for `code_hash`.
+
+        Returns the new placement, or None (keeping the old one) if there is
+        no room for it.
+        """
+        with self._lock:
+            old = self._placements.pop(name, None)
+            if old is not None:
+                self._account(old[1], -1)
+            placement = self._choose(code_hash, profile)
+            if placement is None:
+                if old is not None:
+                    self._account(old[1], 1)
+                    self._placements[name] = old
+                return None
+            self._account(placement, 1)
+            self._placements[name] = (code_hash, placement)
+            return placement
+
+    def assign(self, name: str, code_hash: Optional[str], placement: Dict[str, Any]) -> None:
+        """Record a runner's existing placement (e.g. an adopted container), even over capacity."""
+        with self._lock:
+            old = self._placements.pop(name, None)
+            if old is not None:
+                self._account(old[1], -1)
+            self._account(placement, 1)
+            self._placements[name] = (code_hash, placement)
+
+    def release(self, name: str) -> None:
+        with self._lock:
+            old = self._placements.pop(name, None)
+            if old is not None:
+                self._account(old[1], -1)
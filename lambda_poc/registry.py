@@ -0,0 +1,78 @@
+"""On-disk registry of runner containers shared across dispatcher processes.
+
+A small JSON file maps container names to {code_hash, addr, socket,
+payload_dir, last_used}. Dispatchers pointed at the same file adopt each
+other's warm containers (and their own after a restart) without asking
+Docker, and see each other's traffic before removing an idle container.
+Access is serialized with an flock on a sidecar lock file.
+"""
+import contextlib
+import fcntl
+import json
+import os
+from typing import Dict, Iterable, Optional
+
+
+class ContainerRegistry:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock_path = path + ".lock"
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write(self, records: Dict[str, Dict]) -> None:
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(records, f)
+        os.replace(tmp_path, self.path)
+
+    def load(self) -> Dict[str, Dict]:
+        with self._locked():
+            return self._read()
+
+    def get(self, name: str) -> Optional[Dict]:
+        return self.load().get(name)
+
+    def put(self, name: str, record: Dict) -> None:
+        with self._locked():
+            records = self._read()
+            records[name] = record
+            self._write(records)
+
+    def remove(self, names: Iterable[str]) -> None:
+        with self._locked():
+            records = self._read()
+            removed = [records.pop(name) for name in names if name in records]
+            if removed:
+                self._write(records)
+
+    def touch(self, last_used: Dict[str, float]) -> Dict[str, Dict]:
+        """Merge last-used times into the registry and return all records.
+
+        Each record keeps the latest time reported by any dispatcher.
+        """
+        with self._locked():
+            records = self._read()
+            changed = False
+            for name, ts in last_used.items():
+                record = records.get(name)
+                if record is not None and ts > record.get("last_used", 0):
+                    record["last_used"] = ts
+                    changed = True
+            if changed:
+                self._write(records)
+            return records
@@ -0,0 +1,144 @@
+"""Retry policy and circuit breaker for runner calls.
+
+A failed attempt is classified before it is retried. The entrypoint raising
+(`UserCodeError`), a request the runner rejected (other 4xx) or a passed
+deadline would fail the same way again, so they are raised at once.
+Connection errors and other runner 5xx responses are retried after a
+jittered exponential backoff that never sleeps past the call's deadline.
+
+Runner failures also feed a circuit breaker per code hash: after
+`failure_threshold` of them in a row, calls fail fast with
+`CircuitOpenError` for `reset_seconds`, then a single trial call decides
+whether the circuit closes again. A trial that never reports back is given
+up after another `reset_seconds`.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from typing import Dict, Mapping, Optional, Tuple
+
+from .constants import ERROR_KIND_HEADER
+from .errors import CircuitOpenError, DeadlineExceeded, UserCodeError
+from .metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left until `deadline` (a `time.monotonic()` value).
+
+    None without a deadline; raises `DeadlineExceeded` once it has passed.
+    """
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("Deadline exceeded")
+    return left
+
+
+def _detail(text: str) -> str:
+    # FastAPI error bodies are {"detail": "..."}
+    try:
+        return str(json.loads(text)["detail"])
+    except (ValueError, KeyError, TypeError):
+        return text
+
+
+def classify_response(status_code: int, headers: Mapping[str, str], text: str) -> Tuple[Optional[Exception], bool]:
+    """Return (error, retryable) for a runner response; error is None on success."""
+    if status_code < 400:
+        return None, False
+    kind = headers.get(ERROR_KIND_HEADER)
+    if kind == "user":
+        return UserCodeError(_detail(text)), False
+    if kind == "deadline":
+        return DeadlineExceeded(_detail(text)), False
+    if status_code >= 500:
+        return RuntimeError(f"Runner failed with HTTP {status_code}: {_detail(text)}"), True
+    return RuntimeError(f"Runner rejected the request with HTTP {status_code}: {_detail(text)}"), False
+
+
+class RetryPolicy:
+    """How many attempts a call gets and how long to wait between them."""
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, deadline: Optional[float]) -> float:
+        """Seconds to sleep before retry number `attempt` (1 for the first).
+
+        "Full jitter": uniform between 0 and the exponential backoff, so
+        callers that failed together don't retry together. Raises
+        `DeadlineExceeded` if the deadline would pass during the sleep.
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        left = remaining(deadline)
+        if left is not None and delay >= left:
+            raise DeadlineExceeded("Deadline exceeded before the next attempt")
+        return delay
+
+
+class CircuitBreaker:
+    """Fails calls fast while a function's runners keep failing."""
+
+    def __init__(self, failure_threshold: Optional[int], reset_seconds: float, metrics: Metrics):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        # code_hash -> runner failures in a row
+        self._failures: Dict[str, int] = {}
+        # code_hash -> when its circuit opened (time.monotonic())
+        self._opened: Dict[str, float] = {}
+        # Open circuits with a trial call in flight -> when it started
+        self._probing: Dict[str, float] = {}
+
+    @property
+    def open_circuits(self) -> int:
+        return len(self._opened)
+
+    def check(self, code_hash: str) -> None:
+        """Raise `CircuitOpenError` unless a call to `code_hash` may go ahead."""
+        if self.failure_threshold is None:
+            return
+        with self._lock:
+            opened = self._opened.get(code_hash)
+            if opened is None:
+                return
+            now = time.monotonic()
+            probe = self._probing.get(code_hash)
+            # A trial whose caller never recorded its outcome doesn't hold
+            # the circuit open for good
+            if now - opened >= self.reset_seconds and (probe is None or now - probe >= self.reset_seconds):
+                # Half-open: this call is the trial
+                self._probing[code_hash] = now
+                return
+        self.metrics.incr("circuit_rejected")
+        raise CircuitOpenError(f"Circuit open for {code_hash}: its runners keep failing")
+
+    def record(self, code_hash: str, healthy: Optional[bool]) -> None:
+        """Record an attempt: the runner worked, failed, or None if it can't tell."""
+        if self.failure_threshold is None:
+            return
+        with self._lock:
+            self._probing.pop(code_hash, None)
+            if healthy is None:
+                return
+            if healthy:
+                self._failures.pop(code_hash, None)
+                if self._opened.pop(code_hash, None) is not None:
+                    logger.info(f"Circuit closed for {code_hash}")
+                return
+            failures = self._failures.get(code_hash, 0) + 1
+            self._failures[code_hash] = failures
+            if failures >= self.failure_threshold:
+                if code_hash not in self._opened:
+                    self.metrics.incr("circuit_opened")
+                    logger.warning(f"Circuit opened for {code_hash} after {failures} failures in a row")
+                # A failed trial keeps it open for another `reset_seconds`
+                self._opened[code_hash] = time.monotonic()
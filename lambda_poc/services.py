@@ -3,10 +3,14 @@
 This keeps the low-level docker interactions in a single place making the
 Dispatcher class easier to test and reason about.
 """
-from typing import Dict
+from typing import Any, Dict, List, Optional
 import docker
+import io
+import os
+import tarfile
 import time
 import logging
+from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 
@@ -14,9 +18,17 @@ logger = logging.getLogger(__name__)
 class DockerService:
     """Wrapper for simple Docker operations used by the dispatcher."""
 
-    def __init__(self, network: str):
-        self.client = docker.from_env()
+    def __init__(self, network: str, base_url: Optional[str] = None):
+        """Talk to the daemon at `base_url` (e.g. "tcp://10.0.0.5:2376"), or the one from the environment."""
+        self.client = docker.DockerClient(base_url=base_url) if base_url else docker.from_env()
         self.network = network
+        # Address published container ports are reached at; None for a local
+        # daemon, whose ports are bound on this machine
+        self.host = urlparse(base_url).hostname if base_url else None
+
+    def ping(self) -> bool:
+        """Whether the daemon answers; raises if it can't be reached."""
+        return self.client.ping()
 
     def ensure_network(self):
         try:
@@ -27,24 +39,90 @@ class DockerService:
     def get_container(self, name: str):
         return self.client.containers.get(name)
 
-    def run_container(self, image: str, name: str, ports: Dict[str, int]):
+    def run_container(
+        self,
+        image: str,
+        name: str,
+        ports: Dict[str, int],
+        environment: Optional[Dict[str, str]] = None,
+        volumes: Optional[Dict[str, Dict[str, str]]] = None,
+        labels: Optional[Dict[str, str]] = None,
+        resources: Optional[Dict[str, Any]] = None,
+    ):
+        """Start a container; `resources` are extra `containers.run` options such as cpuset_cpus or mem_limit."""
         return self.client.containers.run(
-            image, name=name, network=self.network, detach=True, ports=ports, auto_remove=True
+            image, name=name, network=self.network, detach=True, ports=ports, auto_remove=True,
+            environment=environment, volumes=volumes, labels=labels, **(resources or {}),
         )
 
+    def update_container(self, name: str, resources: Dict[str, Any]):
+        """Change the CPU / memory limits of a running container, as `docker update`."""
+        self.client.containers.get(name).update(**resources)
+
+    def list_containers(self, labels: Dict[str, str]) -> List:
+        """Return running containers carrying all of `labels`."""
+        return self.client.containers.list(filters={"label": [f"{k}={v}" for k, v in labels.items()]})
+
+    def container_memory(self, name: str) -> int:
+        """Current memory use of a container in bytes, as `docker stats` shows it."""
+        stats = self.client.containers.get(name).stats(stream=False, one_shot=True)
+        memory = stats.get("memory_stats", {})
+        detail = memory.get("stats", {})
+        # Like the docker CLI, don't count reclaimable page cache
+        cache = detail.get("inactive_file", detail.get("total_inactive_file", 0))
+        return max(memory.get("usage", 0) - cache, 0)
+
+    def snapshot_container(
+        self,
+        name: str,
+        image: str,
+        files: Dict[str, str],
+        environment: Dict[str, str],
+        labels: Dict[str, str],
+    ):
+        """Write `files` into container `name` and commit it as image `image`.
+
+        `environment` and `labels` are set on the new image. The container
+        keeps running while it is committed.
+        """
+        cont = self.client.containers.get(name)
+        for path, content in files.items():
+            data = content.encode()
+            archive = io.BytesIO()
+            with tarfile.open(fileobj=archive, mode="w") as tar:
+                info = tarfile.TarInfo(os.path.basename(path))
+                info.size = len(data)
+                info.mode = 0o644
+                info.mtime = int(time.time())
+                tar.addfile(info, io.BytesIO(data))
+            cont.put_archive(os.path.dirname(path), archive.getvalue())
+        repository, _, tag = image.rpartition(":")
+        changes = [f"ENV {k}={v}" for k, v in environment.items()]
+        changes += [f"LABEL {k}={v}" for k, v in labels.items()]
+        return cont.commit(repository=repository, tag=tag, changes=changes, pause=False)
+
+    def list_images(self, labels: Dict[str, str]) -> List:
+        """Return images carrying all of `labels`."""
+        return self.client.images.list(filters={"label": [f"{k}={v}" for k, v in labels.items()]})
+
+    def remove_image(self, image: str):
+        try:
+            # Containers started from it keep running on the untagged image
+            self.client.images.remove(image, force=True)
+        except docker.errors.ImageNotFound:
+            pass
+
     def remove_container(self, name: str):
+        # One round-trip that kills and removes it. A plain kill would leave
+        # the removal to `auto_remove`, but the name is only free for reuse
+        # once the container is gone.
         try:
-            cont = self.client.containers.get(name)
-            try:
-                cont.kill()
-            except Exception:
-                pass
-            try:
-                cont.remove()
-            except Exception:
-                pass
+            self.client.api.remove_container(name, force=True)
         except docker.errors.NotFound:
             pass
+        except docker.errors.APIError as e:
+            # E.g. 409 when `auto_remove` is already removing it
+            logger.debug(f"Could not remove container {name}: {e}")
 
     def remove_network(self):
         try:
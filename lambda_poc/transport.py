@@ -0,0 +1,102 @@
+"""HTTP transport helpers for Dispatcher <-> runner calls.
+
+Each runner container gets its own `requests.Session` so connections to it
+are kept alive and reused across invocations instead of paying a fresh TCP
+connect per call. Runners can also listen on a Unix socket instead of a
+published port; their sessions then connect to that socket whatever host
+the URL names.
+"""
+import os
+import socket
+from typing import Callable, Dict, Optional
+
+import httpx
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.timeout import _DEFAULT_TIMEOUT
+
+
+class _UnixHTTPConnection(HTTPConnection):
+    def __init__(self, *args, socket_path: str, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.socket_path = socket_path
+
+    def _new_conn(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not _DEFAULT_TIMEOUT:
+            sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except socket.timeout as e:
+            sock.close()
+            raise ConnectTimeoutError(self, f"Connection to {self.socket_path} timed out") from e
+        except OSError as e:
+            sock.close()
+            raise NewConnectionError(self, f"Failed to connect to {self.socket_path}: {e}") from e
+        return sock
+
+
+class _UnixHTTPConnectionPool(urllib3.HTTPConnectionPool):
+    ConnectionCls = _UnixHTTPConnection
+
+
+class UnixSocketAdapter(HTTPAdapter):
+    """Transport adapter sending every request to one Unix socket."""
+
+    def __init__(self, socket_path: str, pool_size: int):
+        super().__init__(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self._pool = _UnixHTTPConnectionPool("localhost", maxsize=pool_size, socket_path=socket_path)
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        return self._pool
+
+    def close(self) -> None:
+        self._pool.close()
+        super().close()
+
+
+def make_session(pool_size: int, socket_path: Optional[str] = None) -> requests.Session:
+    """Create a keep-alive session holding up to `pool_size` connections.
+
+    With `socket_path`, the session talks to the runner listening on that
+    Unix socket instead of a TCP address.
+    """
+    session = requests.Session()
+    # Retries are handled by the dispatcher itself
+    if socket_path is not None:
+        adapter = UnixSocketAdapter(socket_path, pool_size)
+    else:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+    session.mount("http://", adapter)
+    return session
+
+
+class AsyncUnixSocketTransport(httpx.AsyncBaseTransport):
+    """httpx transport routing `http://<name>/...` to the Unix socket of runner `name`."""
+
+    def __init__(self, socket_path_for: Callable[[str], str], limits: httpx.Limits):
+        self._socket_path_for = socket_path_for
+        self._limits = limits
+        self._transports: Dict[str, httpx.AsyncHTTPTransport] = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        transport = self._transports.get(host)
+        if transport is None:
+            # Drop transports of runners that are gone before adding one
+            for name, stale in list(self._transports.items()):
+                if not os.path.exists(self._socket_path_for(name)):
+                    del self._transports[name]
+                    await stale.aclose()
+            transport = httpx.AsyncHTTPTransport(uds=self._socket_path_for(host), limits=self._limits)
+            self._transports[host] = transport
+        return await transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        transports = list(self._transports.values())
+        self._transports.clear()
+        for transport in transports:
+            await transport.aclose()
@@ -1,27 +1,115 @@
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
+import asyncio
+import hashlib
+import inspect
+import json
+import mmap
+import multiprocessing
+import tempfile
 import types
 import uvicorn
 import threading
 import time
 import os
+import re
 import logging
-from typing import Any, Dict, Optional
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional, faster JSON
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional binary format
+    msgpack = None
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    _preload_user_code()
+    yield
+    # Forked workers don't notice the server exiting; stop them explicitly
+    _shutdown_executor()
+
+
+app = FastAPI(lifespan=_lifespan)
 # runtime module created by /load
 user_module: Optional[types.ModuleType] = None
+# sha256[:16] of the loaded code, same as the dispatcher's code hash
+user_code_hash: Optional[str] = None
 
 # Idle timeout in seconds. If no requests (/load or /run) are received for
 # this many seconds the runner will exit. Controlled via env var
 # RUNNER_IDLE_TTL (defaults to 60 seconds). Set to 0 or negative to disable.
-RUNNER_IDLE_TTL = int(os.environ.get("RUNNER_IDLE_TTL", "60"))
+RUNNER_IDLE_TTL = int(os.environ.get("RUNNER_IDLE_TTL") or "60")
+
+# Set to 1 on the dispatcher's warm-pool runners: the idle timeout only
+# applies once code is loaded, so a runner can wait code-less in the pool
+# until it is claimed, and still exits once it is no longer used.
+RUNNER_WAIT_FOR_LOAD = os.environ.get("RUNNER_WAIT_FOR_LOAD") == "1"
+
+# How a synchronous `entrypoint` is executed, controlled via env var
+# RUNNER_EXEC_MODE:
+#   "thread"  (default) - in a pool of RUNNER_WORKERS threads, off the event loop
+#   "process" - in a pool of RUNNER_WORKERS processes forked after /load, so
+#               workers share the loaded module copy-on-write
+#   "inline"  - directly on the event loop (blocks other requests)
+# An `async def entrypoint` is always awaited on the event loop.
+RUNNER_EXEC_MODE = os.environ.get("RUNNER_EXEC_MODE", "thread")
+if RUNNER_EXEC_MODE not in ("inline", "thread", "process"):
+    raise ValueError(f"Invalid RUNNER_EXEC_MODE: {RUNNER_EXEC_MODE!r}")
+
+# Number of worker threads/processes (defaults to 1, which keeps calls
+# serialized like "inline" while still leaving the event loop free).
+RUNNER_WORKERS = int(os.environ.get("RUNNER_WORKERS") or "1")
+
+# Directory shared with the dispatcher (a bind mount) through which large
+# payloads and results are passed as files instead of HTTP bodies. Unset
+# disables payload files.
+RUNNER_PAYLOAD_DIR = os.environ.get("RUNNER_PAYLOAD_DIR") or None
+
+# File with user code to load at startup, before serving requests. Set in
+# the per-code-hash snapshot images the dispatcher commits, so runners
+# started from them come up loaded without a /load call.
+RUNNER_PRELOAD = os.environ.get("RUNNER_PRELOAD") or None
+
+# Compiled user code by sha256[:16] of its source (the dispatcher's code
+# hash), most recently loaded last. Loading known code again skips parsing,
+# and /load may then be sent the hash alone. Holds up to
+# RUNNER_CODE_CACHE_SIZE entries (defaults to 32).
+RUNNER_CODE_CACHE_SIZE = int(os.environ.get("RUNNER_CODE_CACHE_SIZE") or "32")
+_code_cache: "OrderedDict[str, types.CodeType]" = OrderedDict()
+
+# Recent /run and /run_batch calls by Idempotency-Key, most recent last. A
+# retried call whose response was lost joins the original (running or
+# done) instead of running again. Holds up to RUNNER_IDEMPOTENCY_CACHE_SIZE
+# calls and their results (defaults to 32; 0 disables).
+RUNNER_IDEMPOTENCY_CACHE_SIZE = int(os.environ.get("RUNNER_IDEMPOTENCY_CACHE_SIZE") or "32")
+_recent_calls: "OrderedDict[str, asyncio.Future]" = OrderedDict()
+
+# Executor running `entrypoint`; recreated on /load in "process" mode
+_executor: Optional[Executor] = None
+if RUNNER_EXEC_MODE == "thread":
+    _executor = ThreadPoolExecutor(max_workers=RUNNER_WORKERS)
 
 # Track last activity timestamp (monotonic)
 _last_activity = time.monotonic()
 
 
+def _shutdown_executor() -> None:
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+
+
 def _touch_activity() -> None:
     global _last_activity
     _last_activity = time.monotonic()
@@ -35,8 +123,9 @@ def _idle_monitor() -> None:
     while True:
         now = time.monotonic()
         idle = now - _last_activity
-        if idle > RUNNER_IDLE_TTL:
+        if idle > RUNNER_IDLE_TTL and not (RUNNER_WAIT_FOR_LOAD and user_module is None):
             logger.info("No activity for %s seconds, exiting", idle)
+            _shutdown_executor()
             # Forcefully exit the process; uvicorn will stop with this.
             try:
                 os._exit(0)
@@ -47,61 +136,533 @@ def _idle_monitor() -> None:
 
 
 
+def _call_entrypoint(payload: Any) -> Any:
+    # Runs inside forked worker processes, which inherit `user_module`
+    return user_module.entrypoint(payload)
+
+
+def _fork_workers() -> None:
+    """Replace the process pool with workers forked from the loaded module."""
+    global _executor
+    old = _executor
+    _executor = ProcessPoolExecutor(
+        max_workers=RUNNER_WORKERS, mp_context=multiprocessing.get_context("fork")
+    )
+    # The first submit forks all workers now, while the module is fresh
+    _executor.submit(int).result()
+    if old is not None:
+        old.shutdown(wait=False, cancel_futures=True)
+
+
+JSON_CONTENT_TYPE = "application/json"
+MSGPACK_CONTENT_TYPE = "application/x-msgpack"
+RAW_CONTENT_TYPE = "application/octet-stream"
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+# Payload file headers, see lambda_poc/payloads.py
+PAYLOAD_REF_HEADER = "X-Payload-Ref"
+PAYLOAD_FORMAT_HEADER = "X-Payload-Format"
+PAYLOAD_THRESHOLD_HEADER = "X-Payload-Threshold"
+# Seconds spent running `entrypoint` for this request, for the dispatcher's metrics
+EXEC_TIME_HEADER = "X-Exec-Seconds"
+# Call headers, see lambda_poc/retry.py: seconds left until the caller gives
+# up, and a key repeated on every retry of one call
+DEADLINE_HEADER = "X-Deadline-Seconds"
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+# Set on error responses the dispatcher should not retry: "user" (the user's
+# code raised) or "deadline"
+ERROR_KIND_HEADER = "X-Error-Kind"
+# orjson reads integers beyond 64 bits as floats; bodies that may hold one
+# (20+ digits in a row) are parsed with stdlib json
+_LONG_NUMBER = re.compile(rb"\d{20}")
+
+
+def _mime(content_type: Optional[str]) -> str:
+    return (content_type or JSON_CONTENT_TYPE).split(";")[0].strip()
+
+
+def _decode_body(content_type: Optional[str], body: bytes) -> Any:
+    """Decode a request body according to its Content-Type (JSON by default)."""
+    mime = _mime(content_type)
+    try:
+        if mime == RAW_CONTENT_TYPE:
+            return body
+        if mime == MSGPACK_CONTENT_TYPE:
+            if msgpack is None:
+                raise HTTPException(status_code=415, detail="msgpack is not installed in this runner")
+            return msgpack.unpackb(body, raw=False, strict_map_key=False)
+        if orjson is not None and not _LONG_NUMBER.search(body):
+            return orjson.loads(body)
+        return json.loads(body)
+    except HTTPException:
+        raise
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid request body: {exc}")
+
+
+def _dump(result: Any, use_msgpack: bool) -> bytes:
+    if use_msgpack:
+        return msgpack.packb(result, use_bin_type=True)
+    if orjson is not None:
+        try:
+            return orjson.dumps(result, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # E.g. integers beyond 64 bits; stdlib json writes those
+            pass
+    return json.dumps(result, separators=(",", ":")).encode()
+
+
+def _serialize(result: Any, use_msgpack: bool) -> Tuple[bytes, bool]:
+    """`_dump`, through jsonable_encoder if needed, and whether the bytes are msgpack.
+
+    Results msgpack can't encode (e.g. integers beyond 64 bits) are sent as
+    JSON instead; a result neither can encode is a user error.
+    """
+    error: Optional[Exception] = None
+    for packed in (True, False) if use_msgpack else (False,):
+        try:
+            return _dump(result, packed), packed
+        except (TypeError, ValueError, OverflowError) as exc:
+            error = exc
+        try:
+            return _dump(jsonable_encoder(result), packed), packed
+        except Exception as exc:
+            error = exc
+    raise HTTPException(
+        status_code=500, detail=f"Result can't be serialized: {error}", headers={ERROR_KIND_HEADER: "user"}
+    )
+
+
+def _encode_response(request: Request, result: Any) -> Response:
+    """Serialize `result` directly into a Response, bypassing jsonable_encoder.
+
+    bytes results are returned raw and others in msgpack when the caller
+    accepts it, JSON otherwise. Values the fast encoders can't handle (e.g.
+    sets, pydantic models) go through jsonable_encoder first, as FastAPI
+    would do. Results above the caller's X-Payload-Threshold are written to
+    the payload directory instead of the body.
+    """
+    accept = request.headers.get("accept") or ""
+    if isinstance(result, (bytes, bytearray, memoryview)) and RAW_CONTENT_TYPE in accept:
+        content, media_type = memoryview(result), RAW_CONTENT_TYPE
+    else:
+        content, packed = _serialize(result, msgpack is not None and MSGPACK_CONTENT_TYPE in accept)
+        media_type = MSGPACK_CONTENT_TYPE if packed else JSON_CONTENT_TYPE
+
+    threshold = request.headers.get(PAYLOAD_THRESHOLD_HEADER)
+    if RUNNER_PAYLOAD_DIR is not None and threshold is not None and memoryview(content).nbytes >= int(threshold):
+        ref = _write_payload(content)
+        return Response(headers={PAYLOAD_REF_HEADER: ref, PAYLOAD_FORMAT_HEADER: media_type})
+    if isinstance(content, memoryview):
+        # May point into a payload mapping that is closed before the body is sent
+        content = content.tobytes()
+    return Response(content=content, media_type=media_type)
+
+
+def _write_payload(content: Any) -> str:
+    """Write a result to the payload directory; the dispatcher deletes it."""
+    fd, path = tempfile.mkstemp(prefix="out-", dir=RUNNER_PAYLOAD_DIR)
+    # The dispatcher may run as a different user
+    os.fchmod(fd, 0o644)
+    with os.fdopen(fd, "wb") as f:
+        f.write(content)
+    return os.path.basename(path)
+
+
+def _open_payload(ref: str, content_type: Optional[str]) -> Tuple[Any, Optional[mmap.mmap]]:
+    """Load a payload file written by the dispatcher.
+
+    Raw payloads are mapped and returned as a read-only memoryview (valid
+    until the call returns) together with the mapping to close afterwards.
+    """
+    if RUNNER_PAYLOAD_DIR is None:
+        raise HTTPException(status_code=415, detail="Payload files are not enabled in this runner")
+    if not ref or ref.startswith(".") or os.path.basename(ref) != ref:
+        raise HTTPException(status_code=400, detail="Invalid payload reference")
+    try:
+        with open(os.path.join(RUNNER_PAYLOAD_DIR, ref), "rb") as f:
+            if _mime(content_type) == RAW_CONTENT_TYPE:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return b"", None
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                return memoryview(mapped), mapped
+            data = f.read()
+    except FileNotFoundError:
+        raise HTTPException(status_code=400, detail=f"Payload file {ref} not found")
+    return _decode_body(content_type, data), None
+
+
+def _close_payload(payload: Any, mapped: Optional[mmap.mmap]) -> None:
+    if mapped is None:
+        return
+    try:
+        payload.release()
+        mapped.close()
+    except BufferError:
+        # User code kept a reference to the buffer; let GC unmap it
+        pass
+
+
+async def _read_payload(request: Request) -> Tuple[Any, Optional[mmap.mmap]]:
+    """Return the request payload and the mapping backing it, if any."""
+    ref = request.headers.get(PAYLOAD_REF_HEADER)
+    if ref is not None:
+        return _open_payload(ref, request.headers.get(PAYLOAD_FORMAT_HEADER))
+    return _decode_body(request.headers.get("content-type"), await request.body()), None
+
+
+async def _invoke(payload: Any) -> Any:
+    """Call the loaded `entrypoint` according to RUNNER_EXEC_MODE."""
+    entrypoint = user_module.entrypoint
+    if inspect.iscoroutinefunction(entrypoint):
+        return await entrypoint(payload)
+    if _executor is None:
+        return entrypoint(payload)
+    loop = asyncio.get_running_loop()
+    if RUNNER_EXEC_MODE == "process":
+        if isinstance(payload, memoryview):
+            # Mapped payloads can't be pickled to worker processes
+            payload = payload.tobytes()
+        return await loop.run_in_executor(_executor, _call_entrypoint, payload)
+    return await loop.run_in_executor(_executor, entrypoint, payload)
+
+
+class _DeadlineExceeded(Exception):
+    pass
+
+
+def _deadline(request: Request) -> Optional[float]:
+    """Monotonic time at which the caller gives up, from DEADLINE_HEADER."""
+    seconds = request.headers.get(DEADLINE_HEADER)
+    if seconds is None:
+        return None
+    try:
+        return time.monotonic() + float(seconds)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {DEADLINE_HEADER} header")
+
+
+def _run_once(key: Optional[str], call: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+    """Start `call()` as a task, or return the recent call with the same idempotency key."""
+    if key is None or RUNNER_IDEMPOTENCY_CACHE_SIZE <= 0:
+        return asyncio.ensure_future(call())
+    task = _recent_calls.get(key)
+    if task is not None and not task.cancelled():
+        _recent_calls.move_to_end(key)
+        return task
+    task = asyncio.ensure_future(call())
+    _recent_calls[key] = task
+    while len(_recent_calls) > RUNNER_IDEMPOTENCY_CACHE_SIZE:
+        _recent_calls.popitem(last=False)
+    return task
+
+
+async def _until_deadline(task: asyncio.Future, deadline: Optional[float]) -> Any:
+    """Await `task`, cancelling it if `deadline` passes first.
+
+    Cancelling stops an async entrypoint at its next await. A sync one
+    can't be interrupted: its worker keeps running until it returns, but the
+    caller gets its answer at the deadline.
+    """
+    if deadline is None:
+        return await task
+    done, _ = await asyncio.wait({task}, timeout=max(0.0, deadline - time.monotonic()))
+    if not done:
+        task.cancel()
+        raise _DeadlineExceeded()
+    return task.result()
+
+
+def _call_error(exc: Exception, start: float) -> HTTPException:
+    """The error response of a call that raised `exc` or ran out of time."""
+    headers = {EXEC_TIME_HEADER: f"{time.perf_counter() - start:.6f}"}
+    if isinstance(exc, _DeadlineExceeded):
+        headers[ERROR_KIND_HEADER] = "deadline"
+        return HTTPException(status_code=504, detail="Deadline exceeded", headers=headers)
+    # Surface user-code exceptions as server errors with the exception string
+    headers[ERROR_KIND_HEADER] = "user"
+    return HTTPException(status_code=500, detail=f"User code raised an exception: {exc}", headers=headers)
+
+
+@app.get("/healthz")
+async def healthz() -> Dict[str, Any]:
+    """Readiness probe used by the dispatcher once the container is started.
+
+    Answers as soon as the server accepts requests. Probes don't count as
+    activity for the idle monitor. Also reports which code is loaded and
+    how long the runner has been idle, so a restarted dispatcher can adopt
+    this container.
+    """
+    return {
+        "status": "ok",
+        "loaded": user_module is not None,
+        "code_hash": user_code_hash,
+        "idle_seconds": time.monotonic() - _last_activity,
+    }
+
+
+def _compile_user_code(code_str: Optional[str], code_hash: Optional[str]) -> Tuple[types.CodeType, str]:
+    """Return the compiled code and its hash, from the cache when possible."""
+    if code_str is not None:
+        code_hash = hashlib.sha256(code_str.encode()).hexdigest()[:16]
+    code = _code_cache.get(code_hash)
+    if code is not None:
+        _code_cache.move_to_end(code_hash)
+        return code, code_hash
+    if code_str is None:
+        raise HTTPException(status_code=404, detail=f"Unknown code hash: {code_hash}")
+    try:
+        code = compile(code_str, "<user_code>", "exec")
+    except SyntaxError as exc:
+        raise HTTPException(
+            status_code=400, detail=f"Error executing code: {exc}", headers={ERROR_KIND_HEADER: "user"}
+        )
+    _code_cache[code_hash] = code
+    while len(_code_cache) > RUNNER_CODE_CACHE_SIZE:
+        _code_cache.popitem(last=False)
+    return code, code_hash
+
+
+def _load_user_code(code_str: Optional[str], code_hash: Optional[str] = None) -> None:
+    """Load code given as source, or by the hash of source loaded before."""
+    global user_module, user_code_hash
+    code, code_hash = _compile_user_code(code_str, code_hash)
+    # Create isolated module namespace for the user code
+    user_module = types.ModuleType("user_module")
+    user_code_hash = None
+    try:
+        exec(code, user_module.__dict__)
+    except Exception as exc:
+        raise HTTPException(
+            status_code=400, detail=f"Error executing code: {exc}", headers={ERROR_KIND_HEADER: "user"}
+        )
+
+    if not hasattr(user_module, "entrypoint"):
+        raise HTTPException(
+            status_code=400,
+            detail="Code must define an 'entrypoint(data)' function",
+            headers={ERROR_KIND_HEADER: "user"},
+        )
+
+    if RUNNER_EXEC_MODE == "process":
+        _fork_workers()
+
+    user_code_hash = code_hash
+
+
+def _preload_user_code() -> None:
+    if RUNNER_PRELOAD is None or not os.path.exists(RUNNER_PRELOAD):
+        return
+    with open(RUNNER_PRELOAD) as f:
+        code_str = f.read()
+    try:
+        _load_user_code(code_str)
+    except HTTPException as exc:
+        # Serve unloaded; the dispatcher falls back to /load
+        logger.error("Preloading %s failed: %s", RUNNER_PRELOAD, exc.detail)
+        return
+    logger.info("Preloaded user code %s", user_code_hash)
+    _touch_activity()
+
+
 @app.post("/load")
 async def load_code(request: Request) -> Dict[str, Any]:
     """Load user-provided Python code into a fresh module namespace.
 
-    Expects JSON body: {"code": "<python source>"}
+    Expects JSON body: {"code": "<python source>"}, or {"code_hash": "<hash>"}
+    for code this runner has loaded before (404 if it no longer has it).
     The provided code must define a function `entrypoint(data)` which will be
     called later by the `/run` endpoint.
     """
-    global user_module
     payload = await request.json()
     code_str = payload.get("code")
+    code_hash = payload.get("code_hash")
 
-    if not isinstance(code_str, str):
+    if code_str is None and isinstance(code_hash, str):
+        _load_user_code(None, code_hash)
+    elif isinstance(code_str, str):
+        _load_user_code(code_str)
+    else:
         raise HTTPException(status_code=400, detail="Missing or invalid 'code' field")
+    _touch_activity()
+    return {"status": "loaded"}
 
-    # Create isolated module namespace for the user code
-    user_module = types.ModuleType("user_module")
-    try:
-        exec(code_str, user_module.__dict__)
-    except Exception as exc:
-        raise HTTPException(status_code=400, detail=f"Error executing code: {exc}")
 
-    if not hasattr(user_module, "entrypoint"):
-        raise HTTPException(status_code=400, detail="Code must define an 'entrypoint(data)' function")
+@app.post("/run")
+async def run_code(request: Request) -> Response:
+    """Run the previously loaded `entrypoint` with the provided payload.
 
+    Expects arbitrary JSON (or msgpack / raw bytes, per Content-Type) which
+    is forwarded to `entrypoint(data)`. A payload passed as a file in the
+    payload directory (X-Payload-Ref) is forwarded as a memoryview if raw.
+    The return value from `entrypoint` is returned in the format named by
+    the Accept header, JSON by default. The call is abandoned with a 504 once
+    the caller's deadline (DEADLINE_HEADER) passes.
+    """
+    if user_module is None:
+        raise HTTPException(status_code=400, detail="No code loaded. Call /load first.")
+
+    deadline = _deadline(request)
+    payload, mapped = await _read_payload(request)
+    # A result may be a view of a mapped payload, which is unmapped below:
+    # such calls are not kept for retries
+    key = request.headers.get(IDEMPOTENCY_KEY_HEADER) if mapped is None else None
+    try:
+        start = time.perf_counter()
+        try:
+            result = await _until_deadline(_run_once(key, lambda: _invoke(payload)), deadline)
+        except Exception as exc:
+            raise _call_error(exc, start)
+        exec_seconds = time.perf_counter() - start
+        # The result may be a view of the mapped payload; encode it before unmapping
+        response = _encode_response(request, result)
+    finally:
+        _close_payload(payload, mapped)
+
+    response.headers[EXEC_TIME_HEADER] = f"{exec_seconds:.6f}"
     _touch_activity()
-    return {"status": "loaded"}
+    return response
 
 
-@app.post("/run")
-async def run_code(request: Request) -> Any:
-    """Run the previously loaded `entrypoint` with the provided JSON payload.
+@app.post("/run_batch")
+async def run_batch(request: Request) -> Response:
+    """Run `entrypoint` once per item of a batch of payloads.
 
-    Expects arbitrary JSON which is forwarded to `entrypoint(data)`.
-    The return value from `entrypoint` is returned as JSON.
+    Expects JSON body: {"inputs": [<payload>, ...]}
+    Returns {"results": [...]} in input order, where each item is either
+    {"result": <value>} or {"error": "<message>"} if that call raised.
+    Bodies use the same Content-Type / Accept negotiation as /run.
     """
     if user_module is None:
         raise HTTPException(status_code=400, detail="No code loaded. Call /load first.")
 
-    payload = await request.json()
+    payload, mapped = await _read_payload(request)
+    _close_payload(payload, mapped)
+    inputs = payload.get("inputs") if isinstance(payload, dict) else None
+    if not isinstance(inputs, list):
+        raise HTTPException(status_code=400, detail="Missing or invalid 'inputs' field")
+
+    async def run_item(item: Any) -> Dict[str, Any]:
+        try:
+            return {"result": await _invoke(item)}
+        except Exception as exc:
+            return {"error": f"User code raised an exception: {exc}"}
+
+    async def run_all() -> list:
+        # Items run concurrently up to the executor's worker count
+        return await asyncio.gather(*(run_item(item) for item in inputs))
+
+    deadline = _deadline(request)
+    start = time.perf_counter()
     try:
-        result = user_module.entrypoint(payload)
-    except Exception as exc:
-        # Surface user-code exceptions as server errors with the exception string
-        raise HTTPException(status_code=500, detail=f"User code raised an exception: {exc}")
+        results = await _until_deadline(_run_once(request.headers.get(IDEMPOTENCY_KEY_HEADER), run_all), deadline)
+    except _DeadlineExceeded as exc:
+        raise _call_error(exc, start)
+    exec_seconds = time.perf_counter() - start
 
     _touch_activity()
-    return result
+    response = _encode_response(request, {"results": results})
+    response.headers[EXEC_TIME_HEADER] = f"{exec_seconds:.6f}"
+    return response
+
+
+_STREAM_END = object()
+
+
+def _next_item(iterator) -> Any:
+    # StopIteration can't cross run_in_executor; use a sentinel instead
+    return next(iterator, _STREAM_END)
+
+
+async def _iterate(payload: Any) -> AsyncIterator[Any]:
+    """Yield the items produced by `entrypoint(payload)`.
+
+    Generator and async generator entrypoints (or entrypoints returning a
+    generator) are consumed one item at a time; any other result is a
+    single item. A sync generator advances in the executor thread, or in a
+    thread of this process in "process" mode, since generators can't be
+    sent to worker processes.
+    """
+    entrypoint = user_module.entrypoint
+    if inspect.isasyncgenfunction(entrypoint):
+        result = entrypoint(payload)
+    elif inspect.isgeneratorfunction(entrypoint):
+        # Creating the generator runs none of its code
+        result = entrypoint(payload)
+    else:
+        result = await _invoke(payload)
+
+    if inspect.isasyncgen(result):
+        async for item in result:
+            yield item
+    elif inspect.isgenerator(result):
+        loop = asyncio.get_running_loop()
+        executor = _executor if RUNNER_EXEC_MODE == "thread" else None
+        try:
+            while True:
+                if RUNNER_EXEC_MODE == "inline":
+                    item = _next_item(result)
+                else:
+                    item = await loop.run_in_executor(executor, _next_item, result)
+                if item is _STREAM_END:
+                    break
+                yield item
+        finally:
+            result.close()
+    else:
+        yield result
+
+
+def _ndjson_line(item: Dict[str, Any]) -> bytes:
+    return _serialize(item, False)[0] + b"\n"
+
+
+@app.post("/run_stream")
+async def run_stream(request: Request) -> StreamingResponse:
+    """Run `entrypoint` and stream what it yields as NDJSON.
+
+    Takes the same request bodies as /run. Each line is {"result": <item>};
+    if the entrypoint raises mid-stream, a last {"error": "<message>"} line
+    ends the stream, as does {"error": ..., "kind": "deadline"} once the
+    caller's deadline has passed (checked between items). Items are
+    produced as the client reads them, so neither side holds more than a
+    few in memory.
+    """
+    if user_module is None:
+        raise HTTPException(status_code=400, detail="No code loaded. Call /load first.")
+
+    deadline = _deadline(request)
+    payload, mapped = await _read_payload(request)
+
+    async def lines() -> AsyncIterator[bytes]:
+        items = _iterate(payload)
+        try:
+            async for item in items:
+                yield _ndjson_line({"result": item})
+                _touch_activity()
+                if deadline is not None and time.monotonic() >= deadline:
+                    yield _ndjson_line({"error": "Deadline exceeded", "kind": "deadline"})
+                    break
+        except Exception as exc:
+            yield _ndjson_line({"error": f"User code raised an exception: {exc}"})
+        finally:
+            # Stops a generator entrypoint cut short by the deadline
+            await items.aclose()
+            _close_payload(payload, mapped)
+            _touch_activity()
+
+    return StreamingResponse(lines(), media_type=NDJSON_CONTENT_TYPE)
 
 
 if __name__ == "__main__":
     # Use uvicorn programmatically for a simple development server
     # start idle monitor thread
     threading.Thread(target=_idle_monitor, daemon=True).start()
-    uvicorn.run(app, host="0.0.0.0", port=8080)
+    # RUNNER_UDS: listen on this Unix socket instead of TCP port 8080
+    uds = os.environ.get("RUNNER_UDS")
+    if uds:
+        uvicorn.run(app, uds=uds)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8080)
 
 
 # When running under an external ASGI server we still want the idle monitor
@@ -0,0 +1,8 @@
+import os
+import sys
+
+REPO_ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), os.pardir))
+# The Docker-free stand-ins live with the benchmarks
+for path in (REPO_ROOT, os.path.join(REPO_ROOT, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,27 @@
+import asyncio
+import time
+
+import pytest
+
+from fake_docker import FakeDockerService
+from lambda_poc import AsyncDispatcher
+
+CODE = "def entrypoint(data):\n    return data\n"
+
+
+def test_cancelled_cold_start_releases_its_replica():
+    async def main():
+        async with AsyncDispatcher(docker_service=FakeDockerService(boot_delay=0.3)) as ad:
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(ad.run(CODE, {}), 0.1)
+            # The cold start finishes in its thread after the caller gave up
+            deadline = time.monotonic() + 5
+            while not ad.dispatcher.containers and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            await asyncio.sleep(0.05)
+            replicas = [r for entry in ad.dispatcher.containers.values() for r in entry["replicas"]]
+            assert len(replicas) == 1
+            assert replicas[0]["in_flight"] == 0
+            assert await ad.run(CODE, {"x": 1}) == {"echo": {"x": 1}}
+
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+import pytest
+
+from fake_docker import FakeDockerService
+from lambda_poc import ClusterDispatcher
+
+CODE = "def entrypoint(data):\n    return data\n"
+
+
+def _code(i):
+    return f"def entrypoint(data):\n    return {{'f': {i}, 'data': data}}\n"
+
+
+def _runner_hashes(fake):
+    return {name.split("_")[1] for name in fake._containers}
+
+
+def test_each_function_runs_on_one_host():
+    hosts = {f"host{i}": FakeDockerService() for i in range(3)}
+    # A long health check interval keeps the background thread out of the way
+    with ClusterDispatcher(hosts, health_check_seconds=60) as c:
+        owners = {}
+        for _ in range(2):
+            for i in range(12):
+                c.run(_code(i), {})
+                owners.setdefault(i, c.host_for(_code(i)))
+                assert c.host_for(_code(i)) == owners[i]
+        for i, owner in owners.items():
+            code_hash = c._hash_code(_code(i))
+            assert [name for name, fake in hosts.items() if code_hash in _runner_hashes(fake)] == [owner]
+        assert len(set(owners.values())) > 1
+
+
+def test_calls_fail_over_when_a_host_is_down():
+    hosts = {f"host{i}": FakeDockerService() for i in range(3)}
+    with ClusterDispatcher(hosts, health_check_seconds=60) as c:
+        c.run(CODE, {})
+        owner = c.host_for(CODE)
+        hosts[owner].set_down()
+        assert c.run(CODE, {"x": 1}) == {"echo": {"x": 1}}
+        assert c.host_for(CODE) not in (None, owner)
+        counters = c.stats()["counters"]
+        assert counters["failovers"] == 1
+        assert counters["hosts_marked_down"] == 1
+        # Back up, and seen by the next health check
+        hosts[owner].set_down(False)
+        c._ping(owner)
+        assert c.host_for(CODE) == owner
+
+
+def test_adding_a_host_moves_about_one_in_n_functions():
+    hosts = {f"host{i}": FakeDockerService() for i in range(4)}
+    with ClusterDispatcher(hosts, health_check_seconds=60) as c:
+        codes = [_code(i) for i in range(400)]
+        before = {code: c.host_for(code) for code in codes}
+        c.add_host("host4", FakeDockerService())
+        moved = [code for code in codes if c.host_for(code) != before[code]]
+        # Only to the new host, and about 1/5 of them
+        assert {c.host_for(code) for code in moved} == {"host4"}
+        assert 0.1 < len(moved) / len(codes) < 0.3
+
+
+def test_runner_errors_do_not_fail_over():
+    hosts = {f"host{i}": FakeDockerService() for i in range(3)}
+    for fake in hosts.values():
+        fake.run_status = 500
+    with ClusterDispatcher(hosts, health_check_seconds=60, max_attempts=2) as c:
+        with pytest.raises(RuntimeError, match="HTTP 500"):
+            c.run(CODE, {})
+        # Only the owner was asked, and nobody was pinged
+        assert [name for name, fake in hosts.items() if fake.total_calls] == [c.host_for(CODE)]
+        assert not any(fake.calls["ping"] for fake in hosts.values())
+        assert c.stats()["counters"].get("host_failures", 0) == 0
@@ -0,0 +1,15 @@
+import pytest
+
+from lambda_poc.codecs import CODECS, JSON_CODEC, get_codec
+
+
+@pytest.mark.parametrize("name", sorted(name for name in CODECS if name != "msgpack"))
+def test_json_codecs_round_trip_big_integers(name):
+    codec = get_codec(name)
+    body = {"big": 2**70, "negative": -(2**65), "small": 1, 3: "non-str key"}
+    assert codec.decode(codec.encode(body)) == {"big": 2**70, "negative": -(2**65), "small": 1, "3": "non-str key"}
+
+
+def test_default_codec_reads_what_stdlib_json_writes():
+    body = {"fib": 354224848179261915075, "text": "12345678901234567890123"}
+    assert get_codec().decode(JSON_CODEC.encode(body)) == body
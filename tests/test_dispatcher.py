@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+
+from fake_docker import FakeDockerService
+from lambda_poc import AdmissionRejected, Dispatcher
+from lambda_poc.admission import AdmissionController
+from lambda_poc.metrics import Metrics
+
+CODE = "def entrypoint(data):\n    return data\n"
+OTHER_CODE = "def entrypoint(data):\n    return data  # other\n"
+
+
+def test_warm_calls_make_no_docker_api_calls():
+    fake = FakeDockerService()
+    with Dispatcher(docker_service=fake) as d:
+        d.run(CODE, {"i": 0})
+        calls = dict(fake.calls)
+        for i in range(1, 20):
+            assert d.run(CODE, {"i": i}) == {"echo": {"i": i}}
+        assert dict(fake.calls) == calls
+        assert d.stats()["counters"]["cache_hits"] >= 19
+
+
+def test_concurrent_callers_share_one_cold_start():
+    fake = FakeDockerService(boot_delay=0.5)
+    with Dispatcher(docker_service=fake) as d:
+        d.run(OTHER_CODE, {})
+        threads = [threading.Thread(target=d.run, args=(CODE, {"i": i})) for i in range(20)]
+        for t in threads:
+            t.start()
+        # A warm hash is served while the cold start is in flight
+        start = time.monotonic()
+        assert d.run(OTHER_CODE, {"x": 1}) == {"echo": {"x": 1}}
+        assert time.monotonic() - start < 0.2
+        for t in threads:
+            t.join()
+        assert fake.calls["run_container"] == 2
+        assert d.stats()["counters"]["cold_starts"] == 2
+
+
+def test_full_cache_evicts_the_least_recently_used_container():
+    codes = [f"def entrypoint(data):\n    return {{'f': {i}, 'data': data}}\n" for i in range(3)]
+    with Dispatcher(docker_service=FakeDockerService(), max_containers=2) as d:
+        d.run(codes[0], {})
+        d.run(codes[1], {})
+        d.run(codes[0], {})
+        d.run(codes[2], {})
+        assert set(d.containers) == {d._hash_code(codes[0]), d._hash_code(codes[2])}
+        assert d.stats()["counters"]["evictions"] == 1
+
+
+def test_ttl_expires_only_idle_runners():
+    with Dispatcher(docker_service=FakeDockerService(), ttl_seconds=0.3) as d:
+        d.run(CODE, {})
+        d.run(OTHER_CODE, {})
+        deadline = time.monotonic() + 5
+        while len(d.containers) > 1 and time.monotonic() < deadline:
+            # Keeps CODE's runner in use
+            d.run(CODE, {})
+            time.sleep(0.05)
+        assert set(d.containers) == {d._hash_code(CODE)}
+        assert d.stats()["counters"]["ttl_expirations"] == 1
+
+
+class _SlowRemoveDocker(FakeDockerService):
+    def remove_container(self, name):
+        time.sleep(0.3)
+        super().remove_container(name)
+
+
+def test_shutdown_removes_runners_in_parallel():
+    fake = _SlowRemoveDocker()
+    d = Dispatcher(docker_service=fake, teardown_workers=8)
+    for i in range(6):
+        d.run(f"def entrypoint(data):\n    return {i}\n", {})
+    start = time.monotonic()
+    d.shutdown()
+    # One at a time would take 6 x 0.3 seconds
+    assert time.monotonic() - start < 1.0
+    assert not [name for name in fake._containers if name.startswith("runner_")]
+
+
+def test_admission_queue_is_fair_and_bounded():
+    admission = AdmissionController(1, None, max_queued=3, queue_timeout=5, metrics=Metrics())
+    admitted = []
+
+    def call(code_hash, label):
+        with admission.slot(code_hash):
+            admitted.append(label)
+            time.sleep(0.05)
+
+    threads = []
+    with admission.slot("a"):
+        for code_hash, label in (("a", "a1"), ("a", "a2"), ("b", "b1")):
+            threads.append(threading.Thread(target=call, args=(code_hash, label)))
+            threads[-1].start()
+            while admission.queued < len(threads):
+                time.sleep(0.01)
+        with pytest.raises(AdmissionRejected):
+            with admission.slot("c"):
+                pass
+    for t in threads:
+        t.join()
+    # Hashes take turns instead of "a" draining its queue first
+    assert admitted == ["a1", "b1", "a2"]
+
+
+def test_leftover_pool_runners_are_removed_at_start():
+    fake = FakeDockerService()
+    crashed = Dispatcher(docker_service=fake, pool_size=1)
+
+    def wait_for_pool():
+        deadline = time.monotonic() + 5
+        while not crashed._pool and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    wait_for_pool()
+    crashed.run(CODE, {})
+    wait_for_pool()
+    # The dispatcher dies: one claimed runner and one idle pooled runner stay behind
+    crashed._stop_event.set()
+    assert len([name for name in fake._containers if name.startswith("runner_pool_")]) == 2
+    with Dispatcher(docker_service=fake) as d:
+        counters = d.stats()["counters"]
+        assert counters["containers_adopted"] == 1
+        assert counters["pool_leftovers_removed"] == 1
+        assert len([name for name in fake._containers if name.startswith("runner_pool_")]) == 1
+        assert d.run(CODE, {"x": 1}) == {"echo": {"x": 1}}
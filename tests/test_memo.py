@@ -0,0 +1,55 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from lambda_poc import DeadlineExceeded
+from lambda_poc.codecs import get_codec
+from lambda_poc.memo import Memoizer
+from lambda_poc.metrics import Metrics
+
+
+def _memoizer():
+    return Memoizer(max_bytes=2**20, ttl_seconds=60, codec=get_codec(), metrics=Metrics())
+
+
+def _slow(value, seconds):
+    def fn():
+        time.sleep(seconds)
+        return value
+
+    return fn
+
+
+def test_waiting_for_an_identical_call_respects_the_deadline():
+    memo = _memoizer()
+    leader = threading.Thread(target=memo.call, args=("h", {"x": 1}, _slow("first", 1.0)))
+    leader.start()
+    time.sleep(0.05)
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        memo.call("h", {"x": 1}, _slow("second", 0), deadline=time.monotonic() + 0.2)
+    assert time.monotonic() - start < 0.5
+    leader.join()
+    assert memo.call("h", {"x": 1}, _slow("third", 0)) == "first"
+
+
+def test_cancelled_leader_does_not_cancel_waiting_callers():
+    memo = _memoizer()
+
+    async def value(result, seconds):
+        await asyncio.sleep(seconds)
+        return result
+
+    async def main():
+        leader = asyncio.ensure_future(memo.acall("h", {"x": 1}, lambda: value("leader", 1.0)))
+        await asyncio.sleep(0.05)
+        follower = asyncio.ensure_future(memo.acall("h", {"x": 1}, lambda: value("follower", 0.05)))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        # The follower takes the call over instead of sharing the cancellation
+        assert await follower == "follower"
+        assert leader.cancelled()
+
+    asyncio.run(main())
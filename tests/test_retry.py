@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+from fake_docker import FakeDockerService
+from lambda_poc import CircuitOpenError, DeadlineExceeded, Dispatcher
+from lambda_poc.metrics import Metrics
+from lambda_poc.retry import CircuitBreaker
+
+CODE = "def entrypoint(data):\n    return data\n"
+
+
+def test_trial_that_never_reports_back_expires():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05, metrics=Metrics())
+    breaker.record("h", False)
+    with pytest.raises(CircuitOpenError):
+        breaker.check("h")
+    time.sleep(0.06)
+    breaker.check("h")  # the trial; its caller never calls record()
+    with pytest.raises(CircuitOpenError):
+        breaker.check("h")
+    time.sleep(0.06)
+    breaker.check("h")
+
+
+def test_trial_ending_in_deadline_does_not_keep_circuit_open():
+    fake = FakeDockerService()
+    with Dispatcher(
+        docker_service=fake, max_attempts=1, circuit_failure_threshold=1, circuit_reset_seconds=0.1
+    ) as d:
+        d.run(CODE, {})
+        fake.run_status = 500
+        with pytest.raises(RuntimeError):
+            d.run(CODE, {})
+        with pytest.raises(CircuitOpenError):
+            d.run(CODE, {})
+
+        fake.run_status = 200
+        time.sleep(0.15)
+        # The trial call runs out of time before reaching the runner
+        with pytest.raises(DeadlineExceeded):
+            d.run(CODE, {}, timeout=1e-6)
+        assert d.run(CODE, {"x": 1}) == {"echo": {"x": 1}}
+        assert d.stats()["gauges"]["open_circuits"] == 0
+
+
+def test_cold_start_wait_is_bounded_by_the_deadline():
+    with Dispatcher(docker_service=FakeDockerService(boot_delay=1.0)) as d:
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            d.run(CODE, {}, timeout=0.3)
+        assert time.monotonic() - start < 0.6
+        # The container kept starting in the background
+        assert d.run(CODE, {"x": 1}) == {"echo": {"x": 1}}
+
+
+def test_admission_wait_is_bounded_by_the_deadline():
+    with Dispatcher(
+        docker_service=FakeDockerService(boot_delay=0.5), max_concurrency=1, queue_timeout_seconds=30
+    ) as d:
+        first = threading.Thread(target=d.run, args=(CODE, {}))
+        first.start()
+        time.sleep(0.05)
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            d.run(CODE, {}, timeout=0.2)
+        assert time.monotonic() - start < 0.4
+        first.join()
+        assert d.stats()["counters"]["deadline_exceeded"] == 1